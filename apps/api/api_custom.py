@@ -3,9 +3,13 @@ Simple FastAPI Backend for React Frontend (Original Version Only)
 Converted from Flask to FastAPI
 """
 from fastapi import FastAPI, HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from dataclasses import asdict
+import json
 import sys
 import os
 from dotenv import load_dotenv
@@ -17,10 +21,27 @@ SRC = os.path.join(PROJECT_ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from nl2sql.agent import answer_question
+from nl2sql.agent import NL2SQLError, answer_question_async, answer_question_stream
 from nl2sql.config import load_settings_custom
-from nl2sql.db import PostgresDB, DatabaseError
-from nl2sql.llm_client import LLMError
+from nl2sql.confirm import ConfirmationError, issue_confirmation, verify_confirmation
+from nl2sql.db import AsyncPostgresDB, PostgresDB, DatabaseError, pool_stats
+from nl2sql.mock_llm import configure_mock_provider, mock_metrics
+from nl2sql.plan_cache import plan_cache_for
+from nl2sql.prompts import precompile_prompts
+from nl2sql.llm_client import (
+    LLMError,
+    active_model,
+    circuit_metrics,
+    context_cache_metrics,
+    configure_circuit_breakers,
+    configure_context_cache,
+    configure_gemini_models,
+    configure_hedging,
+    configure_http,
+    configure_rate_limits,
+    hedge_metrics,
+    rate_limit_metrics,
+)
 
 load_dotenv()
 
@@ -40,6 +61,30 @@ app.add_middleware(
 )
 
 settings = load_settings_custom()  # Using DATABASE_URL_CUSTOMER
+configure_http(settings.http_config)
+configure_rate_limits(settings.rate_limit_config)
+configure_hedging(settings.hedge_config)
+configure_circuit_breakers(settings.breaker_config, settings.failover_target)
+configure_context_cache(settings.context_cache_config)
+configure_gemini_models(settings.gemini_model_ttl_s)
+configure_mock_provider(settings.mock_config)
+precompile_prompts(settings.max_sql_statements)
+_plan_cache = plan_cache_for(
+    ttl_s=settings.plan_cache_ttl_s,
+    max_entries=settings.plan_cache_max_entries,
+    semantic_threshold=settings.semantic_cache_threshold,
+)
+
+# Database handle (and its shared connection pool) will be initialized on first request
+_db_cache = None
+
+
+def get_db() -> AsyncPostgresDB:
+    """Lazy initialize the pooled (awaitable) database handle"""
+    global _db_cache
+    if _db_cache is None:
+        _db_cache = AsyncPostgresDB(PostgresDB.from_settings(settings))
+    return _db_cache
 
 
 # Pydantic models for request/response
@@ -51,19 +96,38 @@ class ChatMessage(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     chat_history: Optional[List[Dict[str, Any]]] = []
+    # Re-send the confirm_token from a needs_confirmation response, with the same question, to run the held SQL.
+    confirm_token: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     sql: Optional[str] = None
     results: Optional[Any] = None
+    columns: Optional[Any] = None
     kind: str
+    cached: bool = False
+    plan_summary: Optional[List[Optional[Dict[str, Any]]]] = None
+    warnings: Optional[List[str]] = None
+    needs_confirmation: bool = False
+    confirm_token: Optional[str] = None
+    plan_cached: bool = False
+    prompt_tokens: Optional[Dict[str, Any]] = None
 
 
 class HealthResponse(BaseModel):
     status: str
     provider: str
     model: str
+    active_model: str = ""
+    pools: Dict[str, Any] = {}
+    replicas: Dict[str, Any] = {}
+    rate_limits: Dict[str, Any] = {}
+    hedging: Dict[str, Any] = {}
+    circuits: Dict[str, Any] = {}
+    context_cache: Dict[str, Any] = {}
+    plan_cache: Dict[str, Any] = {}
+    mock: Dict[str, Any] = {}
 
 
 @app.post('/api/query', response_model=QueryResponse)
@@ -76,9 +140,21 @@ async def query(request: QueryRequest):
                 detail='Question is required'
             )
         
-        db = PostgresDB(settings.database_url)
+        confirmed_sql = None
+        if request.confirm_token:
+            try:
+                confirmed_sql = verify_confirmation(
+                    request.confirm_token, request.question, secret=settings.confirm_secret
+                )
+            except ConfirmationError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
         
-        response = answer_question(
+        db = get_db()
+        
+        response = await answer_question_async(
             provider=settings.provider,
             api_key=settings.api_key,
             model=settings.model,
@@ -89,24 +165,51 @@ async def query(request: QueryRequest):
             max_rows=settings.max_rows,
             sql_mode="write_full",
             execute=True,
+            sql_override=confirmed_sql,
             memory_user_turns=settings.memory_user_turns,
-            max_sql_statements=settings.max_sql_statements
+            max_sql_statements=settings.max_sql_statements,
+            schema_top_k=settings.schema_top_k,
+            schema_token_budget=settings.schema_token_budget,
+            cost_thresholds=settings.cost_thresholds,
+            cost_confirmed=confirmed_sql is not None,
+            plan_cache=_plan_cache,
+            max_output_tokens=settings.max_output_tokens,
+            prompt_token_budget=settings.prompt_token_budget,
         )
         
-        # Format results
+        # Format results (columnar: column names once, rows as value arrays)
         results_data = None
+        columns_data = None
         if response.results:
-            results_data = [r.rows for r in response.results]
+            results_data = [r.data for r in response.results]
+            columns_data = [r.columns for r in response.results]
             if len(results_data) == 1:
                 results_data = results_data[0]
+                columns_data = columns_data[0]
         
         return QueryResponse(
             answer=response.answer,
             sql=response.sql,
             results=results_data,
-            kind=response.kind
+            columns=columns_data,
+            kind=response.kind,
+            cached=response.cached,
+            plan_summary=[asdict(e) if e is not None else None for e in response.plan_summary]
+            if response.plan_summary is not None
+            else None,
+            warnings=response.warnings,
+            needs_confirmation=response.needs_confirmation,
+            confirm_token=issue_confirmation(
+                request.question, response.sql, secret=settings.confirm_secret, ttl_s=settings.confirm_ttl_s
+            )
+            if response.needs_confirmation and response.sql
+            else None,
+            plan_cached=response.plan_cached,
+            prompt_tokens=response.prompt_tokens,
         )
         
+    except HTTPException:
+        raise
     except (LLMError, DatabaseError) as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -119,6 +222,79 @@ async def query(request: QueryRequest):
         )
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@app.post('/api/query/stream')
+async def query_stream(request: QueryRequest):
+    """NL2SQL over server-sent events: model deltas, message, SQL, then result row batches"""
+    if not request.question:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Question is required'
+        )
+    confirmed_sql = None
+    if request.confirm_token:
+        try:
+            confirmed_sql = verify_confirmation(request.confirm_token, request.question, secret=settings.confirm_secret)
+        except ConfirmationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    db = get_db()
+
+    async def events():
+        # Flush headers and a first byte right away; planning starts after this.
+        yield ": stream open\n\n"
+        sql = ""
+        try:
+            async for ev in answer_question_stream(
+                provider=settings.provider,
+                api_key=settings.api_key,
+                model=settings.model,
+                db=db,
+                question=request.question,
+                chat_history=request.chat_history,
+                statement_timeout_ms=settings.statement_timeout_ms,
+                max_rows=settings.max_rows,
+                sql_mode="write_full",
+                execute=True,
+                sql_override=confirmed_sql,
+                memory_user_turns=settings.memory_user_turns,
+                max_sql_statements=settings.max_sql_statements,
+                schema_top_k=settings.schema_top_k,
+                schema_token_budget=settings.schema_token_budget,
+                cost_thresholds=settings.cost_thresholds,
+                cost_confirmed=confirmed_sql is not None,
+                plan_cache=_plan_cache,
+                max_output_tokens=settings.max_output_tokens,
+                prompt_token_budget=settings.prompt_token_budget,
+            ):
+                data = ev.data
+                if ev.event == "sql":
+                    sql = data["sql"]
+                elif ev.event == "done" and data.get("needs_confirmation") and sql:
+                    data = {
+                        **data,
+                        "confirm_token": issue_confirmation(
+                            request.question, sql, secret=settings.confirm_secret, ttl_s=settings.confirm_ttl_s
+                        ),
+                    }
+                yield _sse(ev.event, data)
+        except (NL2SQLError, LLMError, DatabaseError) as e:
+            yield _sse("error", {"detail": str(e)})
+        except Exception as e:
+            yield _sse("error", {"detail": f'Internal server error: {str(e)}'})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Alias for langchain endpoint (same implementation for now)
 @app.post('/api/langchain/query', response_model=QueryResponse)
 async def query_langchain(request: QueryRequest):
@@ -132,7 +308,16 @@ async def health():
     return HealthResponse(
         status='healthy',
         provider=settings.provider,
-        model=settings.model
+        model=settings.model,
+        active_model=active_model(settings.provider, settings.model),
+        pools={url: asdict(stats) for url, stats in pool_stats().items()},
+        replicas=_db_cache.replica_status() if _db_cache is not None else {},
+        rate_limits=rate_limit_metrics(),
+        hedging=hedge_metrics(),
+        circuits=circuit_metrics(),
+        context_cache=context_cache_metrics(),
+        plan_cache=_plan_cache.status() if _plan_cache is not None else {},
+        mock=mock_metrics() if settings.provider == "mock" else {},
     )
 
 
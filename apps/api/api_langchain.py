@@ -4,9 +4,11 @@ Provides REST API endpoints for both original and LangChain NL2SQL implementatio
 Converted from Flask to FastAPI
 """
 from fastapi import FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from dataclasses import asdict
 import sys
 import os
 from dotenv import load_dotenv
@@ -18,10 +20,27 @@ SRC = os.path.join(PROJECT_ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from nl2sql.agent import answer_question as answer_question_original
+from nl2sql.agent import answer_question_async as answer_question_original
 from nl2sql.config import load_settings_langchain
-from nl2sql.db import PostgresDB, DatabaseError
-from nl2sql.llm_client import LLMError
+from nl2sql.confirm import ConfirmationError, issue_confirmation, verify_confirmation
+from nl2sql.db import AsyncPostgresDB, PostgresDB, DatabaseError, pool_stats
+from nl2sql.mock_llm import configure_mock_provider, mock_metrics
+from nl2sql.plan_cache import plan_cache_for
+from nl2sql.prompts import precompile_prompts
+from nl2sql.llm_client import (
+    LLMError,
+    active_model,
+    circuit_metrics,
+    context_cache_metrics,
+    configure_circuit_breakers,
+    configure_context_cache,
+    configure_gemini_models,
+    configure_hedging,
+    configure_http,
+    configure_rate_limits,
+    hedge_metrics,
+    rate_limit_metrics,
+)
 
 # Try importing LangChain (optional)
 try:
@@ -50,10 +69,34 @@ app.add_middleware(
 )
 
 settings = load_settings_langchain()  # Using DATABASE_URL_GIS (PostGIS)
+configure_http(settings.http_config)
+configure_rate_limits(settings.rate_limit_config)
+configure_hedging(settings.hedge_config)
+configure_circuit_breakers(settings.breaker_config, settings.failover_target)
+configure_context_cache(settings.context_cache_config)
+configure_gemini_models(settings.gemini_model_ttl_s)
+configure_mock_provider(settings.mock_config)
+precompile_prompts(settings.max_sql_statements)
+_plan_cache = plan_cache_for(
+    ttl_s=settings.plan_cache_ttl_s,
+    max_entries=settings.plan_cache_max_entries,
+    semantic_threshold=settings.semantic_cache_threshold,
+)
 
 # LangChain agent will be initialized on first request
 _langchain_agent_cache = None
 
+# Database handle (and its shared connection pool) will be initialized on first request
+_db_cache = None
+
+
+def get_db() -> AsyncPostgresDB:
+    """Lazy initialize the pooled (awaitable) database handle"""
+    global _db_cache
+    if _db_cache is None:
+        _db_cache = AsyncPostgresDB(PostgresDB.from_settings(settings))
+    return _db_cache
+
 
 def get_langchain_agent():
     """Lazy initialize LangChain agent"""
@@ -69,7 +112,10 @@ def get_langchain_agent():
             api_key=settings.api_key,
             model=settings.model,
             sql_mode="write_full",
-            max_sql_statements=settings.max_sql_statements
+            max_sql_statements=settings.max_sql_statements,
+            schema_top_k=settings.schema_top_k,
+            schema_token_budget=settings.schema_token_budget,
+            max_output_tokens=settings.max_output_tokens,
         )
     return _langchain_agent_cache
 
@@ -83,20 +129,37 @@ class ChatMessage(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     chat_history: Optional[List[Dict[str, Any]]] = []
+    # Re-send the confirm_token from a needs_confirmation response, with the same question, to run the held SQL.
+    confirm_token: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     sql: Optional[str] = None
     results: Optional[Any] = None
+    columns: Optional[Any] = None
     kind: str
+    cached: bool = False
+    plan_summary: Optional[List[Optional[Dict[str, Any]]]] = None
+    warnings: Optional[List[str]] = None
+    needs_confirmation: bool = False
+    confirm_token: Optional[str] = None
 
 
 class HealthResponse(BaseModel):
     status: str
     provider: str
     model: str
+    active_model: str = ""
     langchain_enabled: bool
+    pools: Dict[str, Any] = {}
+    replicas: Dict[str, Any] = {}
+    rate_limits: Dict[str, Any] = {}
+    hedging: Dict[str, Any] = {}
+    circuits: Dict[str, Any] = {}
+    context_cache: Dict[str, Any] = {}
+    plan_cache: Dict[str, Any] = {}
+    mock: Dict[str, Any] = {}
 
 
 @app.post('/api/query', response_model=QueryResponse)
@@ -109,9 +172,21 @@ async def query_original(request: QueryRequest):
                 detail='Question is required'
             )
         
-        db = PostgresDB(settings.database_url)
+        confirmed_sql = None
+        if request.confirm_token:
+            try:
+                confirmed_sql = verify_confirmation(
+                    request.confirm_token, request.question, secret=settings.confirm_secret
+                )
+            except ConfirmationError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        
+        db = get_db()
         
-        response = answer_question_original(
+        response = await answer_question_original(
             provider=settings.provider,
             api_key=settings.api_key,
             model=settings.model,
@@ -122,25 +197,50 @@ async def query_original(request: QueryRequest):
             max_rows=settings.max_rows,
             sql_mode="write_full",
             execute=True,
+            sql_override=confirmed_sql,
             memory_user_turns=settings.memory_user_turns,
-            max_sql_statements=settings.max_sql_statements
+            max_sql_statements=settings.max_sql_statements,
+            schema_top_k=settings.schema_top_k,
+            schema_token_budget=settings.schema_token_budget,
+            cost_thresholds=settings.cost_thresholds,
+            cost_confirmed=confirmed_sql is not None,
+            plan_cache=_plan_cache,
+            max_output_tokens=settings.max_output_tokens,
+            prompt_token_budget=settings.prompt_token_budget,
         )
         
-        # Format results
+        # Format results (columnar: column names once, rows as value arrays)
         results_data = None
+        columns_data = None
         if response.results:
-            results_data = [r.rows for r in response.results]
+            results_data = [r.data for r in response.results]
+            columns_data = [r.columns for r in response.results]
             # Flatten if single result
             if len(results_data) == 1:
                 results_data = results_data[0]
+                columns_data = columns_data[0]
         
         return QueryResponse(
             answer=response.answer,
             sql=response.sql,
             results=results_data,
-            kind=response.kind
+            columns=columns_data,
+            kind=response.kind,
+            cached=response.cached,
+            plan_summary=[asdict(e) if e is not None else None for e in response.plan_summary]
+            if response.plan_summary is not None
+            else None,
+            warnings=response.warnings,
+            needs_confirmation=response.needs_confirmation,
+            confirm_token=issue_confirmation(
+                request.question, response.sql, secret=settings.confirm_secret, ttl_s=settings.confirm_ttl_s
+            )
+            if response.needs_confirmation and response.sql
+            else None,
         )
         
+    except HTTPException:
+        raise
     except (LLMError, DatabaseError) as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -165,13 +265,15 @@ async def query_langchain(request: QueryRequest):
                 detail='Question is required'
             )
         
-        db = PostgresDB(settings.database_url)
+        db = get_db()
         
         # Add to memory
         agent.add_to_memory("user", request.question)
         
-        response = agent.answer_question(
-            db=db,
+        # LangChainAgent is synchronous; keep it off the event loop
+        response = await run_in_threadpool(
+            agent.answer_question,
+            db=db.sync,
             question=request.question,
             execute=True,
             statement_timeout_ms=settings.statement_timeout_ms,
@@ -181,18 +283,23 @@ async def query_langchain(request: QueryRequest):
         # Add response to memory
         agent.add_to_memory("assistant", response.answer)
         
-        # Format results
+        # Format results (columnar: column names once, rows as value arrays)
         results_data = None
+        columns_data = None
         if response.results:
-            results_data = [r.rows for r in response.results]
+            results_data = [r.data for r in response.results]
+            columns_data = [r.columns for r in response.results]
             if len(results_data) == 1:
                 results_data = results_data[0]
+                columns_data = columns_data[0]
         
         return QueryResponse(
             answer=response.answer,
             sql=response.sql,
             results=results_data,
-            kind=response.kind
+            columns=columns_data,
+            kind=response.kind,
+            cached=response.cached
         )
         
     except (DatabaseError, LangChainError) as e:
@@ -214,7 +321,16 @@ async def health():
         status='healthy',
         provider=settings.provider,
         model=settings.model,
-        langchain_enabled=LANGCHAIN_AVAILABLE
+        active_model=active_model(settings.provider, settings.model),
+        langchain_enabled=LANGCHAIN_AVAILABLE,
+        pools={url: asdict(stats) for url, stats in pool_stats().items()},
+        replicas=_db_cache.replica_status() if _db_cache is not None else {},
+        rate_limits=rate_limit_metrics(),
+        hedging=hedge_metrics(),
+        circuits=circuit_metrics(),
+        context_cache=context_cache_metrics(),
+        plan_cache=_plan_cache.status() if _plan_cache is not None else {},
+        mock=mock_metrics() if settings.provider == "mock" else {},
     )
 
 
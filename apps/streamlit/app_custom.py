@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import sys
 
+import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -13,14 +14,40 @@ SRC = os.path.join(PROJECT_ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from nl2sql.agent import NL2SQLError, answer_question  # noqa: E402
+from nl2sql.agent import NL2SQLError, NL2SQLResponse, answer_question  # noqa: E402
 from nl2sql.config import load_settings_custom  # noqa: E402
-from nl2sql.db import DatabaseError, PostgresDB  # noqa: E402
-from nl2sql.llm_client import LLMError  # noqa: E402
+from nl2sql.db import DatabaseError, PostgresDB, QueryResult  # noqa: E402
+from nl2sql.llm_client import (  # noqa: E402
+    LLMError,
+    configure_circuit_breakers,
+    configure_context_cache,
+    configure_gemini_models,
+    configure_hedging,
+    configure_http,
+    configure_rate_limits,
+)
+from nl2sql.mock_llm import configure_mock_provider  # noqa: E402
+from nl2sql.plan_cache import plan_cache_for  # noqa: E402
+from nl2sql.prompts import precompile_prompts  # noqa: E402
 from nl2sql.sql_safety import SQLMode, classify_statement  # noqa: E402
 
 load_dotenv()
 
+
+def _result_frame(r: QueryResult) -> pd.DataFrame:
+    # Build the frame straight from the columnar tuples (no per-row dicts).
+    return pd.DataFrame.from_records(r.data, columns=r.columns)
+
+
+def _plan_caption(resp: NL2SQLResponse) -> str:
+    estimates = [e for e in resp.plan_summary or [] if e is not None]
+    if not estimates:
+        return ""
+    if len(estimates) == 1:
+        return f"Planner estimate — {estimates[0].describe()}"
+    return "Planner estimates — " + " | ".join(f"#{i}: {e.describe()}" for i, e in enumerate(estimates, start=1))
+
+
 # Professional page configuration
 st.set_page_config(
     page_title="NL2SQL - PostgreSQL Query Assistant",
@@ -220,6 +247,20 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 settings = load_settings_custom()  # Using DATABASE_URL_CUSTOMER
+configure_http(settings.http_config)
+configure_rate_limits(settings.rate_limit_config)
+configure_hedging(settings.hedge_config)
+configure_circuit_breakers(settings.breaker_config, settings.failover_target)
+configure_context_cache(settings.context_cache_config)
+configure_gemini_models(settings.gemini_model_ttl_s)
+configure_mock_provider(settings.mock_config)
+precompile_prompts(settings.max_sql_statements)
+# Module-level in nl2sql, so it survives Streamlit reruns.
+plan_cache = plan_cache_for(
+    ttl_s=settings.plan_cache_ttl_s,
+    max_entries=settings.plan_cache_max_entries,
+    semantic_threshold=settings.semantic_cache_threshold,
+)
 
 with st.sidebar:
     st.subheader("Database Configuration")
@@ -274,8 +315,8 @@ for m in st.session_state.messages:
                     st.caption(f"statement #{i}")
                 if r.get("meta"):
                     st.caption(r["meta"])
-                if r.get("rows") is not None:
-                    st.dataframe(r["rows"], use_container_width=True)
+                if r.get("frame") is not None:
+                    st.dataframe(r["frame"], use_container_width=True)
         else:
             if m.get("rows") is not None:
                 st.dataframe(m["rows"], use_container_width=True)
@@ -307,7 +348,7 @@ def _run_pending(db: PostgresDB):
         )
         results_payload = []
         for r in resp.results or []:
-            results_payload.append({"rows": r.rows, "meta": f"rowcount: {r.rowcount}"})
+            results_payload.append({"frame": _result_frame(r), "meta": f"rowcount: {r.rowcount}" + (" (cached)" if r.cached else "")})
         st.session_state.messages.append({"role": "assistant", "content": resp.answer, "sql": resp.sql, "results": results_payload})
         st.session_state.pending = None
         st.rerun()
@@ -329,7 +370,7 @@ if prompt:
             st.error("LLM API key not configured. Set GEMINI_API_KEY or GROQ_API_KEY in environment.")
         else:
             try:
-                db = PostgresDB(database_url)
+                db = PostgresDB.from_settings(settings, database_url=database_url)
                 resp = answer_question(
                     provider=provider,
                     api_key=api_key,
@@ -343,16 +384,32 @@ if prompt:
                     execute=False,
                     memory_user_turns=settings.memory_user_turns,
                     max_sql_statements=settings.max_sql_statements,
+                    schema_top_k=settings.schema_top_k,
+                    schema_token_budget=settings.schema_token_budget,
+                    cost_thresholds=settings.cost_thresholds,
+                    plan_cache=plan_cache,
+                    max_output_tokens=settings.max_output_tokens,
+                    prompt_token_budget=settings.prompt_token_budget,
                 )
+                plan_caption = _plan_caption(resp)
                 if resp.kind != "sql" or not resp.sql:
                     st.markdown(resp.answer)
                     st.session_state.messages.append({"role": "assistant", "content": resp.answer})
                 else:
                     with st.expander("SQL", expanded=True):
                         st.code(resp.sql, language="sql")
+                        if plan_caption:
+                            st.caption(plan_caption)
+                    for w in resp.warnings or []:
+                        st.warning(f"Cost check: {w}")
                     stmts = resp.sql_statements or []
                     all_read = all(classify_statement(s) in ("select", "with") for s in stmts) if stmts else False
-                    if all_read:
+                    if all_read and resp.needs_confirmation:
+                        st.warning("This query is estimated to be expensive. Review the estimate, then click Execute.")
+                        st.session_state.pending = {"sql": resp.sql, "question": prompt, "estimate": plan_caption}
+                        if st.button("Execute SQL", type="primary"):
+                            _run_pending(db)
+                    elif all_read:
                         exec_resp = answer_question(
                             provider=provider,
                             api_key=api_key,
@@ -367,14 +424,16 @@ if prompt:
                             sql_override=resp.sql,
                             memory_user_turns=settings.memory_user_turns,
                             max_sql_statements=settings.max_sql_statements,
+                            plan_cache=plan_cache,
                         )
                         st.markdown(exec_resp.answer)
                         results_payload = []
                         for r in exec_resp.results or []:
-                            results_payload.append({"rows": r.rows, "meta": f"rowcount: {r.rowcount}"})
+                            frame = _result_frame(r)
+                            results_payload.append({"frame": frame, "meta": f"rowcount: {r.rowcount}" + (" (cached)" if r.cached else "")})
                             with st.container():
                                 st.caption(f"Result ({r.rowcount} rows)")
-                                st.dataframe(r.rows, use_container_width=True)
+                                st.dataframe(frame, use_container_width=True)
                         st.session_state.messages.append(
                             {"role": "assistant", "content": exec_resp.answer, "sql": exec_resp.sql, "results": results_payload}
                         )
@@ -390,7 +449,7 @@ if prompt:
                             )
                         else:
                             st.warning("This looks like a WRITE query. Review the SQL, then click Execute.")
-                            st.session_state.pending = {"sql": resp.sql, "question": prompt}
+                            st.session_state.pending = {"sql": resp.sql, "question": prompt, "estimate": plan_caption}
                             if st.button("Execute SQL", type="primary"):
                                 _run_pending(db)
             except (NL2SQLError, LLMError, DatabaseError) as e:
@@ -401,3 +460,5 @@ if st.session_state.pending and database_url and api_key:
     with st.sidebar:
         st.subheader("Pending SQL")
         st.code(st.session_state.pending["sql"], language="sql")
+        if st.session_state.pending.get("estimate"):
+            st.caption(st.session_state.pending["estimate"])
@@ -7,6 +7,7 @@ from __future__ import annotations
 import os
 import sys
 
+import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -19,11 +20,18 @@ if SRC not in sys.path:
 
 from nl2sql_langchain.agent_lc import LangChainAgent, NL2SQLError
 from nl2sql.config import load_settings_langchain
-from nl2sql.db import DatabaseError, PostgresDB
+from nl2sql.db import DatabaseError, PostgresDB, QueryResult
+from nl2sql.prompts import precompile_prompts
 from nl2sql.sql_safety import SQLMode, classify_statement
 
 load_dotenv()
 
+
+def _result_frame(r: QueryResult) -> pd.DataFrame:
+    # Build the frame straight from the columnar tuples (no per-row dicts).
+    return pd.DataFrame.from_records(r.data, columns=r.columns)
+
+
 # Professional page configuration
 st.set_page_config(
     page_title="NL2SQL - PostgreSQL Query Assistant (LangChain)",
@@ -215,6 +223,7 @@ st.title("Natural Language to SQL Query Assistant")
 st.caption("PostgreSQL Interaction Tool with LangChain Memory")
 
 settings = load_settings_langchain()  # Using DATABASE_URL_GIS (PostGIS)
+precompile_prompts(settings.max_sql_statements)
 
 with st.sidebar:
     st.subheader("Database Configuration")
@@ -268,6 +277,9 @@ if api_key and st.session_state.agent is None:
             model=model,
             sql_mode=sql_mode,
             max_sql_statements=settings.max_sql_statements,
+            schema_top_k=settings.schema_top_k,
+            schema_token_budget=settings.schema_token_budget,
+            max_output_tokens=settings.max_output_tokens,
         )
     except Exception as e:
         st.error(f"Failed to initialize LangChain agent: {e}")
@@ -285,8 +297,8 @@ for m in st.session_state.messages:
                     st.caption(f"statement #{i}")
                 if r.get("meta"):
                     st.caption(r["meta"])
-                if r.get("rows") is not None:
-                    st.dataframe(r["rows"], use_container_width=True)
+                if r.get("frame") is not None:
+                    st.dataframe(r["frame"], use_container_width=True)
 
 
 def _run_pending(db: PostgresDB, agent: LangChainAgent):
@@ -307,7 +319,7 @@ def _run_pending(db: PostgresDB, agent: LangChainAgent):
         )
         results_payload = []
         for r in resp.results or []:
-            results_payload.append({"rows": r.rows, "meta": f"rowcount: {r.rowcount}"})
+            results_payload.append({"frame": _result_frame(r), "meta": f"rowcount: {r.rowcount}" + (" (cached)" if r.cached else "")})
         
         st.session_state.messages.append({
             "role": "assistant",
@@ -345,7 +357,7 @@ if prompt:
             st.error("Agent not initialized")
         else:
             try:
-                db = PostgresDB(database_url)
+                db = PostgresDB.from_settings(settings, database_url=database_url)
                 agent = st.session_state.agent
                 
                 # Add to LangChain memory
@@ -383,9 +395,10 @@ if prompt:
                         st.markdown(exec_resp.answer)
                         results_payload = []
                         for r in exec_resp.results or []:
-                            results_payload.append({"rows": r.rows, "meta": f"rowcount: {r.rowcount}"})
+                            frame = _result_frame(r)
+                            results_payload.append({"frame": frame, "meta": f"rowcount: {r.rowcount}" + (" (cached)" if r.cached else "")})
                             st.caption(f"rowcount: {r.rowcount}")
-                            st.dataframe(r.rows, use_container_width=True)
+                            st.dataframe(frame, use_container_width=True)
                         
                         st.session_state.messages.append({
                             "role": "assistant",
@@ -197,13 +197,14 @@ function App() {
         model: 'llama-3.3-70b-versatile'
       });
 
-      const { answer, sql, results, kind } = response.data;
+      const { answer, sql, results, columns, kind } = response.data;
 
       const assistantMessage = {
         role: 'assistant',
         content: answer,
         sql: sql,
         results: results,
+        columns: columns,
         kind: kind
       };
 
@@ -354,9 +355,9 @@ function App() {
                         <table className="data-table">
                           <thead>
                             <tr>
-                              {/* Detect if first row is array or object to determine headers */}
+                              {/* Columnar rows are arrays (names in msg.columns); older responses were objects */}
                               {Array.isArray(msg.results[0])
-                                ? msg.results[0].map((_, i) => <th key={i}>Col {i + 1}</th>)
+                                ? msg.results[0].map((_, i) => <th key={i}>{msg.columns?.[i] ?? `Col ${i + 1}`}</th>)
                                 : Object.keys(msg.results[0]).map(key => <th key={key}>{key}</th>)
                               }
                             </tr>
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark: per-request cost of building the planner prompt.
+
+Compares building the system prompt from its fragments on every call (the old
+behaviour) with the precompiled prompts, and times a whole _plan_messages call
+against a synthetic schema.
+
+    python scripts/bench_prompts.py [--number 2000] [--tables 40]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from nl2sql.agent import _plan_messages  # noqa: E402
+from nl2sql.prompt_budget import count_tokens  # noqa: E402
+from nl2sql.prompts import (  # noqa: E402
+    SQL_MODES,
+    langchain_system_prompt,
+    mode_rules,
+    planner_system_prompt,
+    planner_system_tokens,
+    precompile_prompts,
+)
+from nl2sql.schema import ColumnInfo, SchemaModel, TableInfo  # noqa: E402
+
+MAX_SQL_STATEMENTS = 4
+
+
+def _synthetic_schema(tables: int) -> SchemaModel:
+    return SchemaModel(
+        tables=tuple(
+            TableInfo(
+                schema="public",
+                name=f"table_{t}",
+                kind="table",
+                columns=(
+                    ColumnInfo(name="id", data_type="integer", is_primary_key=True),
+                    *(ColumnInfo(name=f"col_{t}_{c}", data_type="text") for c in range(12)),
+                ),
+            )
+            for t in range(tables)
+        ),
+        has_postgis=True,
+    )
+
+
+def _uncached_planner() -> None:
+    for sql_mode in SQL_MODES:
+        text = planner_system_prompt.__wrapped__(sql_mode, MAX_SQL_STATEMENTS, True)
+        count_tokens(text)
+
+
+def _cached_planner() -> None:
+    for sql_mode in SQL_MODES:
+        planner_system_prompt(sql_mode, MAX_SQL_STATEMENTS, True)
+        planner_system_tokens(sql_mode, MAX_SQL_STATEMENTS, True)
+
+
+def _uncached_langchain() -> None:
+    for sql_mode in SQL_MODES:
+        mode_rules.__wrapped__(sql_mode, MAX_SQL_STATEMENTS)
+
+
+def _cached_langchain() -> None:
+    for sql_mode in SQL_MODES:
+        langchain_system_prompt(sql_mode, MAX_SQL_STATEMENTS)
+
+
+def _report(label: str, fn, number: int, per: int = 1) -> None:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<44} {best / number / per * 1e6:10.2f} us/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    parser.add_argument("--tables", type=int, default=40, help="tables in the synthetic schema")
+    args = parser.parse_args()
+
+    started = timeit.default_timer()
+    precompile_prompts(MAX_SQL_STATEMENTS)
+    print(f"precompile_prompts: {(timeit.default_timer() - started) * 1e3:.2f} ms (once, at startup)\n")
+
+    modes = len(SQL_MODES)
+    _report("system prompt + tokens, built per call", _uncached_planner, args.number, modes)
+    _report("system prompt + tokens, precompiled", _cached_planner, args.number, modes)
+    _report("langchain mode rules, formatted per call", _uncached_langchain, args.number, modes)
+    _report("langchain system prompt, precompiled", _cached_langchain, args.number, modes)
+
+    schema = _synthetic_schema(args.tables)
+    history = [{"role": "user", "content": "show all tables"}, {"role": "assistant", "content": "Listed 40 tables."}]
+
+    def plan_messages() -> None:
+        _plan_messages(
+            schema=schema,
+            question="how many rows in table_3 where col_3_2 is 'pune'",
+            chat_history=history,
+            sql_mode="read_only",
+            memory_user_turns=5,
+            max_sql_statements=MAX_SQL_STATEMENTS,
+            model="llama-3.3-70b-versatile",
+        )
+
+    _report(f"_plan_messages, {args.tables}-table schema", plan_messages, max(1, args.number // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import difflib
 import json
 import re
-from dataclasses import dataclass
-from typing import Any, Literal
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Literal, Sequence
 
 import sqlparse
 
-from .db import PostgresDB, QueryResult
-from .llm_client import LLMChatMessage, chat_completion
+from .cost_gate import CostThresholds, CostVerdict, PlanEstimate, evaluate_cost
+from .db import AsyncPostgresDB, PostgresDB, QueryResult
+from .llm_client import (
+    LLMChatMessage,
+    chat_completion,
+    chat_completion_async,
+    chat_completion_stream_async,
+    context_cache_active,
+)
+from .plan_cache import PlanCache, PlanKey, plan_cache_key
+from .plan_stream import PlanStreamParser
+from .prompt_budget import DEFAULT_MAX_OUTPUT_TOKENS, PromptBudget, PromptSection, fit_sections, input_budget
+from .prompts import planner_system_prompt, planner_system_tokens
+from .schema import SchemaModel, TableInfo
+from .schema_index import DEFAULT_TOKEN_BUDGET, DEFAULT_TOP_K, select_schema, tokenize
 from .sql_safety import (
     SQLMode,
     UnsafeSQLError,
@@ -30,6 +45,12 @@ class NL2SQLResponse:
     sql_statements: list[str]
     results: list[QueryResult] | None
     answer: str
+    cached: bool = False
+    plan_summary: list[PlanEstimate | None] | None = None
+    warnings: list[str] | None = None
+    needs_confirmation: bool = False
+    plan_cached: bool = False
+    prompt_tokens: dict[str, Any] | None = None
 
 
 _JSON_BLOCK = re.compile(r"\{[\s\S]*\}")
@@ -37,8 +58,13 @@ _SQL_BLOCK = re.compile(r"```sql\s*([\s\S]*?)\s*```", re.IGNORECASE)
 
 
 def _format_short_history(chat_history: list[dict[str, str]] | None, *, max_user_prompts: int = 5) -> str:
+    return "\n".join(_history_turns(chat_history, max_user_prompts=max_user_prompts)).strip()
+
+
+def _history_turns(chat_history: list[dict[str, str]] | None, *, max_user_prompts: int = 5) -> list[str]:
+    """The last ``max_user_prompts`` exchanges, oldest first, one ``USER:``/``ASSISTANT:`` block each."""
     if not chat_history:
-        return ""
+        return []
 
     pairs: list[tuple[str, str | None]] = []
     last_assistant: str | None = None
@@ -57,54 +83,7 @@ def _format_short_history(chat_history: list[dict[str, str]] | None, *, max_user
                 break
 
     pairs.reverse()
-    lines: list[str] = []
-    for u, a in pairs:
-        lines.append(f"USER: {u}")
-        if a:
-            lines.append(f"ASSISTANT: {a}")
-    return "\n".join(lines).strip()
-
-
-def _schema_identifiers(schema_text: str) -> list[str]:
-    out: list[str] = []
-    for line in (schema_text or "").splitlines():
-        s = line.strip()
-        if s.startswith("TABLE "):
-            out.append(s.replace("TABLE ", "").strip())
-        elif s.startswith("- ") or s.startswith("  - "):
-            m = re.search(r"-\s*([A-Za-z_][A-Za-z_0-9]*)\s*\(", s)
-            if m:
-                out.append(m.group(1))
-    return sorted(set(out))
-
-
-def _parse_schema(schema_text: str) -> tuple[set[str], dict[str, set[str]], dict[str, str]]:
-    tables: set[str] = set()
-    table_cols: dict[str, set[str]] = {}
-    basename_map: dict[str, str] = {}
-    basename_counts: dict[str, int] = {}
-
-    current_table: str | None = None
-    for line in (schema_text or "").splitlines():
-        s = line.strip()
-        if s.startswith("TABLE "):
-            current_table = s.replace("TABLE ", "").strip()
-            if current_table:
-                tables.add(current_table)
-                table_cols.setdefault(current_table, set())
-                base = current_table.split(".")[-1]
-                basename_counts[base] = basename_counts.get(base, 0) + 1
-        elif current_table and (s.startswith("- ") or s.startswith("  - ")):
-            m = re.search(r"-\s*([A-Za-z_][A-Za-z_0-9]*)\s*\(", s)
-            if m:
-                table_cols.setdefault(current_table, set()).add(m.group(1))
-
-    for t in tables:
-        base = t.split(".")[-1]
-        if basename_counts.get(base) == 1:
-            basename_map[base] = t
-
-    return tables, table_cols, basename_map
+    return [f"USER: {u}\nASSISTANT: {a}" if a else f"USER: {u}" for u, a in pairs]
 
 
 _SQL_STRING = re.compile(r"(?:E)?'(?:[^']|'')*'")
@@ -126,19 +105,16 @@ def _is_system_relation(name: str) -> bool:
     return n.startswith("information_schema.") or n.startswith("pg_catalog.")
 
 
-def _resolve_table_name(name: str, tables: set[str], basename_map: dict[str, str]) -> str | None:
+def _resolve_table_name(name: str, schema: SchemaModel) -> str | None:
     raw = (name or "").strip().strip('"')
     if not raw:
         return None
     if _is_system_relation(raw):
         return raw
-    if raw in tables:
+    if raw in schema.table_names:
         return raw
-    if raw.count(".") == 1:
-        if raw in tables:
-            return raw
-    if "." not in raw and raw in basename_map:
-        return basename_map[raw]
+    if "." not in raw and raw in schema.basename_map:
+        return schema.basename_map[raw]
     return None
 
 
@@ -146,8 +122,7 @@ def _identifier_suggestions(name: str, candidates: list[str], *, n: int = 3) ->
     return difflib.get_close_matches((name or "").strip(), candidates, n=n, cutoff=0.72)
 
 
-def _validate_schema_usage(sql: str, schema_text: str) -> str | None:
-    tables, table_cols, basename_map = _parse_schema(schema_text)
+def _validate_schema_usage(sql: str, schema: SchemaModel) -> str | None:
     masked = _mask_sql_for_scan(sql)
 
     reserved = {
@@ -173,9 +148,9 @@ def _validate_schema_usage(sql: str, schema_text: str) -> str | None:
     alias_map: dict[str, str] = {}
     for m in _AFTER_FROM_JOIN.finditer(masked):
         table_token = m.group(2)
-        resolved = _resolve_table_name(table_token, tables, basename_map)
+        resolved = _resolve_table_name(table_token, schema)
         if resolved is None:
-            options = sorted(tables)
+            options = sorted(schema.table_names)
             sugg = _identifier_suggestions(table_token, options)
             if sugg:
                 return f"I couldn't find table '{table_token}'. Did you mean: {', '.join(sugg)}?"
@@ -199,7 +174,7 @@ def _validate_schema_usage(sql: str, schema_text: str) -> str | None:
             continue
         if _is_system_relation(table):
             continue
-        cols = table_cols.get(table) or set()
+        cols = schema.table_columns.get(table) or frozenset()
         if col not in cols:
             sugg = _identifier_suggestions(col, sorted(cols))
             if sugg:
@@ -209,8 +184,7 @@ def _validate_schema_usage(sql: str, schema_text: str) -> str | None:
     return None
 
 
-
-def _spelling_suggestions(question: str, identifiers: list[str], *, limit: int = 10) -> str:
+def _spelling_suggestions(question: str, identifiers: Sequence[str], *, limit: int = 10) -> str:
     words = re.findall(r"[A-Za-z_][A-Za-z_0-9]{2,}", question or "")
     suggestions: list[str] = []
     for w in sorted(set(words), key=len, reverse=True)[:40]:
@@ -223,21 +197,9 @@ def _spelling_suggestions(question: str, identifiers: list[str], *, limit: int =
     return "\n".join(suggestions[:limit])
 
 
-def _schema_column_names(schema_text: str) -> list[str]:
-    cols: list[str] = []
-    for line in (schema_text or "").splitlines():
-        s = line.strip()
-        if s.startswith("- ") or s.startswith("  - "):
-            m = re.search(r"-\s*([A-Za-z_][A-Za-z_0-9]*)\s*\(", s)
-            if m:
-                cols.append(m.group(1))
-    return sorted(set(cols))
-
-
-def _gender_columns(schema_text: str) -> list[str]:
-    cols = _schema_column_names(schema_text)
+def _gender_columns(schema: SchemaModel) -> list[str]:
     out: list[str] = []
-    for c in cols:
+    for c in schema.column_names:
         lc = c.lower()
         if lc in ("gender", "sex") or "gndr" in lc or "gender" in lc or "sex" in lc:
             out.append(c)
@@ -271,10 +233,10 @@ def _gender_intent(question: str) -> str | None:
     return None
 
 
-def _value_normalization_hints(schema_text: str, question: str) -> str:
+def _value_normalization_hints(schema: SchemaModel, question: str) -> str:
     lines: list[str] = []
     gender = _gender_intent(question)
-    gender_cols = _gender_columns(schema_text)
+    gender_cols = _gender_columns(schema)
     if gender and gender_cols:
         if gender == "male":
             variants = ["male", "m", "man", "men", "boy"]
@@ -317,161 +279,111 @@ def _extract_plan(text: str) -> dict[str, Any] | None:
     return data
 
 
-def generate_plan(
+def _plan_messages(
     *,
-    provider: str,
-    api_key: str,
-    model: str,
-    schema_text: str,
+    schema: SchemaModel,
     question: str,
-    chat_history: list[dict[str, str]] | None = None,
-    sql_mode: SQLMode = "read_only",
-    memory_user_turns: int = 5,
-    max_sql_statements: int = 1,
-) -> dict[str, Any]:
-    history_text = _format_short_history(chat_history, max_user_prompts=max(1, int(memory_user_turns)))
+    chat_history: list[dict[str, str]] | None,
+    sql_mode: SQLMode,
+    memory_user_turns: int,
+    max_sql_statements: int,
+    model: str = "",
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+) -> tuple[list[LLMChatMessage], PromptBudget]:
+    """System + user messages for the planner over ``schema`` (the tables the prompt may see),
+    trimmed to the model's prompt budget.
+
+    When the estimate does not fit, older chat turns go first, then the typo and value
+    hints, then the schema tables least related to the question (the most relevant one is
+    always kept).
+    Without PostGIS the PostGIS rules are left out of the system prompt.
+    """
+    history = _history_turns(chat_history, max_user_prompts=max(1, int(memory_user_turns)))
     max_sql_statements = max(1, int(max_sql_statements))
 
-    mode_rules = (
-        "SQL mode: READ ONLY.\n"
-        f"- Output up to {max_sql_statements} statement(s), separated by semicolons.\n"
-        "- Allowed: SELECT or WITH.\n"
-        "- Forbidden: any write/delete/ddl operations.\n"
+    spatial = schema.has_postgis
+    system = planner_system_prompt(sql_mode, max_sql_statements, spatial)
+
+    typo_hints = _spelling_suggestions(question, schema.identifiers)
+    value_hints = _value_normalization_hints(schema, question)
+
+    banner = f"{schema.banner}\n\n" if schema.banner else ""
+    sections = [
+        PromptSection(
+            "system", (system,), required=True, tokens=(planner_system_tokens(sql_mode, max_sql_statements, spatial),)
+        ),
+        PromptSection(
+            "schema",
+            tuple(t.block for t in schema.tables),
+            priority=2,
+            min_parts=1,
+            header=f"SCHEMA:\n{banner}",
+            joiner="\n\n",
+            ranks=_relevance_ranks(schema.tables, question),
+            tokens=tuple(t.tokens for t in schema.tables),
+        ),
+        PromptSection("typo_hints", (typo_hints,) if typo_hints else (), priority=1, header="POSSIBLE TYPO FIXES:\n"),
+        PromptSection(
+            "value_hints", (value_hints,) if value_hints else (), priority=1, header="VALUE NORMALIZATION HINTS:\n"
+        ),
+        # Newest turn first in value, so the oldest turns are dropped first.
+        PromptSection(
+            "history",
+            tuple(history),
+            header="CHAT HISTORY:\n",
+            ranks=tuple(range(len(history) - 1, -1, -1)),
+        ),
+        PromptSection("question", (f"QUESTION:\n{question}\n",), required=True),
+    ]
+    texts, report = fit_sections(
+        sections,
+        budget=input_budget(model, max_output_tokens=max_output_tokens, configured=prompt_token_budget),
+        output_tokens=max_output_tokens,
     )
-    if sql_mode == "write_no_delete":
-        mode_rules = (
-            "SQL mode: WRITE (NO DELETE).\n"
-            f"- Output up to {max_sql_statements} statement(s), separated by semicolons.\n"
-            "- Allowed: SELECT/WITH, INSERT, UPDATE, and CREATE TABLE/VIEW/INDEX.\n"
-            "- Forbidden: DELETE, DROP, ALTER, TRUNCATE, GRANT/REVOKE, COPY, VACUUM, functions/procedures.\n"
-            "- Prefer safe changes: use WHERE clauses for UPDATE; use RETURNING * when helpful.\n"
-        )
-    if sql_mode == "write_full":
-        mode_rules = (
-            "SQL mode: WRITE (FULL CRUD).\n"
-            f"- Output up to {max_sql_statements} statement(s), separated by semicolons.\n"
-            "- Allowed: SELECT/WITH, INSERT, UPDATE, DELETE, and CREATE TABLE/VIEW/INDEX.\n"
-            "- Forbidden: DROP, ALTER, TRUNCATE, GRANT/REVOKE, COPY, VACUUM, functions/procedures.\n"
-            "- Prefer safe changes: use WHERE clauses for UPDATE/DELETE; use RETURNING * when helpful.\n"
-        )
+    # Static text first (rules, then schema) so the prefix is byte-identical across questions and
+    # can be served from a provider cache; only the user message varies per request.
+    prefix = f"{texts['system']}\n\n{texts['schema']}" if texts["schema"] else texts["system"]
+    user = "".join(f"{texts[name]}\n\n" for name in ("typo_hints", "value_hints", "history") if texts[name])
+    messages = [
+        LLMChatMessage(role="system", content=prefix, cacheable=True),
+        LLMChatMessage(role="user", content=user + texts["question"]),
+    ]
+    return messages, report
+
+
+def _prompt_schema(
+    provider: str,
+    schema: SchemaModel,
+    question: str,
+    *,
+    chat_history: list[dict[str, str]] | None,
+    top_k: int,
+    token_budget: int,
+) -> SchemaModel:
+    # With a context cache the schema belongs to the cached prefix: a per-question slice would never hit it.
+    if context_cache_active(provider):
+        token_budget = 0
+    return select_schema(schema, question, chat_history=chat_history, top_k=top_k, token_budget=token_budget).schema
 
-    system = (
-        "You are an ENTERPRISE-GRADE PostgreSQL + PostGIS database assistant.\n"
-        "This is for an IT consulting and geospatial analytics company.\n"
-        "You must ALWAYS return valid JSON.\n"
-        "\n"
-        "Output schema:\n"
-        "- kind: one of \"chat\" | \"clarify\" | \"sql\"\n"
-        "- message: string (concise response or clarification question)\n"
-        "- sql: string (only when kind=\"sql\", otherwise empty)\n"
-        "\n"
-        "Decision logic:\n"
-        "- If the user provides a greeting (e.g., hi/hello/namaste), acknowledge briefly with kind=\"chat\".\n"
-        "- If the user requests database query, output kind=\"sql\" with optimized PostgreSQL statement(s).\n"
-        "- If the user requests INSERT/UPDATE/DELETE but provides incomplete info, request clarification with kind=\"clarify\".\n"
-        "- If the user refers to non-existent tables/columns, respond with kind=\"clarify\" and suggest corrections.\n"
-        "- For spatial/location queries without clear columns, ask for clarification.\n"
-        "- Always respond in English, regardless of input language.\n"
-        "\n"
-        "SQL rules:\n"
-        f"{mode_rules}"
-        "\n"
-        "=== ADVANCED POSTGRESQL FEATURES ===\n"
-        "* Support window functions: ROW_NUMBER(), RANK(), DENSE_RANK(), LAG(), LEAD(), NTILE()\n"
-        "* Support CTEs (WITH) for complex queries and recursive queries\n"
-        "* Support JSON/JSONB operations: ->, ->>, #>, jsonb_agg(), jsonb_build_object()\n"
-        "* Support array operations: array_agg(), unnest(), ANY(), ALL()\n"
-        "* Support full-text search: to_tsvector(), to_tsquery(), @@\n"
-        "* Support FILTER clause: COUNT(*) FILTER (WHERE condition)\n"
-        "* Use LATERAL joins for correlated subqueries when beneficial\n"
-        "* Use DISTINCT ON for efficient deduplication\n"
-        "\n"
-        "=== POSTGIS / GIS SUPPORT ===\n"
-        "SPATIAL COLUMN DETECTION:\n"
-        "* Identify geometry/geography columns automatically from schema\n"
-        "* Common spatial column names: geom, geometry, location, the_geom, shape, position\n"
-        "\n"
-        "LOCATION INTENT RECOGNITION (Multi-language):\n"
-        "English: near, around, within, inside, outside, close to, nearby, distance, radius\n"
-        "Hindi/Hinglish: paas (पास), najdeek (नजदीक), aas-paas (आस-पास), andar (अंदर), bahar (बाहर), doori (दूरी), fasla (फासला)\n"
-        "\n"
-        "DISTANCE QUERIES:\n"
-        "* For 'within X km/meters': ST_DWithin(geom, point, distance_in_meters)\n"
-        "* For 'distance between': ST_Distance(geom1, geom2)\n"
-        "* For spherical distance: ST_DistanceSphere(geom1, geom2)\n"
-        "* For nearest neighbors: ORDER BY geom <-> point LIMIT N\n"
-        "* Convert km to meters: X km = X * 1000 meters\n"
-        "\n"
-        "SPATIAL RELATIONSHIPS:\n"
-        "* 'inside/andar': ST_Contains(boundary, point) or ST_Within(point, boundary)\n"
-        "* 'intersects': ST_Intersects(geom1, geom2)\n"
-        "* 'overlaps': ST_Overlaps(geom1, geom2)\n"
-        "* 'touches': ST_Touches(geom1, geom2)\n"
-        "\n"
-        "GEOMETRY OPERATIONS:\n"
-        "* Buffer/radius: ST_Buffer(geom, distance_in_meters)\n"
-        "* Area calculation: ST_Area(geom) or ST_Area(geom::geography) for spherical\n"
-        "* Length: ST_Length(geom)\n"
-        "* Centroid: ST_Centroid(geom)\n"
-        "* Transform coordinates: ST_Transform(geom, target_srid)\n"
-        "\n"
-        "GEOMETRY CONSTRUCTORS:\n"
-        "* Point: ST_MakePoint(longitude, latitude) or ST_SetSRID(ST_MakePoint(lon, lat), 4326)\n"
-        "* From text: ST_GeomFromText('POINT(lon lat)', srid)\n"
-        "* Geography: ST_GeographyFromText('POINT(lon lat)')\n"
-        "\n"
-        "SPATIAL INDEXING:\n"
-        "* PostGIS uses GIST indexes - queries automatically benefit\n"
-        "* Use ST_DWithin instead of ST_Distance < X for index efficiency\n"
-        "\n"
-        "COORDINATE SYSTEMS:\n"
-        "* SRID 4326: WGS 84 (lat/lon) - most common\n"
-        "* SRID 3857: Web Mercator (for web maps)\n"
-        "* Use geography type for spherical earth calculations\n"
-        "* Use geometry type for planar calculations (with appropriate SRID)\n"
-        "\n"
-        "=== GENERAL RULES ===\n"
-        "* Accept input in English, Hindi, or Hinglish. Respond in English.\n"
-        "* Use only tables/columns from the provided schema with exact names.\n"
-        "* Infer intended table/column names from typos using schema context.\n"
-        "* Use explicit table qualifiers for potentially ambiguous columns.\n"
-        "* For text filters, use case-insensitive matching: LOWER(TRIM(col)).\n"
-        "* Supported operations: +, -, *, /, %, SUM/AVG/MIN/MAX, COUNT, CASE, COALESCE.\n"
-        "* CRITICAL: Cast TEXT/VARCHAR columns to numeric before aggregation: SUM(NULLIF(regexp_replace(col, '[^0-9\\\\.-]', '', 'g'), '')::numeric).\n"
-        "* Prevent division by zero: use NULLIF(denominator, 0).\n"
-        "* For duplicates: GROUP BY ... HAVING COUNT(*) > 1.\n"
-        "* To list tables/columns: query information_schema.\n"
-        "* Use PostgreSQL syntax: LIMIT (not SQL Server's TOP).\n"
-        "* Prefer single SELECT with WHERE ... IN (...) over UNION for simple filters.\n"
-        "* For UNION with per-branch LIMIT: (SELECT ... LIMIT 1) UNION ALL (SELECT ... LIMIT 1).\n"
-        "* For INSERT/UPDATE/DELETE: include RETURNING * to show affected rows.\n"
-        "* Complex queries permitted: JOINs, CTEs, GROUP BY, set operations, window functions.\n"
-        "* Add LIMIT to list queries for efficiency.\n"
-        "* Optimize queries: use appropriate indexes, avoid SELECT *, use EXPLAIN when helpful.\n"
-    )
 
-    identifiers = _schema_identifiers(schema_text)
-    typo_hints = _spelling_suggestions(question, identifiers)
-    value_hints = _value_normalization_hints(schema_text, question)
+@lru_cache(maxsize=4096)
+def _block_words(block: str) -> frozenset[str]:
+    return frozenset(tokenize(block))
 
-    user = (
-        f"SCHEMA:\n{schema_text}\n\n"
-        f"{('POSSIBLE TYPO FIXES:\n' + typo_hints + '\n\n') if typo_hints else ''}"
-        f"{('VALUE NORMALIZATION HINTS:\n' + value_hints + '\n\n') if value_hints else ''}"
-        f"{'CHAT HISTORY:\n' + history_text + '\n\n' if history_text else ''}"
-        f"QUESTION:\n{question}\n"
-    )
 
-    content = chat_completion(
-        provider=provider,  # type: ignore[arg-type]
-        api_key=api_key,
-        model=model,
-        fallback_models=["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
-        messages=[LLMChatMessage(role="system", content=system), LLMChatMessage(role="user", content=user)],
-        temperature=0.2,
-        max_tokens=1000,
-        timeout_s=45,
-    )
+def _relevance_ranks(tables: Sequence[TableInfo], question: str) -> tuple[int, ...]:
+    """Rank of each table by word overlap with the question (0 = most relevant, ties keep schema order)."""
+    words = set(tokenize(question))
+    scores = [len(words & _block_words(t.block)) for t in tables]
+    order = sorted(range(len(tables)), key=lambda i: -scores[i])
+    ranks = [0] * len(tables)
+    for rank, i in enumerate(order):
+        ranks[i] = rank
+    return tuple(ranks)
+
+
+def _plan_from_content(content: str) -> dict[str, Any]:
     plan = _extract_plan(content)
     if plan is None:
         data = _extract_json(content)
@@ -486,52 +398,204 @@ def generate_plan(
     return plan
 
 
-def answer_question(
+def _is_plan(content: str) -> bool:
+    # A hedged call only counts as answered once it produced a usable plan.
+    return _extract_plan(content) is not None
+
+
+def _plan_key(
+    *,
+    provider: str,
+    model: str,
+    schema: SchemaModel,
+    question: str,
+    chat_history: list[dict[str, str]] | None,
+    sql_mode: SQLMode,
+    memory_user_turns: int,
+    max_sql_statements: int,
+) -> PlanKey:
+    return plan_cache_key(
+        question=question,
+        schema_fingerprint=schema.fingerprint or schema.text,
+        sql_mode=sql_mode,
+        max_sql_statements=max_sql_statements,
+        model=f"{provider}:{model}",
+        # Exactly the history the prompt would carry.
+        history=_format_short_history(chat_history, max_user_prompts=memory_user_turns),
+        identifiers=schema.identifiers,
+    )
+
+
+def _plan_fits_schema(plan: dict[str, Any], schema: SchemaModel) -> bool:
+    # A plan borrowed from a similar question must still name real tables/columns.
+    sql = plan.get("sql") or ""
+    return bool(sql.strip()) and _validate_schema_usage(sql, schema) is None
+
+
+_PLAN_FALLBACK_MODELS = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"]
+
+
+def generate_plan(
     *,
     provider: str,
     api_key: str,
     model: str,
-    db: PostgresDB,
+    schema: SchemaModel,
     question: str,
     chat_history: list[dict[str, str]] | None = None,
-    statement_timeout_ms: int = 8000,
-    max_rows: int = 200,
     sql_mode: SQLMode = "read_only",
-    execute: bool = True,
-    sql_override: str | None = None,
     memory_user_turns: int = 5,
     max_sql_statements: int = 1,
-) -> NL2SQLResponse:
-    schema_text = db.fetch_schema()
-    raw_sql = (sql_override or "").strip()
-    kind: Literal["chat", "clarify", "sql"] = "sql"
-    message = ""
-    if not raw_sql:
-        plan = generate_plan(
-            provider=provider,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+) -> dict[str, Any]:
+    """Plan for ``question``; ``plan["prompt_tokens"]`` reports the estimated tokens per prompt section."""
+    messages, budget = _plan_messages(
+        schema=schema,
+        question=question,
+        chat_history=chat_history,
+        sql_mode=sql_mode,
+        memory_user_turns=memory_user_turns,
+        max_sql_statements=max_sql_statements,
+        model=model,
+        max_output_tokens=max_output_tokens,
+        prompt_token_budget=prompt_token_budget,
+    )
+    content = chat_completion(
+        provider=provider,  # type: ignore[arg-type]
+        api_key=api_key,
+        model=model,
+        fallback_models=_PLAN_FALLBACK_MODELS,
+        messages=messages,
+        temperature=0.2,
+        max_tokens=max_output_tokens,
+        timeout_s=45,
+        validate=_is_plan,
+    )
+    return {**_plan_from_content(content), "prompt_tokens": budget.as_dict()}
+
+
+async def generate_plan_async(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    schema: SchemaModel,
+    question: str,
+    chat_history: list[dict[str, str]] | None = None,
+    sql_mode: SQLMode = "read_only",
+    memory_user_turns: int = 5,
+    max_sql_statements: int = 1,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+    on_sql: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
+    """Plan for ``question``. With ``on_sql``, the completion is streamed and ``on_sql`` is
+    called as soon as the plan's ``sql`` string is closed, before the rest has arrived."""
+    messages, budget = _plan_messages(
+        schema=schema,
+        question=question,
+        chat_history=chat_history,
+        sql_mode=sql_mode,
+        memory_user_turns=memory_user_turns,
+        max_sql_statements=max_sql_statements,
+        model=model,
+        max_output_tokens=max_output_tokens,
+        prompt_token_budget=prompt_token_budget,
+    )
+    if on_sql is not None:
+        parser = PlanStreamParser()
+        parts: list[str] = []
+        async for delta in chat_completion_stream_async(
+            provider=provider,  # type: ignore[arg-type]
             api_key=api_key,
             model=model,
-            schema_text=schema_text,
-            question=question,
-            chat_history=chat_history,
-            sql_mode=sql_mode,
-            memory_user_turns=memory_user_turns,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=max_output_tokens,
+            timeout_s=45,
+            fallback_models=_PLAN_FALLBACK_MODELS,
+            validate=_is_plan,
+        ):
+            parts.append(delta)
+            _notify_sql(parser, delta, on_sql)
+        return {**_plan_from_content("".join(parts)), "prompt_tokens": budget.as_dict()}
+    content = await chat_completion_async(
+        provider=provider,  # type: ignore[arg-type]
+        api_key=api_key,
+        model=model,
+        fallback_models=_PLAN_FALLBACK_MODELS,
+        messages=messages,
+        temperature=0.2,
+        max_tokens=max_output_tokens,
+        timeout_s=45,
+        validate=_is_plan,
+    )
+    return {**_plan_from_content(content), "prompt_tokens": budget.as_dict()}
+
+
+def _notify_sql(parser: PlanStreamParser, delta: str, on_sql: Callable[[str], None]) -> None:
+    for key, value in parser.feed(delta):
+        if key == "sql" and value.strip() and parser.fields.get("kind", "sql") == "sql":
+            on_sql(value)
+
+
+def _early_statements(raw_sql: str, *, schema: SchemaModel, max_rows: int, max_sql_statements: int) -> list[str] | None:
+    """Statements that may run before the plan is complete: only ones that pass read-only validation."""
+    try:
+        prepared = _prepare_statements(
+            raw_sql,
+            schema=schema,
+            sql_mode="read_only",
+            max_rows=max_rows,
             max_sql_statements=max_sql_statements,
+            execute=True,
+            sql_override=None,
         )
-        kind = plan.get("kind", "sql")
-        message = (plan.get("message") or "").strip() if isinstance(plan.get("message"), str) else ""
-        raw_sql = (plan.get("sql") or "").strip() if isinstance(plan.get("sql"), str) else ""
+    except NL2SQLError:
+        return None
+    return prepared if isinstance(prepared, list) else None
 
-        if kind in ("chat", "clarify"):
-            return NL2SQLResponse(kind=kind, sql="", sql_statements=[], results=None, answer=message or "Acknowledged.")
-        if not raw_sql:
-            return NL2SQLResponse(kind="clarify", sql="", sql_statements=[], results=None, answer=message or "Please provide additional details to proceed.")
 
+def _discard(task: "asyncio.Task[Any] | None") -> None:
+    if task is not None and not task.done():
+        task.cancel()
+
+
+def _silence(task: "asyncio.Task[Any]") -> None:
+    # Early work that gets discarded must not log "exception was never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+def _plan_outcome(plan: dict[str, Any]) -> tuple[str, str | NL2SQLResponse]:
+    """Split a plan into (message, raw SQL) or (message, early response for chat/clarify)."""
+    kind = plan.get("kind", "sql")
+    message = (plan.get("message") or "").strip() if isinstance(plan.get("message"), str) else ""
+    raw_sql = (plan.get("sql") or "").strip() if isinstance(plan.get("sql"), str) else ""
+
+    if kind in ("chat", "clarify"):
+        return message, NL2SQLResponse(kind=kind, sql="", sql_statements=[], results=None, answer=message or "Acknowledged.")
+    if not raw_sql:
+        return message, NL2SQLResponse(kind="clarify", sql="", sql_statements=[], results=None, answer=message or "Please provide additional details to proceed.")
+    return message, raw_sql
+
+
+def _prepare_statements(
+    raw_sql: str,
+    *,
+    schema: SchemaModel,
+    sql_mode: SQLMode,
+    max_rows: int,
+    max_sql_statements: int,
+    execute: bool,
+    sql_override: str | None,
+) -> list[str] | NL2SQLResponse:
     try:
         statements = validate_sql(raw_sql, sql_mode=sql_mode, max_statements=max(1, int(max_sql_statements)))
         normalized_statements: list[str] = []
         for s in statements:
-            schema_issue = _validate_schema_usage(s, schema_text)
+            schema_issue = _validate_schema_usage(s, schema)
             if schema_issue:
                 return NL2SQLResponse(kind="clarify", sql="", sql_statements=[], results=None, answer=schema_issue)
             stmt = classify_statement(s)
@@ -552,29 +616,641 @@ def answer_question(
                     answer="UPDATE/DELETE operations require WHERE clause. Specify target records (e.g., WHERE id = ?).",
                 )
         raise NL2SQLError(msg) from e
+    return normalized_statements
 
-    results: list[QueryResult] | None = None
-    if execute:
-        if len(normalized_statements) == 1:
-            results = [db.execute_sql(normalized_statements[0], statement_timeout_ms=statement_timeout_ms)]
-        else:
-            results = db.execute_sql_batch(normalized_statements, statement_timeout_ms=statement_timeout_ms)
 
+def _join_sql(statements: list[str]) -> str:
+    full_sql = ";\n\n".join(statements)
+    return f"{full_sql};" if full_sql else full_sql
+
+
+def _cost_verdict(estimates: list[PlanEstimate | None], thresholds: CostThresholds) -> CostVerdict:
+    return evaluate_cost([e for e in estimates if e is not None], thresholds)
+
+
+def _gated_response(
+    normalized_statements: list[str],
+    estimates: list[PlanEstimate | None],
+    verdict: CostVerdict,
+    *,
+    execute: bool,
+    cost_confirmed: bool,
+) -> NL2SQLResponse | None:
+    """Response to return instead of executing, or None when the cost gate lets the SQL run."""
+    reasons = "; ".join(verdict.reasons)
+    if verdict.decision == "reject":
+        # Shown like a clarification: the user has to narrow the question, nothing can be run.
+        kind: Literal["clarify", "sql"] = "clarify"
+        answer = f"Query rejected by the cost gate: {reasons}. Narrow the question (filters, fewer joins) and try again."
+        needs_confirmation = False
+    elif verdict.decision == "confirm" and execute and not cost_confirmed:
+        kind = "sql"
+        answer = f"This query looks expensive ({reasons}). Confirm to execute it."
+        needs_confirmation = True
+    else:
+        return None
+    return NL2SQLResponse(
+        kind=kind,
+        sql=_join_sql(normalized_statements),
+        sql_statements=normalized_statements,
+        results=None,
+        answer=answer,
+        plan_summary=estimates,
+        warnings=list(verdict.reasons),
+        needs_confirmation=needs_confirmation,
+    )
+
+
+def _final_response(
+    normalized_statements: list[str],
+    results: list[QueryResult] | None,
+    *,
+    message: str,
+    execute: bool,
+    streaming: bool,
+    plan_summary: list[PlanEstimate | None] | None = None,
+    verdict: CostVerdict | None = None,
+    plan_cached: bool = False,
+) -> NL2SQLResponse:
     stmt = classify_statement(normalized_statements[-1])
     if not execute:
         answer = message or "SQL generated. Review before execution."
+    elif streaming:
+        answer = message or "Streaming query results."
     elif stmt in ("select", "with"):
-        last_rows = results[-1].rows if results else []
+        last_rows = results[-1].data if results else []
         answer = message or f"Query returned {len(last_rows)} row(s)."
     else:
         last = results[-1] if results else None
         rc = last.rowcount if last is not None else 0
-        returned = len(last.rows) if last is not None else 0
+        returned = len(last.data) if last is not None else 0
         answer = message or f"{stmt.upper()} executed (affected rows: {rc})."
         if returned:
             answer = f"{answer} Returned {returned} row(s)."
+    if results and not streaming and any(r.truncated for r in results):
+        answer = f"{answer} Results were truncated at the configured row/byte limit."
+    warnings = list(verdict.reasons) if verdict is not None else None
+    if not execute and verdict is not None and verdict.decision == "confirm":
+        answer = f"{answer} Estimated cost is high; execution will need confirmation."
+
+    cached = bool(results) and all(r.cached for r in results or [])
+    return NL2SQLResponse(
+        kind="sql",
+        sql=_join_sql(normalized_statements),
+        sql_statements=normalized_statements,
+        results=results,
+        answer=answer,
+        cached=cached,
+        plan_summary=plan_summary,
+        warnings=warnings,
+        needs_confirmation=not execute and verdict is not None and verdict.decision == "confirm",
+        plan_cached=plan_cached,
+    )
+
+
+def _with_prompt_tokens(response: NL2SQLResponse, plan: dict[str, Any] | None) -> NL2SQLResponse:
+    # Only freshly generated plans carry a prompt report; cached plans and overrides cost no prompt.
+    prompt_tokens = plan.get("prompt_tokens") if plan is not None else None
+    return replace(response, prompt_tokens=prompt_tokens) if prompt_tokens else response
+
+
+def answer_question(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    db: PostgresDB,
+    question: str,
+    chat_history: list[dict[str, str]] | None = None,
+    statement_timeout_ms: int = 8000,
+    max_rows: int = 200,
+    sql_mode: SQLMode = "read_only",
+    execute: bool = True,
+    sql_override: str | None = None,
+    memory_user_turns: int = 5,
+    max_sql_statements: int = 1,
+    stream_results: bool = False,
+    schema_top_k: int = DEFAULT_TOP_K,
+    schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+    cost_thresholds: CostThresholds | None = None,
+    cost_confirmed: bool = False,
+    plan_cache: PlanCache | None = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+) -> NL2SQLResponse:
+    schema = db.fetch_schema()
+    raw_sql = (sql_override or "").strip()
+    message = ""
+    plan: dict[str, Any] | None = None
+    plan_key: PlanKey | None = None
+    if plan_cache is not None:
+        plan_key = _plan_key(
+            provider=provider,
+            model=model,
+            schema=schema,
+            question=question,
+            chat_history=chat_history,
+            sql_mode=sql_mode,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+        )
+        if not raw_sql:
+            plan = plan_cache.get(plan_key, validate=lambda p: _plan_fits_schema(p, schema))
+    plan_cached = plan is not None
+    if not raw_sql:
+        plan = plan or generate_plan(
+            provider=provider,
+            api_key=api_key,
+            model=model,
+            # The prompt only sees the question-relevant slice; SQL is still validated against the full schema.
+            schema=_prompt_schema(
+                provider,
+                schema,
+                question,
+                chat_history=chat_history,
+                top_k=schema_top_k,
+                token_budget=schema_token_budget,
+            ),
+            question=question,
+            chat_history=chat_history,
+            sql_mode=sql_mode,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+            max_output_tokens=max_output_tokens,
+            prompt_token_budget=prompt_token_budget,
+        )
+        message, outcome = _plan_outcome(plan)
+        if isinstance(outcome, NL2SQLResponse):
+            return _with_prompt_tokens(outcome, plan)
+        raw_sql = outcome
+
+    prepared = _prepare_statements(
+        raw_sql,
+        schema=schema,
+        sql_mode=sql_mode,
+        max_rows=max_rows,
+        max_sql_statements=max_sql_statements,
+        execute=execute,
+        sql_override=sql_override,
+    )
+    if isinstance(prepared, NL2SQLResponse):
+        return _with_prompt_tokens(prepared, plan)
+    normalized_statements = prepared
+
+    # Pre-flight: planner estimates only (EXPLAIN without ANALYZE runs nothing).
+    estimates: list[PlanEstimate | None] | None = None
+    verdict: CostVerdict | None = None
+    if cost_thresholds is not None and cost_thresholds.enabled:
+        estimates = db.explain_sql_batch(normalized_statements, statement_timeout_ms=statement_timeout_ms)
+        verdict = _cost_verdict(estimates, cost_thresholds)
+        gated = _gated_response(normalized_statements, estimates, verdict, execute=execute, cost_confirmed=cost_confirmed)
+        if gated is not None:
+            return _with_prompt_tokens(gated, plan)
+
+    all_read = all(classify_statement(s) in ("select", "with") for s in normalized_statements)
+    streaming = execute and stream_results and all_read
+    results: list[QueryResult] | None = None
+    if streaming:
+        # Rows are pulled lazily by the caller through each result's ``stream``.
+        results = [db.stream_sql(s, statement_timeout_ms=statement_timeout_ms) for s in normalized_statements]
+    elif execute:
+        if len(normalized_statements) == 1:
+            results = [db.execute_sql(normalized_statements[0], statement_timeout_ms=statement_timeout_ms)]
+        else:
+            results = db.execute_sql_batch(normalized_statements, statement_timeout_ms=statement_timeout_ms)
+    cacheable = plan is not None and execute and not streaming and not plan_cached
+    if plan_cache is not None and plan_key is not None and cacheable:
+        # Only model plans whose SQL actually ran (a streamed result has not been fetched yet).
+        # Caller-supplied SQL (sql_override) is never cached: it would be served to everyone asking this question.
+        plan_cache.put(plan_key, plan)
+
+    return _with_prompt_tokens(
+        _final_response(
+            normalized_statements,
+            results,
+            message=message,
+            execute=execute,
+            streaming=streaming,
+            plan_summary=estimates,
+            verdict=verdict,
+            plan_cached=plan_cached,
+        ),
+        plan,
+    )
+
+
+async def answer_question_async(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    db: AsyncPostgresDB,
+    question: str,
+    chat_history: list[dict[str, str]] | None = None,
+    statement_timeout_ms: int = 8000,
+    max_rows: int = 200,
+    sql_mode: SQLMode = "read_only",
+    execute: bool = True,
+    sql_override: str | None = None,
+    memory_user_turns: int = 5,
+    max_sql_statements: int = 1,
+    schema_top_k: int = DEFAULT_TOP_K,
+    schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+    cost_thresholds: CostThresholds | None = None,
+    cost_confirmed: bool = False,
+    early_execute: bool | None = None,
+    plan_cache: PlanCache | None = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+) -> NL2SQLResponse:
+    """Same pipeline as answer_question, but never blocks the running event loop.
+
+    With ``early_execute`` (the default in read_only mode) the plan is streamed and
+    read-only SQL starts running as soon as its ``sql`` field is complete, overlapping
+    the rest of the completion. Write modes keep the plan-then-approve flow.
+    """
+    schema = await db.fetch_schema()
+    raw_sql = (sql_override or "").strip()
+    message = ""
+    early: asyncio.Task[list[QueryResult]] | None = None
+    early_statements: list[str] | None = None
+    if early_execute is None:
+        early_execute = sql_mode == "read_only"
+    # The cost gate has to see the plan before anything runs.
+    early_execute = early_execute and execute and not (cost_thresholds is not None and cost_thresholds.enabled)
+
+    def start_early(sql: str) -> None:
+        nonlocal early, early_statements
+        if early is not None:
+            return
+        early_statements = _early_statements(
+            sql, schema=schema, max_rows=max_rows, max_sql_statements=max_sql_statements
+        )
+        if early_statements:
+            early = asyncio.create_task(db.execute_sql_batch(early_statements, statement_timeout_ms=statement_timeout_ms))
+            early.add_done_callback(_silence)
+
+    plan: dict[str, Any] | None = None
+    plan_key: PlanKey | None = None
+    if plan_cache is not None:
+        plan_key = _plan_key(
+            provider=provider,
+            model=model,
+            schema=schema,
+            question=question,
+            chat_history=chat_history,
+            sql_mode=sql_mode,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+        )
+        if not raw_sql:
+            plan = plan_cache.get(plan_key, validate=lambda p: _plan_fits_schema(p, schema))
+    plan_cached = plan is not None
+    if not raw_sql and plan is None:
+        try:
+            plan = await generate_plan_async(
+                provider=provider,
+                api_key=api_key,
+                model=model,
+                # The prompt only sees the question-relevant slice; SQL is still validated against the full schema.
+                schema=_prompt_schema(
+                    provider,
+                    schema,
+                    question,
+                    chat_history=chat_history,
+                    top_k=schema_top_k,
+                    token_budget=schema_token_budget,
+                ),
+                question=question,
+                chat_history=chat_history,
+                sql_mode=sql_mode,
+                memory_user_turns=memory_user_turns,
+                max_sql_statements=max_sql_statements,
+                max_output_tokens=max_output_tokens,
+                prompt_token_budget=prompt_token_budget,
+                on_sql=start_early if early_execute else None,
+            )
+        except BaseException:
+            _discard(early)
+            raise
+    if plan is not None:
+        message, outcome = _plan_outcome(plan)
+        if isinstance(outcome, NL2SQLResponse):
+            _discard(early)
+            return _with_prompt_tokens(outcome, plan)
+        raw_sql = outcome
+
+    prepared = _prepare_statements(
+        raw_sql,
+        schema=schema,
+        sql_mode=sql_mode,
+        max_rows=max_rows,
+        max_sql_statements=max_sql_statements,
+        execute=execute,
+        sql_override=sql_override,
+    )
+    if isinstance(prepared, NL2SQLResponse):
+        _discard(early)
+        return _with_prompt_tokens(prepared, plan)
+    normalized_statements = prepared
+    if early is not None and normalized_statements != early_statements:
+        _discard(early)
+        early = None
+
+    estimates: list[PlanEstimate | None] | None = None
+    verdict: CostVerdict | None = None
+    if cost_thresholds is not None and cost_thresholds.enabled:
+        estimates = await db.explain_sql_batch(normalized_statements, statement_timeout_ms=statement_timeout_ms)
+        verdict = _cost_verdict(estimates, cost_thresholds)
+        gated = _gated_response(normalized_statements, estimates, verdict, execute=execute, cost_confirmed=cost_confirmed)
+        if gated is not None:
+            return _with_prompt_tokens(gated, plan)
+
+    results: list[QueryResult] | None = None
+    if early is not None:
+        results = await early
+    elif execute:
+        results = await db.execute_sql_batch(normalized_statements, statement_timeout_ms=statement_timeout_ms)
+    if plan_cache is not None and plan_key is not None and plan is not None and execute and not plan_cached:
+        # Never cache caller-supplied SQL (sql_override) under the question.
+        plan_cache.put(plan_key, plan)
+
+    return _with_prompt_tokens(
+        _final_response(
+            normalized_statements,
+            results,
+            message=message,
+            execute=execute,
+            streaming=False,
+            plan_summary=estimates,
+            verdict=verdict,
+            plan_cached=plan_cached,
+        ),
+        plan,
+    )
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """One step of answer_question_stream; ``event`` names the SSE event, ``data`` is JSON-serializable."""
+
+    event: Literal["prompt", "delta", "message", "sql", "plan", "columns", "rows", "result", "done"]
+    data: Any
+
+
+async def answer_question_stream(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    db: AsyncPostgresDB,
+    question: str,
+    chat_history: list[dict[str, str]] | None = None,
+    statement_timeout_ms: int = 8000,
+    max_rows: int = 200,
+    sql_mode: SQLMode = "read_only",
+    execute: bool = True,
+    memory_user_turns: int = 5,
+    max_sql_statements: int = 1,
+    schema_top_k: int = DEFAULT_TOP_K,
+    schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+    cost_thresholds: CostThresholds | None = None,
+    early_execute: bool | None = None,
+    plan_cache: PlanCache | None = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+    prompt_token_budget: int = 0,
+    sql_override: str | None = None,
+    cost_confirmed: bool = False,
+) -> AsyncIterator[StreamEvent]:
+    """answer_question_async as a sequence of events: model output deltas as they arrive, then
+    the plan's message, the SQL, and (for reads) result rows batch by batch.
+
+    ``early_execute`` works as in answer_question_async: the first statement's cursor is
+    opened and its first batch fetched while the model is still writing the message.
+    ``sql_override`` and ``cost_confirmed`` run SQL the cost gate held back, as in answer_question_async.
+    """
+    if early_execute is None:
+        early_execute = sql_mode == "read_only"
+    early_execute = early_execute and execute and not (cost_thresholds is not None and cost_thresholds.enabled)
+    early_execute = early_execute and not (sql_override or "").strip()
+    early: asyncio.Task[tuple[QueryResult, AsyncIterator[list[tuple[Any, ...]]] | None, list[tuple[Any, ...]] | None]] | None = None
+    early_statements: list[str] | None = None
+    schema = await db.fetch_schema()
+
+    def start_early(sql: str) -> None:
+        nonlocal early, early_statements
+        if early is not None:
+            return
+        early_statements = _early_statements(
+            sql, schema=schema, max_rows=max_rows, max_sql_statements=max_sql_statements
+        )
+        if early_statements:
+            early = asyncio.create_task(_first_batch(db, early_statements[0], statement_timeout_ms=statement_timeout_ms))
+            early.add_done_callback(_silence)
 
-    full_sql = ";\n\n".join(normalized_statements)
-    if full_sql:
-        full_sql = f"{full_sql};"
-    return NL2SQLResponse(kind="sql", sql=full_sql, sql_statements=normalized_statements, results=results, answer=answer)
+    try:
+        async for ev in _answer_stream(
+            provider=provider,
+            api_key=api_key,
+            model=model,
+            db=db,
+            schema=schema,
+            question=question,
+            chat_history=chat_history,
+            statement_timeout_ms=statement_timeout_ms,
+            max_rows=max_rows,
+            sql_mode=sql_mode,
+            execute=execute,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+            schema_top_k=schema_top_k,
+            schema_token_budget=schema_token_budget,
+            cost_thresholds=cost_thresholds,
+            plan_cache=plan_cache,
+            max_output_tokens=max_output_tokens,
+            prompt_token_budget=prompt_token_budget,
+            sql_override=sql_override,
+            cost_confirmed=cost_confirmed,
+            on_sql=start_early if early_execute else None,
+            early=lambda statements: early if early is not None and statements == early_statements else None,
+        ):
+            yield ev
+    finally:
+        if early is not None:
+            _discard(early)
+            if early.done() and not early.cancelled() and early.exception() is None:
+                _, batches, _ = early.result()
+                if batches is not None:
+                    await batches.aclose()  # type: ignore[attr-defined]
+
+
+async def _first_batch(
+    db: AsyncPostgresDB, sql: str, *, statement_timeout_ms: int
+) -> tuple[QueryResult, AsyncIterator[list[tuple[Any, ...]]] | None, list[tuple[Any, ...]] | None]:
+    result = await db.stream_sql(sql, statement_timeout_ms=statement_timeout_ms)
+    if result.stream is None:
+        return result, None, None
+    batches = db.iter_batches(result.stream)
+    first = await anext(batches, None)
+    return result, batches, first
+
+
+async def _answer_stream(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    db: AsyncPostgresDB,
+    schema: SchemaModel,
+    question: str,
+    chat_history: list[dict[str, str]] | None,
+    statement_timeout_ms: int,
+    max_rows: int,
+    sql_mode: SQLMode,
+    execute: bool,
+    memory_user_turns: int,
+    max_sql_statements: int,
+    schema_top_k: int,
+    schema_token_budget: int,
+    cost_thresholds: CostThresholds | None,
+    plan_cache: PlanCache | None,
+    max_output_tokens: int,
+    prompt_token_budget: int,
+    sql_override: str | None,
+    cost_confirmed: bool,
+    on_sql: Callable[[str], None] | None,
+    early: Callable[[list[str]], "asyncio.Task[Any] | None"],
+) -> AsyncIterator[StreamEvent]:
+    plan_key: PlanKey | None = None
+    plan: dict[str, Any] | None = None
+    if (sql_override or "").strip():
+        # Confirmed SQL is neither planned nor cached under the question.
+        plan_cache = None
+        plan = {"kind": "sql", "sql": sql_override, "message": ""}
+    if plan_cache is not None:
+        plan_key = _plan_key(
+            provider=provider,
+            model=model,
+            schema=schema,
+            question=question,
+            chat_history=chat_history,
+            sql_mode=sql_mode,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+        )
+        plan = plan_cache.get(plan_key, validate=lambda p: _plan_fits_schema(p, schema))
+    plan_cached = plan_cache is not None and plan is not None
+    if plan is None:
+        messages, budget = _plan_messages(
+            schema=_prompt_schema(
+                provider,
+                schema,
+                question,
+                chat_history=chat_history,
+                top_k=schema_top_k,
+                token_budget=schema_token_budget,
+            ),
+            question=question,
+            chat_history=chat_history,
+            sql_mode=sql_mode,
+            memory_user_turns=memory_user_turns,
+            max_sql_statements=max_sql_statements,
+            model=model,
+            max_output_tokens=max_output_tokens,
+            prompt_token_budget=prompt_token_budget,
+        )
+        yield StreamEvent("prompt", budget.as_dict())
+        parser = PlanStreamParser()
+        parts: list[str] = []
+        async for delta in chat_completion_stream_async(
+            provider=provider,  # type: ignore[arg-type]
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=max_output_tokens,
+            timeout_s=45,
+            fallback_models=_PLAN_FALLBACK_MODELS,
+            validate=_is_plan,
+        ):
+            parts.append(delta)
+            if on_sql is not None:
+                _notify_sql(parser, delta, on_sql)
+            yield StreamEvent("delta", delta)
+        plan = _plan_from_content("".join(parts))
+
+    message, outcome = _plan_outcome(plan)
+    if isinstance(outcome, NL2SQLResponse):
+        yield StreamEvent("message", outcome.answer)
+        yield StreamEvent("done", {"kind": outcome.kind})
+        return
+    if message:
+        yield StreamEvent("message", message)
+
+    prepared = _prepare_statements(
+        outcome,
+        schema=schema,
+        sql_mode=sql_mode,
+        max_rows=max_rows,
+        max_sql_statements=max_sql_statements,
+        execute=execute,
+        sql_override=sql_override,
+    )
+    if isinstance(prepared, NL2SQLResponse):
+        yield StreamEvent("message", prepared.answer)
+        yield StreamEvent("done", {"kind": prepared.kind})
+        return
+    statements = prepared
+    yield StreamEvent("sql", {"sql": _join_sql(statements), "statements": statements, "plan_cached": plan_cached})
+
+    if cost_thresholds is not None and cost_thresholds.enabled:
+        estimates = await db.explain_sql_batch(statements, statement_timeout_ms=statement_timeout_ms)
+        verdict = _cost_verdict(estimates, cost_thresholds)
+        yield StreamEvent(
+            "plan",
+            {
+                "estimates": [asdict(e) if e is not None else None for e in estimates],
+                "decision": verdict.decision,
+                "warnings": list(verdict.reasons),
+            },
+        )
+        gated = _gated_response(statements, estimates, verdict, execute=execute, cost_confirmed=cost_confirmed)
+        if gated is not None:
+            yield StreamEvent("message", gated.answer)
+            yield StreamEvent("done", {"kind": gated.kind, "needs_confirmation": gated.needs_confirmation})
+            return
+
+    if not execute:
+        yield StreamEvent("done", {"kind": "sql"})
+        return
+
+    if all(classify_statement(s) in ("select", "with") for s in statements):
+        prefetched = early(statements)
+        for i, stmt in enumerate(statements):
+            if i == 0 and prefetched is not None:
+                result, batches, first = await prefetched
+            else:
+                result, batches, first = await _first_batch(db, stmt, statement_timeout_ms=statement_timeout_ms)
+            stream = result.stream
+            if stream is None or batches is None:
+                yield StreamEvent("columns", {"statement": i, "columns": result.columns})
+                yield StreamEvent("rows", {"statement": i, "rows": result.data})
+                yield StreamEvent("result", {"statement": i, "rowcount": result.rowcount, "truncated": result.truncated})
+                continue
+            yield StreamEvent("columns", {"statement": i, "columns": stream.columns})
+            if first is not None:
+                yield StreamEvent("rows", {"statement": i, "rows": first})
+                async for batch in batches:
+                    yield StreamEvent("rows", {"statement": i, "rows": batch})
+            yield StreamEvent("result", {"statement": i, "rowcount": stream.rows_fetched, "truncated": stream.truncated})
+    else:
+        # Writes run as one transaction, so their results arrive together.
+        results = await db.execute_sql_batch(statements, statement_timeout_ms=statement_timeout_ms)
+        for i, result in enumerate(results):
+            yield StreamEvent("columns", {"statement": i, "columns": result.columns})
+            if result.data:
+                yield StreamEvent("rows", {"statement": i, "rows": result.data})
+            yield StreamEvent("result", {"statement": i, "rowcount": result.rowcount, "truncated": result.truncated})
+    if plan_cache is not None and plan_key is not None and not plan_cached:
+        plan_cache.put(plan_key, plan)
+    yield StreamEvent("done", {"kind": "sql"})
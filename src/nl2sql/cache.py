@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Hashable, Iterable, TypeVar
+
+import sqlparse
+
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    entries: int
+    nbytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    expires_at: float
+    nbytes: int
+    tags: frozenset[str]
+
+
+class TTLCache(Generic[V]):
+    """Thread-safe LRU cache with a per-entry TTL and entry/byte size bounds.
+
+    Entries can carry tags (e.g. table names) so a group of them can be dropped
+    at once with ``invalidate_tags``.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float,
+        max_entries: int = 256,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ):
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, _Entry[V]] = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> V | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: V, *, tags: Iterable[str] = ()) -> None:
+        nbytes = self._sizeof(value) if self._sizeof is not None else 0
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        entry = _Entry(value=value, expires_at=time.monotonic() + self.ttl_s, nbytes=nbytes, tags=frozenset(tags))
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = entry
+            self._nbytes += nbytes
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._nbytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        wanted = set(tags)
+        if not wanted:
+            return 0
+        with self._lock:
+            doomed = [k for k, e in self._data.items() if e.tags & wanted]
+            for k in doomed:
+                self._drop(k)
+            self._invalidations += len(doomed)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                entries=len(self._data),
+                nbytes=self._nbytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self._nbytes -= entry.nbytes
+
+
+def normalize_sql_for_cache(sql: str) -> str:
+    """Canonical text for cache keys: comments stripped, whitespace and keyword case folded.
+
+    String literals are left untouched, so queries that differ only inside a
+    literal never share a key.
+    """
+    parts: list[str] = []
+    for statement in sqlparse.parse(sql or ""):
+        for tok in statement.flatten():
+            if tok.is_whitespace or tok.ttype in sqlparse.tokens.Comment:
+                continue
+            parts.append(tok.normalized if tok.is_keyword else tok.value)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts)
+
+
+def result_cache_key(sql: str, *, schema_fingerprint: str, max_rows: Any, max_bytes: Any) -> tuple[str, str, Any, Any]:
+    return (normalize_sql_for_cache(sql), schema_fingerprint, max_rows, max_bytes)
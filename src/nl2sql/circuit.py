@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    """When a (provider, model) circuit opens, and for how long.
+
+    It opens once ``min_calls`` calls in the last ``window_s`` seconds include at
+    least ``error_rate`` failures, or at least ``slow_rate`` calls slower than
+    ``slow_call_s``. ``0`` disables the corresponding check. After ``open_s`` it lets
+    ``half_open_calls`` probes through: one success closes it, one failure reopens it.
+    """
+
+    window_s: float = 60.0
+    min_calls: int = 5
+    error_rate: float = 0.5
+    slow_call_s: float = 0.0
+    slow_rate: float = 0.5
+    open_s: float = 30.0
+    half_open_calls: int = 1
+
+    @property
+    def enabled(self) -> bool:
+        return self.error_rate > 0 or self.slow_call_s > 0
+
+
+@dataclass
+class _Circuit:
+    state: CircuitState = "closed"
+    outcomes: deque[tuple[float, bool, bool]] = field(default_factory=deque)  # (at, failed, slow)
+    opened_at: float = 0.0
+    probes: int = 0
+    trips: int = 0
+    rejected: int = 0
+    failovers: int = 0
+
+
+class CircuitBreakers:
+    """One circuit per (provider, model). Callers ``acquire`` before a call and ``record`` its outcome."""
+
+    def __init__(self, config: BreakerConfig | None = None):
+        self.config = config or BreakerConfig()
+        self._lock = threading.Lock()
+        self._circuits: dict[tuple[str, str], _Circuit] = {}
+
+    def configure(self, config: BreakerConfig) -> None:
+        with self._lock:
+            if config != self.config:
+                self.config = config
+                self._circuits.clear()
+
+    def _circuit(self, provider: str, model: str) -> _Circuit:
+        return self._circuits.setdefault((provider, model), _Circuit())
+
+    def _advance(self, c: _Circuit, now: float) -> None:
+        if c.state == "open" and now - c.opened_at >= self.config.open_s:
+            c.state = "half_open"
+            c.probes = 0
+
+    def blocked_for(self, provider: str, model: str) -> float:
+        """Seconds until the circuit lets a probe through; 0 when calls may be attempted."""
+        if not self.config.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            c = self._circuits.get((provider, model))
+            if c is None:
+                return 0.0
+            self._advance(c, now)
+            return max(0.0, c.opened_at + self.config.open_s - now) if c.state == "open" else 0.0
+
+    def admits(self, provider: str, model: str) -> bool:
+        """Whether ``acquire`` would let a call through right now; claims nothing."""
+        if not self.config.enabled:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            c = self._circuits.get((provider, model))
+            if c is None:
+                return True
+            self._advance(c, now)
+            return c.state == "closed" or (
+                c.state == "half_open" and c.probes < max(1, self.config.half_open_calls)
+            )
+
+    def acquire(self, provider: str, model: str) -> float:
+        """0 if the call may go ahead (claiming a probe slot when half-open), else seconds until it may."""
+        if not self.config.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            c = self._circuit(provider, model)
+            self._advance(c, now)
+            if c.state == "closed":
+                return 0.0
+            if c.state == "half_open" and c.probes < max(1, self.config.half_open_calls):
+                c.probes += 1
+                return 0.0
+            c.rejected += 1
+            # Half-open with every probe slot taken: try again once the probes have had a chance.
+            return max(0.0, c.opened_at + self.config.open_s - now) or 1.0
+
+    def record(self, provider: str, model: str, *, ok: bool | None, elapsed_s: float) -> None:
+        """Outcome of an acquired call; ``ok=None`` (cancelled, abandoned) only frees its probe slot."""
+        cfg = self.config
+        if not cfg.enabled:
+            return
+        now = time.monotonic()
+        slow = cfg.slow_call_s > 0 and elapsed_s >= cfg.slow_call_s
+        with self._lock:
+            c = self._circuit(provider, model)
+            if c.state == "half_open":
+                c.probes = max(0, c.probes - 1)
+                if ok is None:
+                    return
+                if ok and not slow:
+                    c.state = "closed"
+                    c.outcomes.clear()
+                else:
+                    self._open(c, now)
+                return
+            if ok is None or c.state == "open":
+                return
+            c.outcomes.append((now, not ok, slow))
+            while c.outcomes and c.outcomes[0][0] < now - cfg.window_s:
+                c.outcomes.popleft()
+            calls = len(c.outcomes)
+            if calls < max(1, cfg.min_calls):
+                return
+            failed = sum(1 for _, f, _ in c.outcomes if f)
+            slow_calls = sum(1 for _, _, s in c.outcomes if s)
+            if (cfg.error_rate > 0 and failed / calls >= cfg.error_rate) or (
+                cfg.slow_call_s > 0 and slow_calls / calls >= cfg.slow_rate
+            ):
+                self._open(c, now)
+
+    def _open(self, c: _Circuit, now: float) -> None:
+        c.state = "open"
+        c.opened_at = now
+        c.trips += 1
+        c.outcomes.clear()
+
+    def failed_over(self, provider: str, model: str) -> None:
+        with self._lock:
+            self._circuit(provider, model).failovers += 1
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            out: dict[str, dict[str, Any]] = {}
+            for (provider, model), c in self._circuits.items():
+                self._advance(c, now)
+                recent = [o for o in c.outcomes if o[0] >= now - self.config.window_s]
+                out[f"{provider}:{model}"] = {
+                    "state": c.state,
+                    "recent_calls": len(recent),
+                    "error_rate": round(sum(1 for _, f, _ in recent if f) / len(recent), 3) if recent else 0.0,
+                    "slow_rate": round(sum(1 for _, _, s in recent if s) / len(recent), 3) if recent else 0.0,
+                    "retry_in_s": round(max(0.0, c.opened_at + self.config.open_s - now), 2) if c.state == "open" else 0.0,
+                    "trips": c.trips,
+                    "rejected": c.rejected,
+                    "failovers": c.failovers,
+                }
+            return out
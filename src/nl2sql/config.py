@@ -1,16 +1,65 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Literal
 
-Provider = Literal["gemini", "groq"]
+from .confirm import DEFAULT_CONFIRM_TTL_S
+from .cost_gate import CostThresholds
+from .circuit import BreakerConfig
+from .context_cache import ContextCacheConfig, ContextCacheMode
+from .llm_client import DEFAULT_GEMINI_MODEL_TTL_S, FailoverTarget, HedgeConfig, HTTPConfig
+from .mock_llm import MockConfig
+from .rate_limit import RateLimitConfig
+
+Provider = Literal["gemini", "groq", "mock"]
+ReplicaBalance = Literal["round_robin", "least_loaded"]
 
 DEFAULT_PROVIDER: Provider = "gemini"
 DEFAULT_GEMINI_MODEL = "gemini-1.5-flash-latest"
 DEFAULT_GROQ_MODEL = "llama-3.3-70b-versatile"
 DEFAULT_MEMORY_USER_TURNS = 5
 DEFAULT_MAX_SQL_STATEMENTS = 4
+DEFAULT_POOL_MIN_SIZE = 1
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_POOL_MAX_LIFETIME_S = 1800.0
+DEFAULT_POOL_PRE_PING_IDLE_S = 30.0
+DEFAULT_POOL_TIMEOUT_S = 30.0
+DEFAULT_SCHEMA_CACHE_TTL_S = 60.0
+DEFAULT_MAX_RESULT_ROWS = 10000
+DEFAULT_MAX_RESULT_BYTES = 16 * 1024 * 1024
+DEFAULT_STREAM_BATCH_SIZE = 500
+DEFAULT_RESULT_CACHE_TTL_S = 0.0
+DEFAULT_RESULT_CACHE_MAX_ENTRIES = 256
+DEFAULT_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_PLAN_CACHE_TTL_S = 3600.0
+DEFAULT_PLAN_CACHE_MAX_ENTRIES = 512
+DEFAULT_SEMANTIC_CACHE_THRESHOLD = 0.0  # off; 0.95 is a reasonable value when enabled
+DEFAULT_SCHEMA_TOP_K = 8
+DEFAULT_SCHEMA_TOKEN_BUDGET = 6000
+DEFAULT_MAX_OUTPUT_TOKENS = 1000
+DEFAULT_PROMPT_TOKEN_BUDGET = 0  # 0 = the model's context window minus the output reservation
+DEFAULT_REPLICA_BALANCE: ReplicaBalance = "round_robin"
+DEFAULT_REPLICA_MAX_LAG_S = 5.0
+DEFAULT_LLM_POOL_SIZE = 10
+DEFAULT_LLM_KEEPALIVE_S = 60.0
+DEFAULT_LLM_CONNECT_TIMEOUT_S = 5.0
+DEFAULT_LLM_MAX_CONCURRENCY = 8
+DEFAULT_LLM_RATE_LIMIT = 0  # 0 = follow the provider's rate-limit headers only
+DEFAULT_LLM_MAX_RETRIES = 3
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_DELAY_S = 2.0
+DEFAULT_HEDGE_MAX_WORKERS = 16
+DEFAULT_MOCK_LATENCY = "lognormal:0.8:0.5"
+DEFAULT_BREAKER_WINDOW_S = 60.0
+DEFAULT_BREAKER_MIN_CALLS = 5
+DEFAULT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_BREAKER_SLOW_CALL_S = 0.0  # 0 = latency does not trip the breaker
+DEFAULT_BREAKER_OPEN_S = 30.0
+DEFAULT_CONTEXT_CACHE_TTL_S = 3600.0
+DEFAULT_CONTEXT_CACHE_MIN_TOKENS = 1024  # below this the provider won't cache a prefix
+# Cost gate limits are off (0) unless configured.
+DEFAULT_COST_LIMIT = 0
 
 
 def _get_int(name: str, default: int) -> int:
@@ -23,6 +72,21 @@ def _get_int(name: str, default: int) -> int:
         return default
 
 
+def _get_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def _get_urls(name: str) -> tuple[str, ...]:
+    raw = os.getenv(name) or ""
+    return tuple(u.strip() for u in raw.split(",") if u.strip())
+
+
 @dataclass(frozen=True)
 class Settings:
     provider: Provider
@@ -33,6 +97,132 @@ class Settings:
     max_rows: int
     memory_user_turns: int
     max_sql_statements: int
+    pool_min_size: int = DEFAULT_POOL_MIN_SIZE
+    pool_max_size: int = DEFAULT_POOL_MAX_SIZE
+    pool_max_lifetime_s: float = DEFAULT_POOL_MAX_LIFETIME_S
+    pool_pre_ping_idle_s: float = DEFAULT_POOL_PRE_PING_IDLE_S
+    pool_timeout_s: float = DEFAULT_POOL_TIMEOUT_S
+    schema_cache_ttl_s: float = DEFAULT_SCHEMA_CACHE_TTL_S
+    max_result_rows: int = DEFAULT_MAX_RESULT_ROWS
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES
+    stream_batch_size: int = DEFAULT_STREAM_BATCH_SIZE
+    result_cache_ttl_s: float = DEFAULT_RESULT_CACHE_TTL_S
+    result_cache_max_entries: int = DEFAULT_RESULT_CACHE_MAX_ENTRIES
+    result_cache_max_bytes: int = DEFAULT_RESULT_CACHE_MAX_BYTES
+    plan_cache_ttl_s: float = DEFAULT_PLAN_CACHE_TTL_S
+    plan_cache_max_entries: int = DEFAULT_PLAN_CACHE_MAX_ENTRIES
+    semantic_cache_threshold: float = DEFAULT_SEMANTIC_CACHE_THRESHOLD
+    schema_top_k: int = DEFAULT_SCHEMA_TOP_K
+    schema_token_budget: int = DEFAULT_SCHEMA_TOKEN_BUDGET
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+    prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET
+    cost_warn: float = DEFAULT_COST_LIMIT
+    cost_confirm: float = DEFAULT_COST_LIMIT
+    cost_reject: float = DEFAULT_COST_LIMIT
+    rows_warn: int = DEFAULT_COST_LIMIT
+    rows_confirm: int = DEFAULT_COST_LIMIT
+    rows_reject: int = DEFAULT_COST_LIMIT
+    confirm_secret: str = ""
+    confirm_ttl_s: float = DEFAULT_CONFIRM_TTL_S
+    replica_urls: tuple[str, ...] = ()
+    replica_balance: ReplicaBalance = DEFAULT_REPLICA_BALANCE
+    replica_max_lag_s: float = DEFAULT_REPLICA_MAX_LAG_S
+    llm_pool_size: int = DEFAULT_LLM_POOL_SIZE
+    llm_keepalive_s: float = DEFAULT_LLM_KEEPALIVE_S
+    llm_connect_timeout_s: float = DEFAULT_LLM_CONNECT_TIMEOUT_S
+    llm_http2: bool = True
+    llm_max_concurrency: int = DEFAULT_LLM_MAX_CONCURRENCY
+    llm_rpm: int = DEFAULT_LLM_RATE_LIMIT
+    llm_tpm: int = DEFAULT_LLM_RATE_LIMIT
+    llm_max_retries: int = DEFAULT_LLM_MAX_RETRIES
+    gemini_model_ttl_s: float = DEFAULT_GEMINI_MODEL_TTL_S
+    hedge_provider: str = ""  # empty = no hedging
+    hedge_model: str = ""
+    hedge_api_key: str = ""
+    hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE
+    hedge_delay_s: float = DEFAULT_HEDGE_DELAY_S
+    hedge_max_workers: int = DEFAULT_HEDGE_MAX_WORKERS
+    mock_replay_path: str = ""
+    mock_latency: str = DEFAULT_MOCK_LATENCY
+    mock_seed: int = 0
+    mock_record_path: str = ""
+    breaker_window_s: float = DEFAULT_BREAKER_WINDOW_S
+    breaker_min_calls: int = DEFAULT_BREAKER_MIN_CALLS
+    breaker_error_rate: float = DEFAULT_BREAKER_ERROR_RATE
+    breaker_slow_call_s: float = DEFAULT_BREAKER_SLOW_CALL_S
+    breaker_open_s: float = DEFAULT_BREAKER_OPEN_S
+    failover_provider: str = ""  # empty = fail fast while a circuit is open
+    failover_model: str = ""
+    failover_api_key: str = ""
+    context_cache: ContextCacheMode = "off"
+    context_cache_ttl_s: float = DEFAULT_CONTEXT_CACHE_TTL_S
+    context_cache_min_tokens: int = DEFAULT_CONTEXT_CACHE_MIN_TOKENS
+
+    @property
+    def http_config(self) -> HTTPConfig:
+        return HTTPConfig(
+            pool_size=self.llm_pool_size,
+            keepalive_s=self.llm_keepalive_s,
+            connect_timeout_s=self.llm_connect_timeout_s,
+            http2=self.llm_http2,
+            max_concurrency=self.llm_max_concurrency,
+        )
+
+    @property
+    def rate_limit_config(self) -> RateLimitConfig:
+        return RateLimitConfig(rpm=self.llm_rpm, tpm=self.llm_tpm, max_retries=self.llm_max_retries)
+
+    @property
+    def hedge_config(self) -> HedgeConfig:
+        return HedgeConfig(
+            provider=self.hedge_provider,
+            model=self.hedge_model,
+            api_key=self.hedge_api_key,
+            percentile=self.hedge_percentile,
+            initial_delay_s=self.hedge_delay_s,
+            max_workers=self.hedge_max_workers,
+        )
+
+    @property
+    def breaker_config(self) -> BreakerConfig:
+        return BreakerConfig(
+            window_s=self.breaker_window_s,
+            min_calls=self.breaker_min_calls,
+            error_rate=self.breaker_error_rate,
+            slow_call_s=self.breaker_slow_call_s,
+            open_s=self.breaker_open_s,
+        )
+
+    @property
+    def failover_target(self) -> FailoverTarget:
+        return FailoverTarget(provider=self.failover_provider, model=self.failover_model, api_key=self.failover_api_key)
+
+    @property
+    def context_cache_config(self) -> ContextCacheConfig:
+        return ContextCacheConfig(
+            mode=self.context_cache, ttl_s=self.context_cache_ttl_s, min_tokens=self.context_cache_min_tokens
+        )
+
+    @property
+    def mock_config(self) -> MockConfig:
+        return MockConfig(
+            replay_path=self.mock_replay_path,
+            latency=self.mock_latency,
+            seed=self.mock_seed,
+            record_path=self.mock_record_path,
+            record_provider=self.provider if self.provider != "mock" else "",
+        )
+
+    @property
+    def cost_thresholds(self) -> CostThresholds:
+        return CostThresholds(
+            warn_cost=self.cost_warn,
+            confirm_cost=self.cost_confirm,
+            reject_cost=self.cost_reject,
+            warn_rows=self.rows_warn,
+            confirm_rows=self.rows_confirm,
+            reject_rows=self.rows_reject,
+        )
 
 
 def load_settings() -> Settings:
@@ -52,6 +242,41 @@ def load_settings() -> Settings:
         provider = "groq"
         api_key = groq_key
         model = os.getenv("GROQ_MODEL", DEFAULT_GROQ_MODEL).strip() or DEFAULT_GROQ_MODEL
+    if os.getenv("NL2SQL_LLM_PROVIDER", "").strip().lower() == "mock":
+        # Offline replay for load tests: no key needed, but the apps expect a non-empty one.
+        provider = "mock"
+        api_key = "mock"
+        model = "mock"
+
+    # Hedging: repeat slow calls on a second provider (or another model of the same one).
+    hedge_provider = os.getenv("NL2SQL_HEDGE_PROVIDER", "").strip().lower()
+    hedge_key = {"gemini": gemini_key, "groq": groq_key}.get(hedge_provider, "")
+    hedge_model = os.getenv("NL2SQL_HEDGE_MODEL", "").strip()
+    if hedge_provider == "gemini" and not hedge_model:
+        hedge_model = os.getenv("GEMINI_MODEL", DEFAULT_GEMINI_MODEL).strip() or DEFAULT_GEMINI_MODEL
+    elif hedge_provider == "groq" and not hedge_model:
+        hedge_model = os.getenv("GROQ_MODEL", DEFAULT_GROQ_MODEL).strip() or DEFAULT_GROQ_MODEL
+
+    # Failover while the primary's circuit is open; opt-in, so adding a second API key never
+    # changes which model answers.
+    failover_provider = os.getenv("NL2SQL_FAILOVER_PROVIDER", "").strip().lower()
+    failover_key = {"gemini": gemini_key, "groq": groq_key}.get(failover_provider, "")
+    failover_model = os.getenv("NL2SQL_FAILOVER_MODEL", "").strip()
+    if failover_provider == "gemini" and not failover_model:
+        failover_model = os.getenv("GEMINI_MODEL", DEFAULT_GEMINI_MODEL).strip() or DEFAULT_GEMINI_MODEL
+    elif failover_provider == "groq" and not failover_model:
+        failover_model = os.getenv("GROQ_MODEL", DEFAULT_GROQ_MODEL).strip() or DEFAULT_GROQ_MODEL
+
+    replica_balance: ReplicaBalance = DEFAULT_REPLICA_BALANCE
+    if os.getenv("NL2SQL_REPLICA_BALANCE", "").strip().lower() == "least_loaded":
+        replica_balance = "least_loaded"
+
+    context_cache: ContextCacheMode = "off"
+    context_cache_mode = os.getenv("NL2SQL_CONTEXT_CACHE", "").strip().lower()
+    if context_cache_mode == "gemini":
+        context_cache = "gemini"
+    elif context_cache_mode == "local":
+        context_cache = "local"
 
     return Settings(
         provider=provider,
@@ -62,6 +287,66 @@ def load_settings() -> Settings:
         max_rows=_get_int("NL2SQL_MAX_ROWS", 200),
         memory_user_turns=_get_int("NL2SQL_MEMORY_USER_TURNS", DEFAULT_MEMORY_USER_TURNS),
         max_sql_statements=_get_int("NL2SQL_MAX_SQL_STATEMENTS", DEFAULT_MAX_SQL_STATEMENTS),
+        pool_min_size=_get_int("NL2SQL_POOL_MIN_SIZE", DEFAULT_POOL_MIN_SIZE),
+        pool_max_size=_get_int("NL2SQL_POOL_MAX_SIZE", DEFAULT_POOL_MAX_SIZE),
+        pool_max_lifetime_s=_get_float("NL2SQL_POOL_MAX_LIFETIME_S", DEFAULT_POOL_MAX_LIFETIME_S),
+        pool_pre_ping_idle_s=_get_float("NL2SQL_POOL_PRE_PING_IDLE_S", DEFAULT_POOL_PRE_PING_IDLE_S),
+        pool_timeout_s=_get_float("NL2SQL_POOL_TIMEOUT_S", DEFAULT_POOL_TIMEOUT_S),
+        schema_cache_ttl_s=_get_float("NL2SQL_SCHEMA_CACHE_TTL_S", DEFAULT_SCHEMA_CACHE_TTL_S),
+        max_result_rows=_get_int("NL2SQL_MAX_RESULT_ROWS", DEFAULT_MAX_RESULT_ROWS),
+        max_result_bytes=_get_int("NL2SQL_MAX_RESULT_BYTES", DEFAULT_MAX_RESULT_BYTES),
+        stream_batch_size=_get_int("NL2SQL_STREAM_BATCH_SIZE", DEFAULT_STREAM_BATCH_SIZE),
+        result_cache_ttl_s=_get_float("NL2SQL_RESULT_CACHE_TTL_S", DEFAULT_RESULT_CACHE_TTL_S),
+        result_cache_max_entries=_get_int("NL2SQL_RESULT_CACHE_MAX_ENTRIES", DEFAULT_RESULT_CACHE_MAX_ENTRIES),
+        result_cache_max_bytes=_get_int("NL2SQL_RESULT_CACHE_MAX_BYTES", DEFAULT_RESULT_CACHE_MAX_BYTES),
+        plan_cache_ttl_s=_get_float("NL2SQL_PLAN_CACHE_TTL_S", DEFAULT_PLAN_CACHE_TTL_S),
+        plan_cache_max_entries=_get_int("NL2SQL_PLAN_CACHE_MAX_ENTRIES", DEFAULT_PLAN_CACHE_MAX_ENTRIES),
+        semantic_cache_threshold=_get_float("NL2SQL_SEMANTIC_CACHE_THRESHOLD", DEFAULT_SEMANTIC_CACHE_THRESHOLD),
+        schema_top_k=_get_int("NL2SQL_SCHEMA_TOP_K", DEFAULT_SCHEMA_TOP_K),
+        schema_token_budget=_get_int("NL2SQL_SCHEMA_TOKEN_BUDGET", DEFAULT_SCHEMA_TOKEN_BUDGET),
+        max_output_tokens=_get_int("NL2SQL_MAX_OUTPUT_TOKENS", DEFAULT_MAX_OUTPUT_TOKENS),
+        prompt_token_budget=_get_int("NL2SQL_PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET),
+        cost_warn=_get_float("NL2SQL_COST_WARN", DEFAULT_COST_LIMIT),
+        cost_confirm=_get_float("NL2SQL_COST_CONFIRM", DEFAULT_COST_LIMIT),
+        cost_reject=_get_float("NL2SQL_COST_REJECT", DEFAULT_COST_LIMIT),
+        rows_warn=_get_int("NL2SQL_ROWS_WARN", DEFAULT_COST_LIMIT),
+        rows_confirm=_get_int("NL2SQL_ROWS_CONFIRM", DEFAULT_COST_LIMIT),
+        rows_reject=_get_int("NL2SQL_ROWS_REJECT", DEFAULT_COST_LIMIT),
+        confirm_secret=os.getenv("NL2SQL_CONFIRM_SECRET", "").strip(),
+        confirm_ttl_s=_get_float("NL2SQL_CONFIRM_TTL_S", DEFAULT_CONFIRM_TTL_S),
+        replica_urls=_get_urls("DATABASE_REPLICA_URLS"),
+        replica_balance=replica_balance,
+        replica_max_lag_s=_get_float("NL2SQL_REPLICA_MAX_LAG_S", DEFAULT_REPLICA_MAX_LAG_S),
+        llm_pool_size=_get_int("NL2SQL_LLM_POOL_SIZE", DEFAULT_LLM_POOL_SIZE),
+        llm_keepalive_s=_get_float("NL2SQL_LLM_KEEPALIVE_S", DEFAULT_LLM_KEEPALIVE_S),
+        llm_connect_timeout_s=_get_float("NL2SQL_LLM_CONNECT_TIMEOUT_S", DEFAULT_LLM_CONNECT_TIMEOUT_S),
+        llm_http2=os.getenv("NL2SQL_LLM_HTTP2", "1").strip().lower() not in ("0", "false", "no", "off"),
+        llm_max_concurrency=_get_int("NL2SQL_LLM_MAX_CONCURRENCY", DEFAULT_LLM_MAX_CONCURRENCY),
+        llm_rpm=_get_int("NL2SQL_LLM_RPM", DEFAULT_LLM_RATE_LIMIT),
+        llm_tpm=_get_int("NL2SQL_LLM_TPM", DEFAULT_LLM_RATE_LIMIT),
+        llm_max_retries=_get_int("NL2SQL_LLM_MAX_RETRIES", DEFAULT_LLM_MAX_RETRIES),
+        gemini_model_ttl_s=_get_float("NL2SQL_GEMINI_MODEL_TTL_S", DEFAULT_GEMINI_MODEL_TTL_S),
+        hedge_provider=hedge_provider if hedge_key else "",
+        hedge_model=hedge_model,
+        hedge_api_key=hedge_key,
+        hedge_percentile=_get_float("NL2SQL_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE),
+        hedge_delay_s=_get_float("NL2SQL_HEDGE_DELAY_S", DEFAULT_HEDGE_DELAY_S),
+        hedge_max_workers=_get_int("NL2SQL_HEDGE_MAX_WORKERS", DEFAULT_HEDGE_MAX_WORKERS),
+        mock_replay_path=os.getenv("NL2SQL_MOCK_REPLAY", "").strip(),
+        mock_latency=os.getenv("NL2SQL_MOCK_LATENCY", "").strip() or DEFAULT_MOCK_LATENCY,
+        mock_seed=_get_int("NL2SQL_MOCK_SEED", 0),
+        mock_record_path=os.getenv("NL2SQL_MOCK_RECORD", "").strip(),
+        breaker_window_s=_get_float("NL2SQL_BREAKER_WINDOW_S", DEFAULT_BREAKER_WINDOW_S),
+        breaker_min_calls=_get_int("NL2SQL_BREAKER_MIN_CALLS", DEFAULT_BREAKER_MIN_CALLS),
+        breaker_error_rate=_get_float("NL2SQL_BREAKER_ERROR_RATE", DEFAULT_BREAKER_ERROR_RATE),
+        breaker_slow_call_s=_get_float("NL2SQL_BREAKER_SLOW_CALL_S", DEFAULT_BREAKER_SLOW_CALL_S),
+        breaker_open_s=_get_float("NL2SQL_BREAKER_OPEN_S", DEFAULT_BREAKER_OPEN_S),
+        failover_provider=failover_provider if failover_key else "",
+        failover_model=failover_model if failover_key else "",
+        failover_api_key=failover_key,
+        context_cache=context_cache,
+        context_cache_ttl_s=_get_float("NL2SQL_CONTEXT_CACHE_TTL_S", DEFAULT_CONTEXT_CACHE_TTL_S),
+        context_cache_min_tokens=_get_int("NL2SQL_CONTEXT_CACHE_MIN_TOKENS", DEFAULT_CONTEXT_CACHE_MIN_TOKENS),
     )
 
 
@@ -71,16 +356,11 @@ def load_settings_custom() -> Settings:
     # Override database_url with customer database
     customer_db_url = os.getenv("DATABASE_URL_CUSTOMER", "").strip()
     if customer_db_url:
-        return Settings(
-            provider=settings.provider,
-            api_key=settings.api_key,
-            model=settings.model,
-            database_url=customer_db_url,
-            statement_timeout_ms=settings.statement_timeout_ms,
-            max_rows=settings.max_rows,
-            memory_user_turns=settings.memory_user_turns,
-            max_sql_statements=settings.max_sql_statements,
-        )
+        # Replicas of the default primary don't apply to a different database.
+        settings = replace(settings, database_url=customer_db_url, replica_urls=())
+    customer_replicas = _get_urls("DATABASE_REPLICA_URLS_CUSTOMER")
+    if customer_replicas:
+        settings = replace(settings, replica_urls=customer_replicas)
     return settings
 
 
@@ -90,14 +370,8 @@ def load_settings_langchain() -> Settings:
     # Override database_url with GIS database
     gis_db_url = os.getenv("DATABASE_URL_GIS", "").strip()
     if gis_db_url:
-        return Settings(
-            provider=settings.provider,
-            api_key=settings.api_key,
-            model=settings.model,
-            database_url=gis_db_url,
-            statement_timeout_ms=settings.statement_timeout_ms,
-            max_rows=settings.max_rows,
-            memory_user_turns=settings.memory_user_turns,
-            max_sql_statements=settings.max_sql_statements,
-        )
+        settings = replace(settings, database_url=gis_db_url, replica_urls=())
+    gis_replicas = _get_urls("DATABASE_REPLICA_URLS_GIS")
+    if gis_replicas:
+        settings = replace(settings, replica_urls=gis_replicas)
     return settings
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+DEFAULT_CONFIRM_TTL_S = 600.0
+
+# Without a configured secret, tokens are only valid in the process that issued them.
+_PROCESS_SECRET = secrets.token_bytes(32)
+
+
+class ConfirmationError(RuntimeError):
+    pass
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _mac(body: str, secret: str) -> str:
+    key = secret.encode("utf-8") if secret else _PROCESS_SECRET
+    return _b64(hmac.new(key, body.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_confirmation(question: str, sql: str, *, secret: str = "", ttl_s: float = DEFAULT_CONFIRM_TTL_S) -> str:
+    """Signed token for SQL the server held back for confirmation; only ``verify_confirmation`` can redeem it."""
+    body = _b64(json.dumps({"q": question, "sql": sql, "exp": time.time() + ttl_s}).encode("utf-8"))
+    return f"{body}.{_mac(body, secret)}"
+
+
+def verify_confirmation(token: str, question: str, *, secret: str = "") -> str:
+    """The SQL ``token`` was issued for, if it is authentic, unexpired and was issued for ``question``."""
+    body, _, mac = (token or "").partition(".")
+    if not body or not hmac.compare_digest(mac, _mac(body, secret)):
+        raise ConfirmationError("Invalid confirmation token")
+    try:
+        data = json.loads(_unb64(body))
+    except ValueError as e:
+        raise ConfirmationError("Invalid confirmation token") from e
+    if data.get("q") != question:
+        raise ConfirmationError("Confirmation token was issued for a different question")
+    if float(data.get("exp", 0)) < time.time():
+        raise ConfirmationError("Confirmation token expired; ask the question again")
+    return str(data.get("sql") or "")
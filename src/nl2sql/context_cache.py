@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Sequence
+
+from .prompt_budget import count_tokens
+
+ContextCacheMode = Literal["off", "gemini", "local"]
+
+# create(provider, model, prefix, api_key=, timeout_s=, ttl_s=) -> handle name, or None if the provider refused.
+CreateHandle = Callable[..., "str | None"]
+
+
+@dataclass(frozen=True)
+class ContextCacheConfig:
+    """Explicit provider context caching of the static prompt prefix (system rules + schema).
+
+    ``gemini`` stores the prefix as a Gemini ``cachedContents`` resource; ``local``
+    hands out in-process handles (no provider involved) for tests and offline
+    runs. Prefixes under ``min_tokens`` (the provider's minimum) are sent as-is.
+    """
+
+    mode: ContextCacheMode = "off"
+    ttl_s: float = 3600.0
+    min_tokens: int = 1024
+
+
+def prefix_digest(prefix: Sequence[Any]) -> str:
+    h = hashlib.sha256()
+    for m in prefix:
+        h.update(f"{m.role}\0{m.content}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def local_handle(provider: str, model: str, prefix: Sequence[Any], **_: Any) -> str:
+    return f"local/{provider}/{prefix_digest(prefix)[:24]}"
+
+
+class ContextCache:
+    """One provider cache handle per (provider, model, prefix), created on first use and reused until
+    shortly before it expires. A refused creation (prefix too small, quota...) is not retried for ``ttl_s``."""
+
+    def __init__(
+        self,
+        create: CreateHandle,
+        *,
+        providers: frozenset[str] | None = None,
+        ttl_s: float = 3600.0,
+        min_tokens: int = 0,
+    ):
+        self._create = create
+        self.providers = providers
+        self.ttl_s = max(60.0, float(ttl_s))
+        self.min_tokens = max(0, int(min_tokens))
+        self._lock = threading.Lock()
+        self._create_lock = threading.Lock()
+        self._handles: dict[tuple[str, str, str], tuple[str | None, float]] = {}  # -> (name, expires_at)
+        self._hits = 0
+        self._creates = 0
+        self._refused = 0
+        self._skipped = 0
+
+    def supports(self, provider: str) -> bool:
+        return self.providers is None or provider in self.providers
+
+    def _live(self, key: tuple[str, str, str], now: float) -> tuple[bool, str | None]:
+        entry = self._handles.get(key)
+        if entry is None:
+            return False, None
+        name, expires_at = entry
+        # Renew a little early so a request never goes out with a handle that expires mid-flight.
+        margin = min(300.0, self.ttl_s * 0.1) if name else 0.0
+        return (expires_at - margin > now), name
+
+    def handle(self, provider: str, model: str, prefix: Sequence[Any], *, api_key: str, timeout_s: float) -> str | None:
+        if self.min_tokens and count_tokens("".join(m.content for m in prefix)) < self.min_tokens:
+            with self._lock:
+                self._skipped += 1
+            return None
+        key = (provider, model, prefix_digest(prefix))
+        with self._lock:
+            live, name = self._live(key, time.monotonic())
+            if live:
+                self._hits += int(name is not None)
+                return name
+        with self._create_lock:  # one creation at a time, so concurrent misses don't each create a copy
+            with self._lock:
+                live, name = self._live(key, time.monotonic())
+                if live:
+                    self._hits += int(name is not None)
+                    return name
+            name = self._create(provider, model, prefix, api_key=api_key, timeout_s=timeout_s, ttl_s=self.ttl_s)
+            with self._lock:
+                self._handles[key] = (name, time.monotonic() + self.ttl_s)
+                if name:
+                    self._creates += 1
+                else:
+                    self._refused += 1
+            return name
+
+    def invalidate(self, name: str) -> None:
+        """Forget a handle the provider no longer accepts; the next call creates a fresh one."""
+        with self._lock:
+            for key, (n, _) in list(self._handles.items()):
+                if n == name:
+                    del self._handles[key]
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "handles": sum(1 for name, exp in self._handles.values() if name and exp > now),
+                "hits": self._hits,
+                "creates": self._creates,
+                "refused": self._refused,
+                "skipped_small": self._skipped,
+            }
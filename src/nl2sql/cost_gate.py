@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Literal
+
+CostDecision = Literal["ok", "warn", "confirm", "reject"]
+
+_SEVERITY: dict[str, int] = {"ok": 0, "warn": 1, "confirm": 2, "reject": 3}
+
+
+@dataclass(frozen=True)
+class PlanEstimate:
+    """Planner estimate for one statement, from ``EXPLAIN (FORMAT JSON)`` (nothing is executed)."""
+
+    statement: str
+    node_type: str
+    total_cost: float
+    plan_rows: int
+    relations: tuple[str, ...] = ()
+    seq_scans: tuple[str, ...] = ()
+
+    def describe(self) -> str:
+        text = f"{self.node_type}: est. cost {self.total_cost:,.0f}, est. rows {self.plan_rows:,}"
+        if self.seq_scans:
+            text += f" (seq scan on {', '.join(self.seq_scans)})"
+        return text
+
+
+@dataclass(frozen=True)
+class CostThresholds:
+    """Per-statement limits on planner cost and row estimates; ``0`` disables a limit."""
+
+    warn_cost: float = 0.0
+    confirm_cost: float = 0.0
+    reject_cost: float = 0.0
+    warn_rows: int = 0
+    confirm_rows: int = 0
+    reject_rows: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return any((self.warn_cost, self.confirm_cost, self.reject_cost, self.warn_rows, self.confirm_rows, self.reject_rows))
+
+
+@dataclass(frozen=True)
+class CostVerdict:
+    decision: CostDecision
+    estimates: tuple[PlanEstimate, ...]
+    reasons: tuple[str, ...] = ()
+
+
+def summarize_plan(statement: str, explain_output: Any) -> PlanEstimate:
+    """Reduce the JSON document returned by ``EXPLAIN (FORMAT JSON)`` to a PlanEstimate."""
+    doc = explain_output
+    if isinstance(doc, list):
+        doc = doc[0] if doc else {}
+    root = (doc or {}).get("Plan") or {}
+
+    relations: list[str] = []
+    seq_scans: list[str] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        rel = node.get("Relation Name")
+        if rel:
+            if node.get("Schema"):
+                rel = f"{node['Schema']}.{rel}"
+            if rel not in relations:
+                relations.append(rel)
+            if node.get("Node Type") == "Seq Scan" and rel not in seq_scans:
+                seq_scans.append(rel)
+        stack.extend(reversed(node.get("Plans") or []))
+
+    return PlanEstimate(
+        statement=statement,
+        node_type=str(root.get("Node Type") or "?"),
+        total_cost=float(root.get("Total Cost") or 0.0),
+        plan_rows=int(root.get("Plan Rows") or 0),
+        relations=tuple(relations),
+        seq_scans=tuple(seq_scans),
+    )
+
+
+def _check(value: float, limits: tuple[tuple[CostDecision, float], ...], label: str) -> tuple[CostDecision, str | None]:
+    for decision, limit in limits:
+        if limit and value > limit:
+            return decision, f"estimated {label} {value:,.0f} exceeds the {decision} limit of {limit:,.0f}"
+    return "ok", None
+
+
+def evaluate_cost(estimates: list[PlanEstimate], thresholds: CostThresholds) -> CostVerdict:
+    decision: CostDecision = "ok"
+    reasons: list[str] = []
+    for i, est in enumerate(estimates, start=1):
+        prefix = f"statement #{i}: " if len(estimates) > 1 else ""
+        checks = (
+            _check(
+                est.total_cost,
+                (("reject", thresholds.reject_cost), ("confirm", thresholds.confirm_cost), ("warn", thresholds.warn_cost)),
+                "cost",
+            ),
+            _check(
+                est.plan_rows,
+                (("reject", thresholds.reject_rows), ("confirm", thresholds.confirm_rows), ("warn", thresholds.warn_rows)),
+                "rows",
+            ),
+        )
+        for d, reason in checks:
+            if reason:
+                reasons.append(prefix + reason)
+            if _SEVERITY[d] > _SEVERITY[decision]:
+                decision = d
+    return CostVerdict(decision=decision, estimates=tuple(estimates), reasons=tuple(reasons))
@@ -1,90 +1,919 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any
+import asyncio
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from typing import Any, AsyncIterator, Iterator, Literal, Sequence
 
 import psycopg2
+from psycopg2.extensions import make_dsn, parse_dsn
 from psycopg2.extras import RealDictCursor
 
+from .cache import CacheStats, TTLCache, result_cache_key
+from .cost_gate import PlanEstimate, summarize_plan
+from .schema import SchemaModel
+from .sql_safety import (
+    UnsafeSQLError,
+    calls_volatile_function,
+    classify_statement,
+    referenced_tables,
+    validate_readonly_sql,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
 
 class DatabaseError(RuntimeError):
     pass
 
 
+@dataclass(frozen=True)
+class PoolStats:
+    size: int
+    in_use: int
+    idle: int
+    min_size: int
+    max_size: int
+    checkouts: int
+    waits: int
+    wait_ms_total: float
+    wait_ms_max: float
+    connections_opened: int
+    connections_discarded: int
+
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float
+    last_used_at: float
+    statement_timeout_ms: int | None = None
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived psycopg2 connections for one database URL."""
+
+    def __init__(
+        self,
+        database_url: str,
+        *,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime_s: float = 1800.0,
+        pre_ping_idle_s: float = 30.0,
+        acquire_timeout_s: float = 30.0,
+    ):
+        if not database_url:
+            raise DatabaseError("Missing DATABASE_URL")
+        self._database_url = database_url
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.max_lifetime_s = float(max_lifetime_s)
+        self.pre_ping_idle_s = float(pre_ping_idle_s)
+        self.acquire_timeout_s = float(acquire_timeout_s)
+
+        self._cond = threading.Condition()
+        self._idle: list[_PooledConnection] = []
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._opened = 0
+        self._discarded = 0
+
+    def _open(self) -> _PooledConnection:
+        conn = psycopg2.connect(self._database_url)
+        now = time.monotonic()
+        return _PooledConnection(conn=conn, created_at=now, last_used_at=now)
+
+    def _discard(self, pc: _PooledConnection) -> None:
+        self._discarded += 1
+        try:
+            pc.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pc: _PooledConnection, now: float) -> bool:
+        if pc.conn.closed:
+            return True
+        return self.max_lifetime_s > 0 and now - pc.created_at >= self.max_lifetime_s
+
+    def _healthy(self, pc: _PooledConnection, now: float) -> bool:
+        if self.pre_ping_idle_s < 0 or now - pc.last_used_at < self.pre_ping_idle_s:
+            return True
+        try:
+            with pc.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            pc.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self) -> _PooledConnection:
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                pc = None
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate, now):
+                        self._discard(candidate)
+                        continue
+                    pc = candidate
+                    break
+                if pc is not None or self._in_use + len(self._idle) < self.max_size:
+                    # Reserve the slot before releasing the lock (connecting happens outside it).
+                    self._in_use += 1
+                    break
+                waited = True
+                remaining = self.acquire_timeout_s - (now - started)
+                if remaining <= 0:
+                    raise DatabaseError(
+                        f"Connection pool exhausted (max_size={self.max_size}, waited {self.acquire_timeout_s:.1f}s)"
+                    )
+                self._cond.wait(remaining)
+
+            self._checkouts += 1
+            if waited:
+                wait_ms = (time.monotonic() - started) * 1000.0
+                self._waits += 1
+                self._wait_ms_total += wait_ms
+                self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+
+        try:
+            if pc is not None and not self._healthy(pc, time.monotonic()):
+                with self._cond:
+                    self._discard(pc)
+                pc = None
+            if pc is None:
+                pc = self._open()
+                with self._cond:
+                    self._opened += 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return pc
+
+    def _release(self, pc: _PooledConnection, *, broken: bool) -> None:
+        now = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._expired(pc, now):
+                self._discard(pc)
+            else:
+                pc.last_used_at = now
+                self._idle.append(pc)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, *, statement_timeout_ms: int | None = None) -> Iterator[Any]:
+        """Check out a connection; commits on success and rolls back on error."""
+        pc = self._acquire()
+        broken = False
+        try:
+            if statement_timeout_ms is not None and pc.statement_timeout_ms != int(statement_timeout_ms):
+                with pc.conn.cursor() as cur:
+                    cur.execute(f"SET statement_timeout TO '{int(statement_timeout_ms)}ms'")
+                pc.conn.commit()
+                pc.statement_timeout_ms = int(statement_timeout_ms)
+            yield pc.conn
+            pc.conn.commit()
+        except BaseException:
+            try:
+                pc.conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            if pc.conn.closed:
+                broken = True
+            self._release(pc, broken=broken)
+
+    def fill(self) -> None:
+        """Open connections until ``min_size`` are available."""
+        while True:
+            with self._cond:
+                if self._in_use + len(self._idle) >= self.min_size:
+                    return
+                self._in_use += 1
+            try:
+                pc = self._open()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._opened += 1
+            self._release(pc, broken=False)
+
+    @property
+    def load(self) -> float:
+        """Fraction of ``max_size`` currently checked out (unlocked read; used only for balancing)."""
+        return self._in_use / self.max_size
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return PoolStats(
+                size=self._in_use + len(self._idle),
+                in_use=self._in_use,
+                idle=len(self._idle),
+                min_size=self.min_size,
+                max_size=self.max_size,
+                checkouts=self._checkouts,
+                waits=self._waits,
+                wait_ms_total=round(self._wait_ms_total, 3),
+                wait_ms_max=round(self._wait_ms_max, 3),
+                connections_opened=self._opened,
+                connections_discarded=self._discarded,
+            )
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            for pc in idle:
+                self._discard(pc)
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(
+    database_url: str,
+    *,
+    min_size: int = 1,
+    max_size: int = 10,
+    max_lifetime_s: float = 1800.0,
+    pre_ping_idle_s: float = 30.0,
+    acquire_timeout_s: float = 30.0,
+) -> ConnectionPool:
+    """Return the process-wide pool for ``database_url``, creating it (and its ``min_size``
+    connections) on first use."""
+    if not database_url:
+        raise DatabaseError("Missing DATABASE_URL")
+    created = False
+    with _POOLS_LOCK:
+        pool = _POOLS.get(database_url)
+        if pool is None:
+            pool = ConnectionPool(
+                database_url,
+                min_size=min_size,
+                max_size=max_size,
+                max_lifetime_s=max_lifetime_s,
+                pre_ping_idle_s=pre_ping_idle_s,
+                acquire_timeout_s=acquire_timeout_s,
+            )
+            _POOLS[database_url] = pool
+            created = True
+    if created:
+        try:
+            pool.fill()
+        except psycopg2.Error:
+            pass  # the database is down; the first query reports it, and the pool fills on demand
+    return pool
+
+
+def pool_stats() -> dict[str, PoolStats]:
+    """Stats for every pool in this process, keyed by connection parameters (password stripped)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.items())
+    return {_redact_url(url): pool.stats() for url, pool in pools}
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _redact_url(database_url: str) -> str:
+    """``database_url`` (URL or key=value DSN) as a key=value DSN without any password."""
+    try:
+        params = parse_dsn(database_url)
+    except psycopg2.ProgrammingError:
+        return "<unparseable database url>"
+    return make_dsn(**{k: v for k, v in params.items() if "password" not in k})
+
+
+ReplicaBalance = Literal["round_robin", "least_loaded"]
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+# (an idle primary would otherwise make pg_last_xact_replay_timestamp() look stale). NULL (unhealthy)
+# when no WAL receiver is streaming or it has heard nothing for a minute: a disconnected replica
+# has also replayed everything it received. Roles without pg_read_all_stats see a NULL status;
+# for them only a missing receiver process counts.
+_REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (
+        SELECT 1 FROM pg_stat_wal_receiver
+        WHERE pid IS NOT NULL
+          AND (status IS NULL OR (status = 'streaming' AND last_msg_receipt_time > now() - interval '60 seconds'))
+    ) THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+_PROBE_CONNECT_TIMEOUT_S = 2
+_PROBE_STATEMENT_TIMEOUT_MS = 2000
+
+
+@dataclass
+class _Replica:
+    url: str
+    pool: ConnectionPool
+    lag_s: float | None = None
+    healthy: bool = False  # until the first lag check says otherwise
+    checked_at: float = float("-inf")
+    probing: bool = False
+    probe_conn: Any = None  # kept apart from the pool so a check never waits for a free connection
+
+
+class ReplicaSet:
+    """Read replicas behind one primary, picked per read-only batch.
+
+    A replica whose replication lag exceeds ``max_lag_s`` (or that cannot be
+    reached, or whose WAL receiver is down) is skipped until its next lag check,
+    ``lag_check_s`` later. Checks run in the background on a dedicated connection
+    with short connect and statement timeouts, so ``pick`` never blocks on them;
+    until a replica's first check passes, reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        pools: dict[str, ConnectionPool],
+        *,
+        balance: ReplicaBalance = "round_robin",
+        max_lag_s: float = 5.0,
+        lag_check_s: float = 5.0,
+    ):
+        self.balance = balance
+        self.max_lag_s = float(max_lag_s)
+        self.lag_check_s = float(lag_check_s)
+        self._replicas = [_Replica(url=url, pool=pool) for url, pool in pools.items()]
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._start_checks()
+
+    def __len__(self) -> int:
+        return len(self._replicas)
+
+    @property
+    def pools(self) -> list[ConnectionPool]:
+        return [r.pool for r in self._replicas]
+
+    def _lag(self, replica: _Replica) -> float | None:
+        conn = replica.probe_conn
+        if conn is None or conn.closed:
+            conn = psycopg2.connect(
+                replica.url,
+                connect_timeout=_PROBE_CONNECT_TIMEOUT_S,
+                options=f"-c statement_timeout={_PROBE_STATEMENT_TIMEOUT_MS}",
+            )
+            conn.autocommit = True
+            replica.probe_conn = conn
+        with conn.cursor() as cur:
+            cur.execute(_REPLICA_LAG_SQL)
+            lag = cur.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def _check(self, replica: _Replica) -> None:
+        try:
+            lag = self._lag(replica)
+        except Exception:
+            lag = None
+            if replica.probe_conn is not None:
+                try:
+                    replica.probe_conn.close()
+                except Exception:
+                    pass
+                replica.probe_conn = None
+        with self._lock:
+            replica.lag_s = lag
+            replica.healthy = lag is not None and (self.max_lag_s <= 0 or lag <= self.max_lag_s)
+            replica.checked_at = time.monotonic()
+            replica.probing = False
+
+    def _start_checks(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stale = [r for r in self._replicas if not r.probing and now - r.checked_at >= self.lag_check_s]
+            for r in stale:
+                r.probing = True
+        for r in stale:
+            threading.Thread(target=self._check, args=(r,), name="replica-lag-check", daemon=True).start()
+
+    def mark_down(self, pool: ConnectionPool) -> None:
+        with self._lock:
+            for r in self._replicas:
+                if r.pool is pool:
+                    r.healthy = False
+                    r.checked_at = time.monotonic()
+
+    def pick(self) -> ConnectionPool | None:
+        """A replica pool to read from, or None to fall back to the primary."""
+        self._start_checks()
+        with self._lock:
+            candidates = [r for r in self._replicas if r.healthy]
+        if not candidates:
+            return None
+        if self.balance == "least_loaded":
+            return min(candidates, key=lambda r: r.pool.load).pool
+        return candidates[next(self._next) % len(candidates)].pool
+
+    def status(self) -> dict[str, dict[str, Any]]:
+        return {
+            _redact_url(r.url): {"healthy": r.healthy, "lag_s": None if r.lag_s is None else round(r.lag_s, 3)}
+            for r in self._replicas
+        }
+
+
+# Cheap catalog probe: hashes the catalog rows the schema model is built from (relations, grants,
+# columns, keys), so the digest moves exactly when the visible schema changes. It
+# deliberately avoids xmin, which freezing and transaction ID wraparound can rewrite.
+_CATALOG_FINGERPRINT_SQL = """
+SELECT md5(
+    coalesce((
+        SELECT string_agg(
+            concat_ws(':', c.oid, c.relnamespace, c.relname, c.relkind, c.relacl::text), ',' ORDER BY c.oid
+        )
+        FROM pg_catalog.pg_class c
+        WHERE c.relkind IN ('r', 'v', 'm', 'p', 'f')
+    ), '')
+    || '|' || coalesce((
+        SELECT string_agg(
+            concat_ws(':', a.attrelid, a.attnum, a.atttypid, a.atttypmod, a.attname, a.attnotnull, a.attisdropped),
+            ',' ORDER BY a.attrelid, a.attnum
+        )
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        WHERE a.attnum > 0 AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+    ), '')
+    || '|' || coalesce((
+        SELECT string_agg(
+            concat_ws(':', k.oid, k.contype, k.conrelid, k.confrelid, k.conkey::text, k.confkey::text),
+            ',' ORDER BY k.oid
+        )
+        FROM pg_catalog.pg_constraint k
+        WHERE k.contype IN ('p', 'f')
+    ), '')
+    || '|' || (
+        SELECT count(*)::text FROM pg_catalog.pg_extension WHERE extname = 'postgis'
+    )
+) AS fingerprint
+"""
+
+
+@dataclass(frozen=True)
+class _SchemaCacheEntry:
+    model: SchemaModel
+    fingerprint: str
+    checked_at: float
+
+
+_SCHEMA_CACHE: dict[tuple[str, bool], _SchemaCacheEntry] = {}
+_SCHEMA_CACHE_LOCK = threading.Lock()
+
+
+def invalidate_schema_cache(database_url: str | None = None) -> None:
+    """Drop cached schemas for ``database_url`` (or for every database)."""
+    with _SCHEMA_CACHE_LOCK:
+        if database_url is None:
+            _SCHEMA_CACHE.clear()
+            return
+        for key in [k for k in _SCHEMA_CACHE if k[0] == database_url]:
+            del _SCHEMA_CACHE[key]
+
+
+_RESULT_CACHES: dict[str, "TTLCache[QueryResult]"] = {}
+_RESULT_CACHES_LOCK = threading.Lock()
+
+
+def _result_cache_for(database_url: str, *, ttl_s: float, max_entries: int, max_bytes: int | None) -> "TTLCache[QueryResult]":
+    with _RESULT_CACHES_LOCK:
+        cache = _RESULT_CACHES.get(database_url)
+        if cache is None:
+            cache = TTLCache(ttl_s=ttl_s, max_entries=max_entries, max_bytes=max_bytes, sizeof=_result_nbytes)
+            _RESULT_CACHES[database_url] = cache
+    return cache
+
+
+def _is_connection_failure(exc: BaseException | None) -> bool:
+    # QueryCanceled (statement_timeout) is an OperationalError too, but retrying it elsewhere would double the cost.
+    if isinstance(exc, psycopg2.extensions.QueryCanceledError):
+        return False
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def _is_cacheable_read(sql: str, views: frozenset[str]) -> bool:
+    # Writes invalidate by the table names they touch, which never reach a view over those tables;
+    # volatile functions and system catalogs (pg_*) change without any write at all.
+    if calls_volatile_function(sql):
+        return False
+    return not any(name in views or name.startswith("pg_") for name in referenced_tables(sql))
+
+
+def _is_read_only(sql: str) -> bool:
+    # WITH can wrap data-modifying CTEs, so require the full read-only validation.
+    try:
+        validate_readonly_sql(sql)
+    except UnsafeSQLError:
+        return False
+    return True
+
+
 @dataclass(frozen=True)
 class QueryResult:
+    """Result of one statement in columnar-friendly form.
+
+    Column names are stored once and each row is a plain tuple aligned with
+    ``columns``; ``rows`` builds the older list-of-dicts view on first access.
+    """
+
     columns: list[str]
-    rows: list[dict[str, Any]]
-    rowcount: int
+    data: list[tuple[Any, ...]] = field(default_factory=list)
+    rowcount: int = 0
+    truncated: bool = False
+    stream: "ResultStream | None" = None
+    cached: bool = False
+
+    @cached_property
+    def rows(self) -> list[dict[str, Any]]:
+        cols = self.columns
+        return [dict(zip(cols, row)) for row in self.data]
+
+    def column_values(self, index: int) -> list[Any]:
+        return [row[index] for row in self.data]
+
+    def column_arrays(self) -> dict[str, Any]:
+        """Per-column arrays: NumPy-typed for bool/int/float columns when NumPy is available, lists otherwise."""
+        out: dict[str, Any] = {}
+        for i, name in enumerate(self.columns):
+            values = self.column_values(i)
+            out[name] = _as_array(values)
+        return out
+
+
+def _as_array(values: list[Any]) -> Any:
+    if np is None or not values:
+        return values
+    types = {type(v) for v in values if v is not None}
+    has_nulls = any(v is None for v in values)
+    try:
+        if types == {bool} and not has_nulls:
+            return np.asarray(values, dtype=bool)
+        if types == {int} and not has_nulls:
+            return np.asarray(values, dtype=np.int64)
+        if types and types <= {int, float}:
+            return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    except OverflowError:
+        pass
+    return values
+
+
+def _row_nbytes(row: tuple[Any, ...]) -> int:
+    # Rough wire-size estimate; exact sizing would cost more than the rows themselves.
+    return sum(len(str(v)) for v in row if v is not None) + 8 * len(row)
+
+
+def _result_nbytes(result: QueryResult) -> int:
+    return sum(_row_nbytes(row) for row in result.data) + sum(len(c) for c in result.columns)
+
+
+class _RowBudget:
+    def __init__(self, max_rows: int | None, max_bytes: int | None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.nbytes = 0
+        self.truncated = False
+
+    def take(self, batch: list[tuple[Any, ...]]) -> list[tuple[Any, ...]]:
+        if self.truncated:
+            return []
+        kept = batch
+        if self.max_rows is not None and self.rows + len(batch) > self.max_rows:
+            kept = batch[: max(0, self.max_rows - self.rows)]
+            self.truncated = True
+        if self.max_bytes is not None:
+            for i, row in enumerate(kept):
+                size = _row_nbytes(row)
+                if self.nbytes + size > self.max_bytes:
+                    kept = kept[:i]
+                    self.truncated = True
+                    break
+                self.nbytes += size
+        self.rows += len(kept)
+        return kept
+
+
+_CURSOR_IDS = itertools.count(1)
+
+# Statement kinds EXPLAIN accepts; DDL has no plan to estimate.
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+
+class ResultStream:
+    """Rows of one SELECT/WITH statement, fetched lazily in batches through a server-side cursor.
+
+    The pooled connection is held only while the stream is being consumed and is
+    returned as soon as it is exhausted, hits its row/byte budget, or is closed.
+    Use it as a context manager (or call ``close``) when it may be abandoned part way;
+    a stream that is dropped unclosed is closed when it is garbage-collected.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        sql: str,
+        *,
+        statement_timeout_ms: int,
+        batch_size: int,
+        max_rows: int | None,
+        max_bytes: int | None,
+    ):
+        self.sql = sql
+        self.columns: list[str] = []
+        self._pool = pool
+        self._statement_timeout_ms = statement_timeout_ms
+        self._batch_size = max(1, int(batch_size))
+        self._budget = _RowBudget(max_rows, max_bytes)
+        self._batches: Iterator[list[tuple[Any, ...]]] | None = None
+
+    @property
+    def truncated(self) -> bool:
+        return self._budget.truncated
+
+    @property
+    def rows_fetched(self) -> int:
+        return self._budget.rows
+
+    @property
+    def bytes_fetched(self) -> int:
+        return self._budget.nbytes
+
+    def __iter__(self) -> Iterator[list[tuple[Any, ...]]]:
+        if self._batches is None:
+            self._batches = self._fetch_batches()
+        return self._batches
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        for batch in self:
+            for row in batch:
+                yield dict(zip(self.columns, row))
+
+    def close(self) -> None:
+        if self._batches is not None:
+            self._batches.close()  # type: ignore[attr-defined]
+
+    def __enter__(self) -> "ResultStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass  # still being consumed on another thread; the generator releases on its own
+
+    def _fetch_batches(self) -> Iterator[list[tuple[Any, ...]]]:
+        try:
+            with self._pool.connection(statement_timeout_ms=self._statement_timeout_ms) as conn:
+                with conn.cursor(name=f"nl2sql_stream_{next(_CURSOR_IDS)}") as cur:
+                    cur.itersize = self._batch_size
+                    cur.execute(self.sql)
+                    while True:
+                        batch = cur.fetchmany(self._batch_size)
+                        if not self.columns and cur.description is not None:
+                            self.columns = [d.name for d in cur.description]
+                        kept = self._budget.take(batch)
+                        if kept:
+                            yield kept
+                        if not batch or self._budget.truncated:
+                            return
+        except Exception as e:
+            raise DatabaseError(f"Query failed: {e}") from e
 
 
 class PostgresDB:
-    def __init__(self, database_url: str):
+    def __init__(
+        self,
+        database_url: str,
+        *,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_max_lifetime_s: float = 1800.0,
+        pool_pre_ping_idle_s: float = 30.0,
+        pool_timeout_s: float = 30.0,
+        schema_cache_ttl_s: float = 60.0,
+        max_result_rows: int | None = None,
+        max_result_bytes: int | None = None,
+        stream_batch_size: int = 500,
+        result_cache_ttl_s: float = 0.0,
+        result_cache_max_entries: int = 256,
+        result_cache_max_bytes: int | None = None,
+        replica_urls: Sequence[str] = (),
+        replica_balance: ReplicaBalance = "round_robin",
+        replica_max_lag_s: float = 5.0,
+    ):
         if not database_url:
             raise DatabaseError("Missing DATABASE_URL")
         self._database_url = database_url
+        self._schema_cache_ttl_s = float(schema_cache_ttl_s)
+        self._max_result_rows = max_result_rows if max_result_rows and max_result_rows > 0 else None
+        self._max_result_bytes = max_result_bytes if max_result_bytes and max_result_bytes > 0 else None
+        self._stream_batch_size = max(1, int(stream_batch_size))
+        self._result_cache: TTLCache[QueryResult] | None = None
+        if result_cache_ttl_s > 0:
+            self._result_cache = _result_cache_for(
+                database_url,
+                ttl_s=result_cache_ttl_s,
+                max_entries=result_cache_max_entries,
+                max_bytes=result_cache_max_bytes,
+            )
+        pool_options = dict(
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            max_lifetime_s=pool_max_lifetime_s,
+            pre_ping_idle_s=pool_pre_ping_idle_s,
+            acquire_timeout_s=pool_timeout_s,
+        )
+        self._pool = get_pool(database_url, **pool_options)
+        self._replicas: ReplicaSet | None = None
+        replica_urls = [u for u in dict.fromkeys(replica_urls) if u and u != database_url]
+        if replica_urls:
+            self._replicas = ReplicaSet(
+                {url: get_pool(url, **pool_options) for url in replica_urls},
+                balance=replica_balance,
+                max_lag_s=replica_max_lag_s,
+            )
+
+    @classmethod
+    def from_settings(cls, settings: Any, *, database_url: str | None = None) -> "PostgresDB":
+        return cls(
+            database_url if database_url is not None else settings.database_url,
+            pool_min_size=settings.pool_min_size,
+            pool_max_size=settings.pool_max_size,
+            pool_max_lifetime_s=settings.pool_max_lifetime_s,
+            pool_pre_ping_idle_s=settings.pool_pre_ping_idle_s,
+            pool_timeout_s=settings.pool_timeout_s,
+            schema_cache_ttl_s=settings.schema_cache_ttl_s,
+            max_result_rows=settings.max_result_rows,
+            max_result_bytes=settings.max_result_bytes,
+            stream_batch_size=settings.stream_batch_size,
+            result_cache_ttl_s=settings.result_cache_ttl_s,
+            result_cache_max_entries=settings.result_cache_max_entries,
+            result_cache_max_bytes=settings.result_cache_max_bytes,
+            # Replicas follow the configured primary, not an ad-hoc URL typed into a UI.
+            replica_urls=settings.replica_urls if database_url in (None, settings.database_url) else (),
+            replica_balance=settings.replica_balance,
+            replica_max_lag_s=settings.replica_max_lag_s,
+        )
+
+    @property
+    def max_connections(self) -> int:
+        return self._pool.max_size + sum(p.max_size for p in (self._replicas.pools if self._replicas else []))
+
+    def pool_stats(self) -> PoolStats:
+        return self._pool.stats()
+
+    def replica_status(self) -> dict[str, dict[str, Any]]:
+        return self._replicas.status() if self._replicas is not None else {}
+
+    def _read_pool(self, statements: list[str]) -> ConnectionPool | None:
+        """Replica pool for a batch that only reads, else None (the primary)."""
+        if self._replicas is None or not all(_is_read_only(sql) for sql in statements):
+            return None
+        return self._replicas.pick()
+
+    def result_cache_stats(self) -> CacheStats | None:
+        return self._result_cache.stats() if self._result_cache is not None else None
+
+    def _connect(self, *, statement_timeout_ms: int | None = None):
+        return self._pool.connection(statement_timeout_ms=statement_timeout_ms)
+
+    def fetch_schema(self, *, include_system: bool = False, refresh: bool = False) -> SchemaModel:
+        """The schema, parsed once per catalog version; its prompt text is ``.text``."""
+        return self._cached_schema(include_system=include_system, refresh=refresh).model
 
-    def _connect(self):
-        return psycopg2.connect(self._database_url)
+    def fetch_schema_model(self, *, include_system: bool = False, refresh: bool = False) -> SchemaModel:
+        # Same as fetch_schema, kept for older callers.
+        return self.fetch_schema(include_system=include_system, refresh=refresh)
 
-    def fetch_schema(self, *, include_system: bool = False) -> str:
+    def schema_fingerprint(self, *, include_system: bool = False) -> str:
+        """Digest of the catalog state the cached schema was built from; stable until DDL runs."""
+        return self._cached_schema(include_system=include_system).fingerprint
+
+    def _cached_schema(self, *, include_system: bool, refresh: bool = False) -> _SchemaCacheEntry:
+        key = (self._database_url, include_system)
+        ttl = self._schema_cache_ttl_s
+        with _SCHEMA_CACHE_LOCK:
+            entry = _SCHEMA_CACHE.get(key) if ttl >= 0 and not refresh else None
+        if entry is not None and time.monotonic() - entry.checked_at < ttl:
+            return entry
+
+        try:
+            with self._connect() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(_CATALOG_FINGERPRINT_SQL)
+                    fingerprint = cur.fetchone()["fingerprint"]
+                    if entry is not None and entry.fingerprint == fingerprint:
+                        entry = replace(entry, checked_at=time.monotonic())
+                    else:
+                        model = self._load_schema(cur, include_system=include_system, fingerprint=fingerprint)
+                        entry = _SchemaCacheEntry(model=model, fingerprint=fingerprint, checked_at=time.monotonic())
+        except Exception as e:
+            raise DatabaseError(f"Schema fetch failed: {e}") from e
+
+        if ttl >= 0:
+            with _SCHEMA_CACHE_LOCK:
+                _SCHEMA_CACHE[key] = entry
+        return entry
+
+    def _load_schema(self, cur: Any, *, include_system: bool, fingerprint: str) -> SchemaModel:
         where_system = ""
         if not include_system:
             # Exclude system schemas AND system tables (those starting with pg_)
             where_system = """
-            AND table_schema NOT IN ('pg_catalog', 'information_schema')
-            AND table_name NOT LIKE 'pg_%'
-            AND table_name NOT LIKE 'sql_%'
+            AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+            AND n.nspname NOT LIKE 'pg_toast%'
+            AND n.nspname NOT LIKE 'pg_temp%'
+            AND c.relname NOT LIKE 'pg_%'
+            AND c.relname NOT LIKE 'sql_%'
             """
 
-        # Enhanced query to detect PostGIS geometry/geography columns
+        # One round trip straight against pg_catalog (much cheaper than information_schema
+        # on large catalogs): columns and types, PK/FK membership, planner row estimates,
+        # and whether PostGIS is installed.
         sql = f"""
-        SELECT 
-            table_schema, 
-            table_name, 
-            column_name, 
-            data_type,
-            CASE 
-                WHEN udt_name = 'geometry' THEN 'geometry (PostGIS spatial)'
-                WHEN udt_name = 'geography' THEN 'geography (PostGIS spatial)'
-                ELSE data_type
-            END as enhanced_type
-        FROM information_schema.columns
-        WHERE 1=1
-          {where_system}
-        ORDER BY table_schema, table_name, ordinal_position
+        WITH rels AS (
+            SELECT c.oid, n.nspname AS table_schema, c.relname AS table_name, c.relkind,
+                   c.reltuples::bigint AS approx_rows
+            FROM pg_catalog.pg_class c
+            JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+              AND NOT c.relispartition
+              AND pg_catalog.has_table_privilege(c.oid, 'SELECT')
+              {where_system}
+        ),
+        pks AS (
+            SELECT con.conrelid, k.attnum
+            FROM pg_catalog.pg_constraint con
+            CROSS JOIN LATERAL unnest(con.conkey) AS k(attnum)
+            WHERE con.contype = 'p'
+        ),
+        fks AS (
+            SELECT con.conrelid, k.attnum,
+                   fn.nspname || '.' || fc.relname AS ref_table,
+                   fa.attname AS ref_column
+            FROM pg_catalog.pg_constraint con
+            CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, ref_attnum)
+            JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+            JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+            JOIN pg_catalog.pg_attribute fa ON fa.attrelid = con.confrelid AND fa.attnum = k.ref_attnum
+            WHERE con.contype = 'f'
+        )
+        SELECT
+            r.table_schema,
+            r.table_name,
+            r.relkind,
+            r.approx_rows,
+            a.attname AS column_name,
+            pg_catalog.format_type(a.atttypid, a.atttypmod) AS data_type,
+            t.typname AS udt_name,
+            (pk.attnum IS NOT NULL) AS is_pk,
+            fk.ref_table,
+            fk.ref_column,
+            EXISTS (SELECT 1 FROM pg_catalog.pg_extension WHERE extname = 'postgis') AS has_postgis
+        FROM rels r
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = r.oid AND a.attnum > 0 AND NOT a.attisdropped
+        JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+        LEFT JOIN pks pk ON pk.conrelid = r.oid AND pk.attnum = a.attnum
+        LEFT JOIN fks fk ON fk.conrelid = r.oid AND fk.attnum = a.attnum
+        ORDER BY r.table_schema, r.table_name, a.attnum
         """
 
-        try:
-            with self._connect() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    # Check if PostGIS is installed
-                    cur.execute("SELECT COUNT(*) as cnt FROM pg_extension WHERE extname = 'postgis'")
-                    postgis_result = cur.fetchone()
-                    has_postgis = postgis_result['cnt'] > 0 if postgis_result else False
-                    
-                    cur.execute(sql)
-                    rows = cur.fetchall()
-        except Exception as e:
-            raise DatabaseError(f"Schema fetch failed: {e}") from e
-
-        lines: list[str] = []
-        if has_postgis:
-            lines.append("🌍 PostGIS ENABLED - Spatial queries supported\n")
-        
-        current_table = None
-        for r in rows:
-            table = f"{r['table_schema']}.{r['table_name']}"
-            if table != current_table:
-                lines.append(f"\nTABLE {table}")
-                current_table = table
-            
-            # Use enhanced type that highlights PostGIS columns
-            column_type = r['enhanced_type']
-            spatial_marker = " 📍" if 'PostGIS' in column_type or column_type in ('geometry', 'geography') else ""
-            lines.append(f"  - {r['column_name']} ({column_type}){spatial_marker}")
-            
-        return "\n".join(lines).strip()
+        cur.execute(sql)
+        return SchemaModel.from_catalog_rows(cur.fetchall(), fingerprint=fingerprint)
 
     def execute_sql(
         self,
@@ -103,19 +932,227 @@ class PostgresDB:
     ) -> list[QueryResult]:
         if not statements:
             raise DatabaseError("Empty SQL")
+        cache = self._result_cache
+        cache_keys: list[Any] | None = None
+        if cache is not None and all(_is_read_only(sql) for sql in statements):
+            schema = self._cached_schema(include_system=False)
+            if all(_is_cacheable_read(sql, schema.model.view_names) for sql in statements):
+                cache_keys = [
+                    result_cache_key(
+                        sql,
+                        schema_fingerprint=schema.fingerprint,
+                        max_rows=self._max_result_rows,
+                        max_bytes=self._max_result_bytes,
+                    )
+                    for sql in statements
+                ]
+                hits = [cache.get(key) for key in cache_keys]
+                if all(hit is not None for hit in hits):
+                    return [replace(hit, cached=True) for hit in hits]  # type: ignore[arg-type]
+
+        out = self._run_batch(statements, statement_timeout_ms=statement_timeout_ms, pool=self._read_pool(statements))
+
+        if cache is not None:
+            if cache_keys is not None:
+                for key, sql, result in zip(cache_keys, statements, out):
+                    cache.put(key, result, tags=referenced_tables(sql))
+            else:
+                touched: set[str] = set()
+                for sql in statements:
+                    if not _is_read_only(sql):
+                        touched |= referenced_tables(sql)
+                cache.invalidate_tags(touched)
+        if any(classify_statement(sql) == "create" for sql in statements):
+            invalidate_schema_cache(self._database_url)
+        return out
+
+    def _run_batch(
+        self, statements: list[str], *, statement_timeout_ms: int, pool: ConnectionPool | None = None
+    ) -> list[QueryResult]:
+        if pool is not None and pool is not self._pool:
+            try:
+                return self._run_on(pool, statements, statement_timeout_ms=statement_timeout_ms)
+            except DatabaseError as e:
+                if not _is_connection_failure(e.__cause__):
+                    raise
+                # Replica went away mid-flight: take it out of rotation and retry on the primary.
+                self._replicas.mark_down(pool)  # type: ignore[union-attr]
+        return self._run_on(self._pool, statements, statement_timeout_ms=statement_timeout_ms)
+
+    def _run_on(self, pool: ConnectionPool, statements: list[str], *, statement_timeout_ms: int) -> list[QueryResult]:
         try:
-            with self._connect() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(f"SET statement_timeout TO '{int(statement_timeout_ms)}ms'")
+            with pool.connection(statement_timeout_ms=statement_timeout_ms) as conn:
+                with conn.cursor() as cur:
                     out: list[QueryResult] = []
                     for sql in statements:
+                        if classify_statement(sql) in ("select", "with") and _is_read_only(sql):
+                            out.append(self._fetch_server_side(conn, sql))
+                            continue
                         cur.execute(sql)
-                        rows: list[dict[str, Any]] = []
+                        rows: list[tuple[Any, ...]] = []
                         columns: list[str] = []
+                        truncated = False
                         if cur.description is not None:
-                            rows = cur.fetchall()
-                            columns = list(rows[0].keys()) if rows else [d.name for d in cur.description]
-                        out.append(QueryResult(columns=columns, rows=rows, rowcount=int(cur.rowcount)))
-                    return out
+                            budget = _RowBudget(self._max_result_rows, self._max_result_bytes)
+                            while not budget.truncated:
+                                batch = cur.fetchmany(self._stream_batch_size)
+                                if not batch:
+                                    break
+                                rows.extend(budget.take(batch))
+                            truncated = budget.truncated
+                            columns = [d.name for d in cur.description]
+                        out.append(
+                            QueryResult(columns=columns, data=rows, rowcount=int(cur.rowcount), truncated=truncated)
+                        )
         except Exception as e:
             raise DatabaseError(f"Query failed: {e}") from e
+        return out
+
+    def _fetch_server_side(self, conn: Any, sql: str) -> QueryResult:
+        # A named cursor leaves the result set on the server: only the rows within the
+        # row/byte budget are transferred, one batch at a time.
+        with conn.cursor(name=f"nl2sql_batch_{next(_CURSOR_IDS)}") as cur:
+            cur.itersize = self._stream_batch_size
+            cur.execute(sql)
+            budget = _RowBudget(self._max_result_rows, self._max_result_bytes)
+            rows: list[tuple[Any, ...]] = []
+            while not budget.truncated:
+                batch = cur.fetchmany(self._stream_batch_size)
+                if not batch:
+                    break
+                rows.extend(budget.take(batch))
+            columns = [d.name for d in cur.description] if cur.description is not None else []
+        return QueryResult(columns=columns, data=rows, rowcount=len(rows), truncated=budget.truncated)
+
+    def explain_sql_batch(self, statements: list[str], *, statement_timeout_ms: int = 8000) -> list[PlanEstimate | None]:
+        """Planner estimates via ``EXPLAIN (FORMAT JSON)``; nothing is executed.
+
+        Statements that cannot be planned on their own (DDL, or ones that depend on
+        an earlier statement in the batch) get ``None``.
+        """
+        out: list[PlanEstimate | None] = []
+        try:
+            with self._connect(statement_timeout_ms=statement_timeout_ms) as conn:
+                with conn.cursor() as cur:
+                    for sql in statements:
+                        if classify_statement(sql) not in _EXPLAINABLE:
+                            out.append(None)
+                            continue
+                        cur.execute("SAVEPOINT nl2sql_explain")
+                        try:
+                            cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                            plan = cur.fetchone()[0]
+                        except psycopg2.Error:
+                            cur.execute("ROLLBACK TO SAVEPOINT nl2sql_explain")
+                            out.append(None)
+                            continue
+                        cur.execute("RELEASE SAVEPOINT nl2sql_explain")
+                        out.append(summarize_plan(sql, plan))
+        except Exception as e:
+            raise DatabaseError(f"EXPLAIN failed: {e}") from e
+        return out
+
+    def stream_sql(
+        self,
+        sql: str,
+        *,
+        statement_timeout_ms: int = 8000,
+        batch_size: int | None = None,
+    ) -> QueryResult:
+        """Run a SELECT/WITH statement lazily; rows arrive through ``result.stream`` in batches.
+
+        Other statement kinds cannot be declared as server-side cursors, so they are
+        executed eagerly (still subject to the row/byte budget).
+        """
+        if classify_statement(sql) not in ("select", "with"):
+            return self.execute_sql(sql, statement_timeout_ms=statement_timeout_ms)
+        stream = ResultStream(
+            self._read_pool([sql]) or self._pool,
+            sql,
+            statement_timeout_ms=statement_timeout_ms,
+            batch_size=batch_size or self._stream_batch_size,
+            max_rows=self._max_result_rows,
+            max_bytes=self._max_result_bytes,
+        )
+        return QueryResult(columns=[], data=[], rowcount=-1, stream=stream)
+
+
+class AsyncPostgresDB:
+    """Awaitable facade over PostgresDB for use inside an event loop.
+
+    This is not an async driver. psycopg2 has none (its async mode is
+    autocommit-only and needs ``add_reader``), so every call runs the blocking
+    PostgresDB method on a private executor sized to the connection pool. The
+    loop never blocks, but:
+
+    - each in-flight query holds one executor thread for its whole duration;
+    - concurrency is capped at ``max_connections``; further calls queue in the
+      executor rather than on the pool;
+    - cancelling the awaiting task does not cancel the query, which runs to
+      completion (or to ``statement_timeout``) on its thread.
+
+    A native driver (psycopg 3's ``AsyncConnectionPool``) would lift these limits
+    but means porting the pool, replicas and server-side cursors off psycopg2.
+    """
+
+    def __init__(self, db: PostgresDB):
+        self.sync = db
+        self._executor = ThreadPoolExecutor(max_workers=db.max_connections, thread_name_prefix="nl2sql-db")
+
+    async def _run(self, fn: Any, /, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def pool_stats(self) -> PoolStats:
+        return self.sync.pool_stats()
+
+    def result_cache_stats(self) -> CacheStats | None:
+        return self.sync.result_cache_stats()
+
+    def replica_status(self) -> dict[str, dict[str, Any]]:
+        return self.sync.replica_status()
+
+    async def fetch_schema(self, *, include_system: bool = False, refresh: bool = False) -> SchemaModel:
+        return await self._run(self.sync.fetch_schema, include_system=include_system, refresh=refresh)
+
+    async def fetch_schema_model(self, *, include_system: bool = False, refresh: bool = False) -> SchemaModel:
+        return await self._run(self.sync.fetch_schema_model, include_system=include_system, refresh=refresh)
+
+    async def schema_fingerprint(self, *, include_system: bool = False) -> str:
+        return await self._run(self.sync.schema_fingerprint, include_system=include_system)
+
+    async def execute_sql(self, sql: str, *, statement_timeout_ms: int = 8000) -> QueryResult:
+        return await self._run(self.sync.execute_sql, sql, statement_timeout_ms=statement_timeout_ms)
+
+    async def execute_sql_batch(self, statements: list[str], *, statement_timeout_ms: int = 8000) -> list[QueryResult]:
+        return await self._run(self.sync.execute_sql_batch, statements, statement_timeout_ms=statement_timeout_ms)
+
+    async def stream_sql(
+        self, sql: str, *, statement_timeout_ms: int = 8000, batch_size: int | None = None
+    ) -> QueryResult:
+        return await self._run(self.sync.stream_sql, sql, statement_timeout_ms=statement_timeout_ms, batch_size=batch_size)
+
+    async def iter_batches(self, stream: ResultStream) -> AsyncIterator[list[tuple[Any, ...]]]:
+        """Pull a ResultStream's batches on the executor, one fetch at a time."""
+        batches = iter(stream)
+        try:
+            while True:
+                batch = await self._run(next, batches, None)
+                if batch is None:
+                    return
+                yield batch
+        finally:
+            try:
+                await self._run(stream.close)
+            except ValueError:
+                # Cancelled mid-fetch: the generator is still running on the executor and
+                # releases its connection when it finishes and is garbage-collected.
+                pass
+
+    async def explain_sql_batch(
+        self, statements: list[str], *, statement_timeout_ms: int = 8000
+    ) -> list[PlanEstimate | None]:
+        return await self._run(self.sync.explain_sql_batch, statements, statement_timeout_ms=statement_timeout_ms)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
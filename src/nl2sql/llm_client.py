@@ -1,26 +1,228 @@
 from __future__ import annotations
 
+import abc
+import asyncio
+import contextlib
+import functools
 import json
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
 from dataclasses import dataclass
-from typing import Any, Literal
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Literal
 
-import requests
+import httpx
+
+from .circuit import BreakerConfig, CircuitBreakers
+from .context_cache import ContextCache, ContextCacheConfig, local_handle
+from .rate_limit import RETRYABLE_STATUS, RateLimitConfig, RateLimiter
+from .schema_index import estimate_tokens
+
+try:
+    import h2  # noqa: F401  # enables httpx's HTTP/2 support
+except ImportError:  # pragma: no cover - HTTP/2 is optional
+    _HTTP2_AVAILABLE = False
+else:
+    _HTTP2_AVAILABLE = True
 
 
 class LLMError(RuntimeError):
     pass
 
 
-Provider = Literal["gemini", "groq"]
+class LLMUnavailableError(LLMError):
+    """A 5xx, 429, timeout or transport failure: the provider itself is unhealthy.
+
+    Only these count against its circuit; a bad request or a missing key does not.
+    """
+
+
+Provider = str  # a registered provider name: "gemini", "groq", "mock" or your own
 
 
 @dataclass(frozen=True)
 class LLMChatMessage:
     role: str
     content: str
+    # Part of the static prompt prefix, identical across requests: may be served from a provider context cache.
+    cacheable: bool = False
+
+
+@dataclass(frozen=True)
+class HTTPConfig:
+    pool_size: int = 10
+    keepalive_s: float = 60.0
+    connect_timeout_s: float = 5.0
+    http2: bool = True
+    max_concurrency: int = 8  # in-flight async calls per provider and event loop
+
+
+_HTTP_CONFIG = HTTPConfig()
+_HTTP_LOCK = threading.Lock()
+# One keep-alive client per provider host; httpx.Client is thread-safe and pools connections.
+_CLIENTS: dict[str, httpx.Client] = {}
+
+
+def configure_http(config: HTTPConfig) -> None:
+    """Apply pool size / keep-alive / timeout settings to provider clients created from now on."""
+    global _HTTP_CONFIG
+    with _HTTP_LOCK:
+        if config == _HTTP_CONFIG:
+            return
+        _HTTP_CONFIG = config
+        # Calls already in flight keep their old client; it is closed when garbage-collected.
+        _CLIENTS.clear()
+    _ASYNC_CLIENTS.clear()
+    _SEMAPHORES.clear()
+
+
+def _client_options() -> dict[str, Any]:
+    config = _HTTP_CONFIG
+    return {
+        "http2": config.http2 and _HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=max(1, config.pool_size),
+            max_keepalive_connections=max(1, config.pool_size),
+            keepalive_expiry=config.keepalive_s,
+        ),
+        "timeout": httpx.Timeout(45.0, connect=config.connect_timeout_s),
+    }
+
+
+def _timeout(timeout_s: float) -> httpx.Timeout:
+    return httpx.Timeout(timeout_s, connect=min(float(timeout_s), _HTTP_CONFIG.connect_timeout_s))
+
+
+def http_client(provider: str) -> httpx.Client:
+    with _HTTP_LOCK:
+        client = _CLIENTS.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.Client(**_client_options())
+            _CLIENTS[provider] = client
+        return client
+
+
+def close_http_clients() -> None:
+    with _HTTP_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
+
+
+_RATE_LIMITER = RateLimiter()
+
+
+def configure_rate_limits(config: RateLimitConfig) -> None:
+    """Apply requests/tokens-per-minute limits and retry settings to LLM calls from now on."""
+    _RATE_LIMITER.configure(config)
+
+
+def rate_limit_metrics() -> dict[str, dict[str, Any]]:
+    return _RATE_LIMITER.metrics()
+
+
+class RateLimitedError(LLMError):
+    pass
+
 
+class CircuitOpenError(LLMError):
+    pass
+
+
+@dataclass(frozen=True)
+class FailoverTarget:
+    """Where calls go while the primary's circuit is open; disabled unless all three are set."""
+
+    provider: str = ""
+    model: str = ""
+    api_key: str = ""
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.provider and self.model and self.api_key)
+
+
+_BREAKERS = CircuitBreakers()
+_FAILOVER = FailoverTarget()
+
+
+def configure_circuit_breakers(config: BreakerConfig, failover: FailoverTarget | None = None) -> None:
+    global _FAILOVER
+    _BREAKERS.configure(config)
+    _FAILOVER = failover or FailoverTarget()
+
+
+def circuit_metrics() -> dict[str, dict[str, Any]]:
+    """Per ``provider:model``: circuit state, recent error/slow rates, trips, rejected calls and failovers."""
+    return _BREAKERS.metrics()
+
+
+def _check_circuit(provider: str, model: str) -> None:
+    wait = _BREAKERS.acquire(provider, model)
+    if wait > 0:
+        raise CircuitOpenError(f"{provider} circuit is open for model {model}; retry in {wait:.1f}s")
+
+
+def _route(provider: str, api_key: str, model: str) -> tuple[str, str, str]:
+    # Whenever the primary's circuit would turn the call away (open, or half-open with its probe
+    # slots taken), send it to the failover target if that one would take it.
+    target = _FAILOVER
+    if not target.enabled or (target.provider, target.model) == (provider, model):
+        return provider, api_key, model
+    if _BREAKERS.admits(provider, model) or not _BREAKERS.admits(target.provider, target.model):
+        return provider, api_key, model
+    _BREAKERS.failed_over(provider, model)
+    return target.provider, target.api_key, target.model
 
-def _parse_json_error(resp: requests.Response) -> str:
+
+def _send_wait(provider: str, model: str, tokens: int, *, retry: bool, timeout_s: float) -> float:
+    # Waiting out a rate limit longer than the call may take only hides the failure; fail fast instead.
+    wait = _RATE_LIMITER.acquire(provider, model, tokens, retry=retry, max_wait_s=timeout_s)
+    if wait > timeout_s:
+        raise RateLimitedError(
+            f"{provider} rate limit for model {model} frees up in {wait:.0f}s, over the {timeout_s}s timeout"
+        )
+    return wait
+
+
+def _request_tokens(messages: list[LLMChatMessage], max_tokens: int) -> int:
+    return estimate_tokens("".join(m.content or "" for m in messages)) + int(max_tokens)
+
+
+def _post(
+    provider: str, model: str, url: str, *, tokens: int, retries: int, timeout_s: int, **kwargs: Any
+) -> httpx.Response:
+    """POST through the rate limiter, retrying 429/5xx with jittered backoff (or the server's Retry-After).
+
+    The last response is returned once retries run out or the next wait would exceed ``timeout_s``;
+    RateLimitedError is raised when the rate limiter would hold the request back for longer than that.
+    """
+    limiter = _RATE_LIMITER
+    attempt = 0
+    while True:
+        wait = _send_wait(provider, model, tokens, retry=attempt > 0, timeout_s=timeout_s)
+        if wait > 0:
+            time.sleep(wait)
+        resp = http_client(provider).post(url, timeout=_timeout(timeout_s), **kwargs)
+        limiter.observe(provider, model, resp)
+        if resp.status_code not in RETRYABLE_STATUS or attempt >= retries:
+            return resp
+        delay = limiter.retry_delay(provider, model, resp, attempt)
+        if delay > timeout_s:
+            return resp
+        time.sleep(delay)
+        attempt += 1
+
+
+def _api_error(message: str, status: int) -> LLMError:
+    return (LLMUnavailableError if status in RETRYABLE_STATUS else LLMError)(message)
+
+
+def _parse_json_error(resp: httpx.Response) -> str:
     try:
         data = resp.json()
         if isinstance(data, dict):
@@ -36,18 +238,39 @@ def _parse_json_error(resp: requests.Response) -> str:
     return resp.text.strip()
 
 
-def _gemini_chat_completion(
-    *,
-    api_key: str,
-    model: str,
-    messages: list[LLMChatMessage],
-    temperature: float,
-    max_tokens: int,
-    timeout_s: int,
-) -> str:
-    if not api_key:
-        raise LLMError("Missing GEMINI_API_KEY")
+_GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+_GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
 
+def _error_code(resp: httpx.Response) -> str | None:
+    try:
+        data = resp.json()
+    except ValueError:
+        return None
+    err = data.get("error") if isinstance(data, dict) else None
+    code = err.get("code") if isinstance(err, dict) else None
+    return code if isinstance(code, str) else None
+
+
+def _groq_should_fall_back(resp: httpx.Response) -> bool:
+    # Throttled, overloaded or retired: the next fallback model may still answer.
+    return (
+        resp.status_code in RETRYABLE_STATUS
+        or resp.status_code == 404
+        or _error_code(resp) in ("model_decommissioned", "model_not_found")
+    )
+
+
+def _gemini_model_name(model: str) -> str:
+    model = (model or "").strip()
+    if model.startswith("models/"):
+        model = model[len("models/") :]
+    return model
+
+
+def _gemini_payload(
+    messages: list[LLMChatMessage], *, temperature: float, max_tokens: int, cached_content: str | None = None
+) -> dict[str, Any]:
     system_parts: list[str] = []
     contents: list[dict[str, Any]] = []
     for m in messages:
@@ -67,23 +290,82 @@ def _gemini_chat_completion(
     }
     if system_parts:
         payload["systemInstruction"] = {"parts": [{"text": "\n\n".join(system_parts)}]}
+    if cached_content:
+        payload["cachedContent"] = cached_content
+    return payload
 
-    model = (model or "").strip()
-    if model.startswith("models/"):
-        model = model[len("models/") :]
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    headers = {"Content-Type": "application/json"}
 
+def _gemini_text(resp: httpx.Response) -> str:
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout_s)
-    except requests.RequestException as e:
-        raise LLMError(f"Gemini request failed: {e}") from e
+        data = resp.json()
+        candidates = data.get("candidates", [])
+        if not candidates:
+            raise KeyError("candidates")
+        content = candidates[0].get("content", {})
+        parts = content.get("parts", [])
+        if not parts:
+            raise KeyError("parts")
+        text = parts[0].get("text")
+        if not isinstance(text, str):
+            raise TypeError("text")
+        return text
+    except Exception as e:
+        raise LLMError("Unexpected Gemini response format") from e
+
+
+def _gemini_chat_completion(
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+    context_cache: bool = True,
+) -> str:
+    if not api_key:
+        raise LLMError("Missing GEMINI_API_KEY")
+
+    configured = _gemini_model_name(model)
+    model = _resolved_gemini_model(configured, api_key=api_key, timeout_s=timeout_s)
+    cached, sent = (
+        context_handle("gemini", model, messages, api_key=api_key, timeout_s=timeout_s)
+        if context_cache
+        else (None, messages)
+    )
+    payload = _gemini_payload(sent, temperature=temperature, max_tokens=max_tokens, cached_content=cached)
+    url = f"{_GEMINI_BASE_URL}/models/{model}:generateContent?key={api_key}"
+
+    try:
+        resp = _post(
+            "gemini",
+            model,
+            url,
+            json=payload,
+            tokens=_request_tokens(messages, max_tokens),
+            retries=_RATE_LIMITER.config.max_retries,
+            timeout_s=timeout_s,
+        )
+    except httpx.HTTPError as e:
+        raise LLMUnavailableError(f"Gemini request failed: {e}") from e
 
     if resp.status_code >= 400:
         detail = _parse_json_error(resp)
+        if cached and resp.status_code in _STALE_HANDLE_STATUS:
+            _forget_context_handle(cached)
+            return _gemini_chat_completion(
+                api_key=api_key,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout_s=timeout_s,
+                context_cache=False,
+            )
         if resp.status_code == 404:
             fallback = _choose_gemini_model(api_key=api_key, timeout_s=timeout_s)
             if fallback and fallback != model:
+                _remember_gemini_model(configured, fallback)
                 return _gemini_chat_completion(
                     api_key=api_key,
                     model=fallback,
@@ -92,31 +374,31 @@ def _gemini_chat_completion(
                     max_tokens=max_tokens,
                     timeout_s=timeout_s,
                 )
-        raise LLMError(f"Gemini API error {resp.status_code}: {detail}")
+        raise _api_error(f"Gemini API error {resp.status_code}: {detail}", resp.status_code)
 
-    try:
-        data = resp.json()
-        candidates = data.get("candidates", [])
-        if not candidates:
-            raise KeyError("candidates")
-        content = candidates[0].get("content", {})
-        parts = content.get("parts", [])
-        if not parts:
-            raise KeyError("parts")
-        text = parts[0].get("text")
-        if not isinstance(text, str):
-            raise TypeError("text")
-        return text
-    except Exception as e:
-        raise LLMError("Unexpected Gemini response format") from e
+    return _gemini_text(resp)
 
 
 def _choose_gemini_model(*, api_key: str, timeout_s: int) -> str | None:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
+    available = _list_gemini_models(api_key=api_key, timeout_s=timeout_s)
+    return _preferred_gemini_model(available) if available else None
+
+
+def _list_gemini_models(*, api_key: str, timeout_s: int) -> list[str] | None:
+    url = f"{_GEMINI_BASE_URL}/models?key={api_key}"
     try:
-        resp = requests.get(url, timeout=timeout_s)
-    except requests.RequestException:
+        resp = http_client("gemini").get(url, timeout=_timeout(timeout_s))
+    except httpx.HTTPError:
         return None
+    return _available_gemini_models(resp)
+
+
+def _pick_gemini_model(resp: httpx.Response) -> str | None:
+    available = _available_gemini_models(resp)
+    return _preferred_gemini_model(available) if available else None
+
+
+def _available_gemini_models(resp: httpx.Response) -> list[str] | None:
     if resp.status_code >= 400:
         return None
     try:
@@ -138,9 +420,10 @@ def _choose_gemini_model(*, api_key: str, timeout_s: int) -> str | None:
     except Exception:
         return None
 
-    if not available:
-        return None
+    return available
 
+
+def _preferred_gemini_model(available: list[str]) -> str:
     preferred = [
         "gemini-2.0-flash",
         "gemini-2.0-pro",
@@ -155,6 +438,203 @@ def _choose_gemini_model(*, api_key: str, timeout_s: int) -> str | None:
     return available[0]
 
 
+DEFAULT_GEMINI_MODEL_TTL_S = 3600.0
+_GEMINI_MODEL_TTL_S = DEFAULT_GEMINI_MODEL_TTL_S
+# Configured Gemini name -> (model that actually answers, when that was established).
+# Filled on a 404 so later calls go straight to the fallback instead of re-listing models.
+_RESOLVED_MODELS: dict[str, tuple[str, float]] = {}
+_RESOLVED_LOCK = threading.Lock()
+_REFRESHING: set[str] = set()
+
+
+def configure_gemini_models(ttl_s: float) -> None:
+    """How long a 404 fallback mapping is trusted before models are re-listed in the background."""
+    global _GEMINI_MODEL_TTL_S
+    _GEMINI_MODEL_TTL_S = max(0.0, float(ttl_s))
+
+
+def _remember_gemini_model(configured: str, resolved: str) -> None:
+    with _RESOLVED_LOCK:
+        _RESOLVED_MODELS[configured] = (resolved, time.monotonic())
+
+
+def _refresh_gemini_model(configured: str, *, api_key: str, timeout_s: int) -> None:
+    try:
+        available = _list_gemini_models(api_key=api_key, timeout_s=timeout_s)
+        with _RESOLVED_LOCK:
+            if available is None:
+                # Listing failed: keep the mapping we have and try again after another TTL.
+                entry = _RESOLVED_MODELS.get(configured)
+                if entry is not None:
+                    _RESOLVED_MODELS[configured] = (entry[0], time.monotonic())
+            elif configured in available:
+                _RESOLVED_MODELS.pop(configured, None)
+            elif available:
+                _RESOLVED_MODELS[configured] = (_preferred_gemini_model(available), time.monotonic())
+    finally:
+        with _RESOLVED_LOCK:
+            _REFRESHING.discard(configured)
+
+
+def _resolved_gemini_model(configured: str, *, api_key: str, timeout_s: int) -> str:
+    """Model to call for ``configured``: itself, or the fallback a previous 404 resolved it to.
+
+    A stale mapping is still used while a background thread re-lists models, so no
+    request waits on discovery.
+    """
+    with _RESOLVED_LOCK:
+        entry = _RESOLVED_MODELS.get(configured)
+        if entry is None:
+            return configured
+        resolved, resolved_at = entry
+        stale = time.monotonic() - resolved_at >= _GEMINI_MODEL_TTL_S
+        if stale and api_key and configured not in _REFRESHING:
+            _REFRESHING.add(configured)
+        else:
+            stale = False
+    if stale:
+        threading.Thread(
+            target=_refresh_gemini_model,
+            args=(configured,),
+            kwargs={"api_key": api_key, "timeout_s": timeout_s},
+            name="gemini-model-refresh",
+            daemon=True,
+        ).start()
+    return resolved
+
+
+def active_model(provider: str, model: str) -> str:
+    """The model calls for ``provider``/``model`` are actually sent to (after any Gemini fallback)."""
+    try:
+        return get_provider(provider).active_model(model)
+    except LLMError:
+        return model
+
+
+def _gemini_active_model(model: str) -> str:
+    configured = _gemini_model_name(model)
+    with _RESOLVED_LOCK:
+        entry = _RESOLVED_MODELS.get(configured)
+    return entry[0] if entry is not None else configured
+
+
+# --- context caching ----------------------------------------------------------------------------
+
+_CONTEXT_CACHE: ContextCache | None = None
+_CONTEXT_CACHE_CONFIG = ContextCacheConfig()
+# A generateContent error with a cached handle may mean the handle expired or was deleted.
+_STALE_HANDLE_STATUS = frozenset({400, 403, 404})
+
+
+def configure_context_cache(config: ContextCacheConfig) -> None:
+    """Serve the static prompt prefix from Gemini ``cachedContents`` (``mode="gemini"``), or from
+    in-process handles the mock provider understands (``mode="local"``). Unchanged config is a no-op."""
+    global _CONTEXT_CACHE, _CONTEXT_CACHE_CONFIG
+    if config == _CONTEXT_CACHE_CONFIG:
+        return
+    if config.mode == "gemini":
+        cache = ContextCache(
+            _create_gemini_context, providers=frozenset({"gemini"}), ttl_s=config.ttl_s, min_tokens=config.min_tokens
+        )
+    elif config.mode == "local":
+        cache = ContextCache(local_handle, providers=frozenset({"mock"}), ttl_s=config.ttl_s, min_tokens=config.min_tokens)
+    else:
+        cache = None
+    _CONTEXT_CACHE, _CONTEXT_CACHE_CONFIG = cache, config
+
+
+def context_cache_active(provider: str) -> bool:
+    cache = _CONTEXT_CACHE
+    return cache is not None and cache.supports(provider)
+
+
+def context_cache_metrics() -> dict[str, Any]:
+    cache = _CONTEXT_CACHE
+    return {"mode": _CONTEXT_CACHE_CONFIG.mode, **cache.metrics()} if cache is not None else {}
+
+
+def context_handle(
+    provider: str, model: str, messages: list[LLMChatMessage], *, api_key: str, timeout_s: float
+) -> tuple[str | None, list[LLMChatMessage]]:
+    """Cache handle for the leading ``cacheable`` messages, and the messages that still have to be sent.
+
+    ``(None, messages)`` when there is no cache for ``provider`` or it declined the prefix.
+    """
+    cache = _CONTEXT_CACHE
+    if cache is None or not cache.supports(provider):
+        return None, messages
+    n = 0
+    while n < len(messages) and messages[n].cacheable:
+        n += 1
+    if n == 0 or n == len(messages):
+        return None, messages
+    name = cache.handle(provider, model, messages[:n], api_key=api_key, timeout_s=timeout_s)
+    return (name, messages[n:]) if name else (None, messages)
+
+
+async def context_handle_async(
+    provider: str, model: str, messages: list[LLMChatMessage], *, api_key: str, timeout_s: float
+) -> tuple[str | None, list[LLMChatMessage]]:
+    if not context_cache_active(provider) or not messages or not messages[0].cacheable:
+        return None, messages
+    # Creating a handle is a blocking HTTP call; keep it off the event loop.
+    return await asyncio.to_thread(context_handle, provider, model, messages, api_key=api_key, timeout_s=timeout_s)
+
+
+def _forget_context_handle(name: str) -> None:
+    cache = _CONTEXT_CACHE
+    if cache is not None:
+        cache.invalidate(name)
+
+
+def _create_gemini_context(
+    provider: str, model: str, prefix: list[LLMChatMessage], *, api_key: str, timeout_s: float, ttl_s: float
+) -> str | None:
+    system = "\n\n".join((m.content or "").strip() for m in prefix if m.role == "system")
+    contents = [
+        {"role": "user" if m.role == "user" else "model", "parts": [{"text": m.content}]}
+        for m in prefix
+        if m.role != "system"
+    ]
+    body: dict[str, Any] = {"model": f"models/{_gemini_model_name(model)}", "ttl": f"{int(ttl_s)}s"}
+    if system:
+        body["systemInstruction"] = {"parts": [{"text": system}]}
+    if contents:
+        body["contents"] = contents
+    try:
+        resp = http_client("gemini").post(
+            f"{_GEMINI_BASE_URL}/cachedContents?key={api_key}", json=body, timeout=_timeout(timeout_s)
+        )
+    except httpx.HTTPError:
+        return None
+    if resp.status_code >= 400:
+        return None  # e.g. prefix below the model's minimum, or a model without caching support
+    try:
+        name = resp.json().get("name")
+    except (ValueError, AttributeError):
+        return None
+    return name if isinstance(name, str) and name else None
+
+
+def _groq_payload(
+    model: str, messages: list[LLMChatMessage], *, temperature: float, max_tokens: int
+) -> dict[str, Any]:
+    return {
+        "model": model,
+        "messages": [{"role": m.role, "content": m.content} for m in messages],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def _groq_text(resp: httpx.Response) -> str:
+    try:
+        data = resp.json()
+        return data["choices"][0]["message"]["content"]
+    except Exception as e:
+        raise LLMError("Unexpected Groq response format") from e
+
+
 def _groq_chat_completion(
     *,
     api_key: str,
@@ -168,34 +648,213 @@ def _groq_chat_completion(
     if not api_key:
         raise LLMError("Missing GROQ_API_KEY")
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    headers = {"Authorization": f"Bearer {api_key}"}
 
+    tokens = _request_tokens(messages, max_tokens)
     tried_models: list[str] = []
+    last_error = ""
+    last_status = 0
     candidates = [model] + [m for m in (fallback_models or []) if m and m != model]
     for candidate in candidates:
-        payload: dict[str, Any] = {
-            "model": candidate,
-            "messages": [{"role": m.role, "content": m.content} for m in messages],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
+        last = candidate == candidates[-1]
+        if not last and _RATE_LIMITER.blocked_for("groq", candidate) > 0:
+            tried_models.append(candidate)  # still throttled: go straight to the next model
+            continue
+        payload = _groq_payload(candidate, messages, temperature=temperature, max_tokens=max_tokens)
         try:
-            resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout_s)
-        except requests.RequestException as e:
-            raise LLMError(f"Groq request failed: {e}") from e
+            # Only the last candidate waits out retries; earlier ones hand over to the next model.
+            resp = _post(
+                "groq",
+                candidate,
+                _GROQ_URL,
+                headers=headers,
+                json=payload,
+                tokens=tokens,
+                retries=_RATE_LIMITER.config.max_retries if last else 0,
+                timeout_s=timeout_s,
+            )
+        except RateLimitedError as e:
+            tried_models.append(candidate)
+            last_error, last_status = str(e), 0
+            continue
+        except httpx.HTTPError as e:
+            raise LLMUnavailableError(f"Groq request failed: {e}") from e
 
         if resp.status_code < 400:
-            try:
-                data = resp.json()
-                return data["choices"][0]["message"]["content"]
-            except Exception as e:
-                raise LLMError("Unexpected Groq response format") from e
+            return _groq_text(resp)
 
         tried_models.append(candidate)
-        raise LLMError(f"Groq API error {resp.status_code} (model={candidate}): {_parse_json_error(resp)}")
+        last_error = f"Groq API error {resp.status_code} (model={candidate}): {_parse_json_error(resp)}"
+        last_status = resp.status_code
+        if not _groq_should_fall_back(resp):
+            raise _api_error(last_error, last_status)
+
+    raise _api_error(f"Groq API error: all models failed ({', '.join(tried_models)}): {last_error}", last_status)
+
+
+def _completion(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float = 0.0,
+    max_tokens: int = 700,
+    timeout_s: int = 45,
+    fallback_models: list[str] | None = None,
+) -> str:
+    backend = get_provider(provider)
+    _check_circuit(provider, model)
+    started = time.monotonic()
+    try:
+        content = backend.complete(
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout_s=timeout_s,
+            fallback_models=fallback_models,
+        )
+    except LLMUnavailableError:
+        _BREAKERS.record(provider, model, ok=False, elapsed_s=time.monotonic() - started)
+        raise
+    except BaseException:
+        # Rejected requests (4xx, bad output) and cancellations say nothing about the provider's health.
+        _BREAKERS.record(provider, model, ok=None, elapsed_s=time.monotonic() - started)
+        raise
+    elapsed = time.monotonic() - started
+    _BREAKERS.record(provider, model, ok=True, elapsed_s=elapsed)
+    _record_latency(provider, model, elapsed)
+    return content
+
+
+# --- providers ----------------------------------------------------------------------------------
+
+
+class LLMProvider(abc.ABC):
+    """One chat backend. ``chat_completion`` and friends look providers up by name, so a
+    new backend (or a test double) subclasses this, implements the four abstract
+    methods and calls ``register_provider``."""
+
+    name = ""
+
+    @abc.abstractmethod
+    def complete(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        messages: list[LLMChatMessage],
+        temperature: float,
+        max_tokens: int,
+        timeout_s: int,
+        fallback_models: list[str] | None,
+    ) -> str:
+        ...
+
+    @abc.abstractmethod
+    async def complete_async(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        messages: list[LLMChatMessage],
+        temperature: float,
+        max_tokens: int,
+        timeout_s: int,
+        fallback_models: list[str] | None,
+    ) -> str:
+        ...
+
+    @abc.abstractmethod
+    def stream(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        messages: list[LLMChatMessage],
+        temperature: float,
+        max_tokens: int,
+        timeout_s: int,
+    ) -> Iterator[str]:
+        ...
+
+    @abc.abstractmethod
+    def stream_async(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        messages: list[LLMChatMessage],
+        temperature: float,
+        max_tokens: int,
+        timeout_s: int,
+    ) -> AsyncIterator[str]:
+        ...
+
+    def active_model(self, model: str) -> str:
+        return model
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def complete(self, *, fallback_models: list[str] | None, **kwargs: Any) -> str:
+        # Gemini falls back by listing available models on a 404, not through fallback_models.
+        return _gemini_chat_completion(**kwargs)
+
+    async def complete_async(self, *, fallback_models: list[str] | None, **kwargs: Any) -> str:
+        return await _gemini_chat_completion_async(**kwargs)
+
+    def stream(self, **kwargs: Any) -> Iterator[str]:
+        return _http_stream("gemini", **kwargs)
+
+    def stream_async(self, **kwargs: Any) -> AsyncIterator[str]:
+        return _http_stream_async("gemini", **kwargs)
+
+    def active_model(self, model: str) -> str:
+        return _gemini_active_model(model)
+
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def complete(self, **kwargs: Any) -> str:
+        return _groq_chat_completion(**kwargs)
+
+    async def complete_async(self, **kwargs: Any) -> str:
+        return await _groq_chat_completion_async(**kwargs)
+
+    def stream(self, **kwargs: Any) -> Iterator[str]:
+        return _http_stream("groq", **kwargs)
+
+    def stream_async(self, **kwargs: Any) -> AsyncIterator[str]:
+        return _http_stream_async("groq", **kwargs)
+
+
+_PROVIDERS: dict[str, LLMProvider] = {"gemini": GeminiProvider(), "groq": GroqProvider()}
+_PROVIDERS_LOCK = threading.Lock()
+
+
+def register_provider(provider: LLMProvider, name: str | None = None) -> None:
+    """Make ``provider`` available as ``name`` (default ``provider.name``), replacing any previous one."""
+    key = (name or provider.name).strip().lower()
+    if not key:
+        raise ValueError("Provider needs a name")
+    with _PROVIDERS_LOCK:
+        _PROVIDERS[key] = provider
+
+
+def get_provider(name: str) -> LLMProvider:
+    provider = _PROVIDERS.get((name or "").strip().lower())
+    if provider is None:
+        raise LLMError(f"Unknown provider: {name}")
+    return provider
+
 
-    raise LLMError(f"Groq API error: all models failed: {', '.join(tried_models)}")
+def provider_names() -> list[str]:
+    return sorted(_PROVIDERS)
 
 
 def chat_completion(
@@ -208,9 +867,620 @@ def chat_completion(
     max_tokens: int = 700,
     timeout_s: int = 45,
     fallback_models: list[str] | None = None,
+    validate: Callable[[str], bool] | None = None,
 ) -> str:
+    """Completion text for ``messages``.
+
+    With hedging configured (``configure_hedging``), a call still unanswered after the
+    hedge delay is repeated on the secondary target and the first answer that passes
+    ``validate`` wins. A sync call already in flight can't be aborted, so the losing
+    request runs to completion in the background and its answer is dropped.
+
+    While the circuit for ``provider``/``model`` is open the call goes to the failover
+    target (``configure_circuit_breakers``), or fails at once with CircuitOpenError.
+    """
+    provider, api_key, model = _route(provider, api_key, model)
+    call = functools.partial(
+        _completion,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout_s=timeout_s,
+    )
+    primary = functools.partial(call, provider=provider, api_key=api_key, model=model, fallback_models=fallback_models)
+    hedge = _HEDGE_CONFIG
+    if not hedge.applies_to(provider, model):
+        return primary()
+    secondary = functools.partial(
+        call, provider=hedge.provider, api_key=hedge.api_key, model=hedge.model, fallback_models=fallback_models
+    )
+    return _hedged(
+        primary,
+        secondary,
+        stats=_hedge_stats(provider, model),
+        delay_s=_hedge_delay(provider, model),
+        timeout_s=timeout_s,
+        validate=validate,
+    )
+
+
+# --- async counterparts -------------------------------------------------------------------------
+
+# httpx.AsyncClient connections are tied to the event loop that opened them, so keep one per loop and provider.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _provider_slot(provider: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphores = _SEMAPHORES.setdefault(loop, {})
+    sem = semaphores.get(provider)
+    if sem is None:
+        sem = asyncio.Semaphore(max(1, _HTTP_CONFIG.max_concurrency))
+        semaphores[provider] = sem
+    return sem
+
+
+def _async_client(provider: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    clients = _ASYNC_CLIENTS.setdefault(loop, {})
+    client = clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        clients[provider] = client
+    return client
+
+
+async def _post_async(
+    provider: str, model: str, url: str, *, tokens: int, retries: int, timeout_s: int, **kwargs: Any
+) -> httpx.Response:
+    limiter = _RATE_LIMITER
+    attempt = 0
+    while True:
+        wait = _send_wait(provider, model, tokens, retry=attempt > 0, timeout_s=timeout_s)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        resp = await _async_client(provider).post(url, timeout=_timeout(timeout_s), **kwargs)
+        limiter.observe(provider, model, resp)
+        if resp.status_code not in RETRYABLE_STATUS or attempt >= retries:
+            return resp
+        delay = limiter.retry_delay(provider, model, resp, attempt)
+        if delay > timeout_s:
+            return resp
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _choose_gemini_model_async(*, api_key: str, timeout_s: int) -> str | None:
+    url = f"{_GEMINI_BASE_URL}/models?key={api_key}"
+    try:
+        resp = await _async_client("gemini").get(url, timeout=_timeout(timeout_s))
+    except httpx.HTTPError:
+        return None
+    return _pick_gemini_model(resp)
+
+
+async def _gemini_chat_completion_async(
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+    context_cache: bool = True,
+) -> str:
+    if not api_key:
+        raise LLMError("Missing GEMINI_API_KEY")
+
+    configured = _gemini_model_name(model)
+    model = _resolved_gemini_model(configured, api_key=api_key, timeout_s=timeout_s)
+    cached, sent = (
+        await context_handle_async("gemini", model, messages, api_key=api_key, timeout_s=timeout_s)
+        if context_cache
+        else (None, messages)
+    )
+    payload = _gemini_payload(sent, temperature=temperature, max_tokens=max_tokens, cached_content=cached)
+    url = f"{_GEMINI_BASE_URL}/models/{model}:generateContent?key={api_key}"
+
+    try:
+        resp = await _post_async(
+            "gemini",
+            model,
+            url,
+            json=payload,
+            tokens=_request_tokens(messages, max_tokens),
+            retries=_RATE_LIMITER.config.max_retries,
+            timeout_s=timeout_s,
+        )
+    except httpx.HTTPError as e:
+        raise LLMUnavailableError(f"Gemini request failed: {e}") from e
+
+    if resp.status_code >= 400:
+        detail = _parse_json_error(resp)
+        if cached and resp.status_code in _STALE_HANDLE_STATUS:
+            _forget_context_handle(cached)
+            return await _gemini_chat_completion_async(
+                api_key=api_key,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout_s=timeout_s,
+                context_cache=False,
+            )
+        if resp.status_code == 404:
+            fallback = await _choose_gemini_model_async(api_key=api_key, timeout_s=timeout_s)
+            if fallback and fallback != model:
+                _remember_gemini_model(configured, fallback)
+                return await _gemini_chat_completion_async(
+                    api_key=api_key,
+                    model=fallback,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout_s=timeout_s,
+                )
+        raise _api_error(f"Gemini API error {resp.status_code}: {detail}", resp.status_code)
+
+    return _gemini_text(resp)
+
+
+async def _groq_chat_completion_async(
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+    fallback_models: list[str] | None,
+) -> str:
+    if not api_key:
+        raise LLMError("Missing GROQ_API_KEY")
+
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    tokens = _request_tokens(messages, max_tokens)
+    tried_models: list[str] = []
+    last_error = ""
+    last_status = 0
+    candidates = [model] + [m for m in (fallback_models or []) if m and m != model]
+    for candidate in candidates:
+        last = candidate == candidates[-1]
+        if not last and _RATE_LIMITER.blocked_for("groq", candidate) > 0:
+            tried_models.append(candidate)
+            continue
+        payload = _groq_payload(candidate, messages, temperature=temperature, max_tokens=max_tokens)
+        try:
+            resp = await _post_async(
+                "groq",
+                candidate,
+                _GROQ_URL,
+                headers=headers,
+                json=payload,
+                tokens=tokens,
+                retries=_RATE_LIMITER.config.max_retries if last else 0,
+                timeout_s=timeout_s,
+            )
+        except RateLimitedError as e:
+            tried_models.append(candidate)
+            last_error, last_status = str(e), 0
+            continue
+        except httpx.HTTPError as e:
+            raise LLMUnavailableError(f"Groq request failed: {e}") from e
+
+        if resp.status_code < 400:
+            return _groq_text(resp)
+
+        tried_models.append(candidate)
+        last_error = f"Groq API error {resp.status_code} (model={candidate}): {_parse_json_error(resp)}"
+        last_status = resp.status_code
+        if not _groq_should_fall_back(resp):
+            raise _api_error(last_error, last_status)
+
+    raise _api_error(f"Groq API error: all models failed ({', '.join(tried_models)}): {last_error}", last_status)
+
+
+async def _completion_async(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float = 0.0,
+    max_tokens: int = 700,
+    timeout_s: int = 45,
+    fallback_models: list[str] | None = None,
+) -> str:
+    backend = get_provider(provider)
+
+    async def bounded() -> str:
+        async with _provider_slot(provider):
+            return await backend.complete_async(
+                api_key=api_key,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout_s=timeout_s,
+                fallback_models=fallback_models,
+            )
+
+    _check_circuit(provider, model)
+    started = time.monotonic()
+    try:
+        content = await asyncio.wait_for(bounded(), timeout=timeout_s)
+    except (LLMUnavailableError, asyncio.TimeoutError) as e:
+        _BREAKERS.record(provider, model, ok=False, elapsed_s=time.monotonic() - started)
+        if isinstance(e, LLMError):
+            raise
+        raise LLMUnavailableError(f"{provider} request timed out after {timeout_s}s") from e
+    except BaseException:
+        # Rejected (4xx, bad output) or cancelled (e.g. the losing side of a hedge): says nothing
+        # about the provider's health.
+        _BREAKERS.record(provider, model, ok=None, elapsed_s=time.monotonic() - started)
+        raise
+    elapsed = time.monotonic() - started
+    _BREAKERS.record(provider, model, ok=True, elapsed_s=elapsed)
+    _record_latency(provider, model, elapsed)
+    return content
+
+
+async def chat_completion_async(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float = 0.0,
+    max_tokens: int = 700,
+    timeout_s: int = 45,
+    fallback_models: list[str] | None = None,
+    validate: Callable[[str], bool] | None = None,
+) -> str:
+    """Awaitable chat_completion, safe to fan out with asyncio.gather.
+
+    At most ``HTTPConfig.max_concurrency`` calls per provider are in flight per
+    event loop; the rest queue. ``timeout_s`` bounds the whole call, queueing and
+    model fallbacks included. Cancelling the awaiting task (or hitting the
+    timeout) aborts the HTTP request and releases its connection. When hedging
+    is configured, the losing request is cancelled as soon as one side wins.
+    """
+    provider, api_key, model = _route(provider, api_key, model)
+    call = functools.partial(
+        _completion_async,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout_s=timeout_s,
+    )
+    primary = functools.partial(call, provider=provider, api_key=api_key, model=model, fallback_models=fallback_models)
+    hedge = _HEDGE_CONFIG
+    if not hedge.applies_to(provider, model):
+        return await primary()
+    secondary = functools.partial(
+        call, provider=hedge.provider, api_key=hedge.api_key, model=hedge.model, fallback_models=fallback_models
+    )
+    return await _hedged_async(
+        primary,
+        secondary,
+        stats=_hedge_stats(provider, model),
+        delay_s=_hedge_delay(provider, model),
+        timeout_s=timeout_s,
+        validate=validate,
+    )
+
+
+# --- hedging ------------------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class HedgeConfig:
+    """Secondary target for hedged calls; disabled unless provider, model and key are all set.
+
+    The hedge delay is the ``percentile`` of the primary's recent latencies once
+    ``min_samples`` calls have been seen (``initial_delay_s`` before that), clamped
+    to ``[min_delay_s, max_delay_s]``. Sync hedged calls run on their own pool of
+    ``max_workers`` threads; when it is busy (losers still running) calls go out unhedged.
+    """
+
+    provider: str = ""
+    model: str = ""
+    api_key: str = ""
+    percentile: float = 0.95
+    initial_delay_s: float = 2.0
+    min_delay_s: float = 0.25
+    max_delay_s: float = 10.0
+    min_samples: int = 20
+    max_workers: int = 16
+
+    def applies_to(self, provider: str, model: str) -> bool:
+        if not (self.provider and self.model and self.api_key):
+            return False
+        return (self.provider, self.model) != (provider, model)
+
+
+_HEDGE_CONFIG = HedgeConfig()
+_LATENCY_WINDOW = 200
+_LATENCIES: dict[tuple[str, str], deque[float]] = {}
+_HEDGE_STATS: dict[str, dict[str, int]] = {}
+_HEDGE_LOCK = threading.Lock()
+_HEDGE_EXECUTOR: ThreadPoolExecutor | None = None
+_HEDGE_WORKERS = 0
+_HEDGE_BUSY = 0
+
+
+def configure_hedging(config: HedgeConfig) -> None:
+    global _HEDGE_CONFIG
+    _HEDGE_CONFIG = config
+
+
+def _record_latency(provider: str, model: str, elapsed_s: float) -> None:
+    with _HEDGE_LOCK:
+        _LATENCIES.setdefault((provider, model), deque(maxlen=_LATENCY_WINDOW)).append(elapsed_s)
+
+
+def _hedge_delay(provider: str, model: str) -> float:
+    cfg = _HEDGE_CONFIG
+    with _HEDGE_LOCK:
+        samples = sorted(_LATENCIES.get((provider, model), ()))
+    if len(samples) < cfg.min_samples:
+        delay = cfg.initial_delay_s
+    else:
+        delay = samples[min(len(samples) - 1, int(cfg.percentile * len(samples)))]
+    return min(cfg.max_delay_s, max(cfg.min_delay_s, delay))
+
+
+def _hedge_stats(provider: str, model: str) -> dict[str, int]:
+    with _HEDGE_LOCK:
+        return _HEDGE_STATS.setdefault(
+            f"{provider}:{model}",
+            {"calls": 0, "hedged": 0, "skipped": 0, "primary_wins": 0, "secondary_wins": 0, "failed": 0},
+        )
+
+
+def _count(stats: dict[str, int], *keys: str) -> None:
+    with _HEDGE_LOCK:
+        for key in keys:
+            stats[key] += 1
+
+
+def hedge_metrics() -> dict[str, dict[str, Any]]:
+    """Per primary ``provider:model``: calls, hedges sent, wins per side and the current hedge delay."""
+    with _HEDGE_LOCK:
+        snapshot = {key: dict(stats) for key, stats in _HEDGE_STATS.items()}
+    for key, stats in snapshot.items():
+        provider, _, model = key.partition(":")
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 3) if stats["calls"] else 0.0
+        stats["delay_s"] = round(_hedge_delay(provider, model), 3)
+    return snapshot
+
+
+def _winner(
+    done: Iterable[Any], sides: dict[Any, str], validate: Callable[[str], bool] | None
+) -> tuple[str, str] | None:
+    # Futures and tasks alike: (side, text) of a finished call whose text passes ``validate``.
+    for fut in sorted(done, key=lambda f: sides[f] != "primary"):
+        if fut.cancelled() or fut.exception() is not None:
+            continue
+        text = fut.result()
+        if validate is None or validate(text):
+            return sides[fut], text
+    return None
+
+
+def _fallback_outcome(first: Any) -> str:
+    # Nothing valid from either side: surface the primary's own answer or error.
+    if first.cancelled():
+        raise LLMError("Hedged request was cancelled")
+    if first.exception() is not None:
+        raise first.exception()
+    return first.result()
+
+
+def _hedge_submit(fn: Callable[..., str], **kwargs: Any) -> Any:
+    """Start ``fn`` on the hedge pool if a thread is free right now; None when it is saturated.
+
+    Sync losers can't be aborted and keep their thread until they finish, so calls never
+    queue behind them: the caller runs unhedged instead.
+    """
+    global _HEDGE_EXECUTOR, _HEDGE_WORKERS, _HEDGE_BUSY
+    workers = max(2, _HEDGE_CONFIG.max_workers)
+    with _HEDGE_LOCK:
+        if _HEDGE_EXECUTOR is None or _HEDGE_WORKERS != workers:
+            if _HEDGE_EXECUTOR is not None:
+                _HEDGE_EXECUTOR.shutdown(wait=False)
+            _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-hedge")
+            _HEDGE_WORKERS = workers
+        if _HEDGE_BUSY >= workers:
+            return None
+        _HEDGE_BUSY += 1
+        executor = _HEDGE_EXECUTOR
+
+    def run() -> str:
+        global _HEDGE_BUSY
+        try:
+            return fn(**kwargs)
+        finally:
+            with _HEDGE_LOCK:
+                _HEDGE_BUSY -= 1
+
+    return executor.submit(run)
+
+
+def _hedged(
+    primary: Callable[..., str],
+    secondary: Callable[..., str],
+    *,
+    stats: dict[str, int],
+    delay_s: float,
+    timeout_s: float,
+    validate: Callable[[str], bool] | None,
+) -> str:
+    started = time.monotonic()
+    _count(stats, "calls")
+    first = _hedge_submit(primary)
+    if first is None:
+        _count(stats, "skipped")
+        return primary()
+    sides: dict[Any, str] = {first: "primary"}
+    done, pending = futures_wait({first}, timeout=delay_s)
+    won = _winner(done, sides, validate)
+    if won is None:
+        # The secondary only gets what is left of the caller's timeout.
+        remaining = timeout_s - (time.monotonic() - started)
+        second = _hedge_submit(secondary, timeout_s=remaining) if remaining > 0 else None
+        if second is not None:
+            _count(stats, "hedged")
+            sides[second] = "secondary"
+            pending.add(second)
+        else:
+            _count(stats, "skipped")
+    while won is None and pending:
+        # Never wait past the caller's timeout; a thread that overruns it is left to finish alone.
+        remaining = timeout_s - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        done, pending = futures_wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        won = _winner(done, sides, validate)
+    for fut in pending:
+        fut.cancel()
+    if won is None:
+        _count(stats, "failed")
+        if not first.done():
+            raise LLMUnavailableError(f"Hedged request timed out after {timeout_s:g}s")
+        return _fallback_outcome(first)
+    _count(stats, f"{won[0]}_wins")
+    return won[1]
+
+
+async def _hedged_async(
+    primary: Callable[..., Awaitable[str]],
+    secondary: Callable[..., Awaitable[str]],
+    *,
+    stats: dict[str, int],
+    delay_s: float,
+    timeout_s: float,
+    validate: Callable[[str], bool] | None,
+) -> str:
+    started = time.monotonic()
+    _count(stats, "calls")
+    first = asyncio.ensure_future(primary())
+    sides: dict[Any, str] = {first: "primary"}
+    try:
+        done, pending = await asyncio.wait({first}, timeout=delay_s)
+        won = _winner(done, sides, validate)
+        remaining = timeout_s - (time.monotonic() - started)
+        if won is None and remaining > 0:
+            _count(stats, "hedged")
+            second = asyncio.ensure_future(secondary(timeout_s=remaining))
+            sides[second] = "secondary"
+            pending.add(second)
+        while won is None and pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            won = _winner(done, sides, validate)
+    finally:
+        # The loser (or both, if our caller was cancelled) is aborted along with its HTTP request.
+        for task in sides:
+            if not task.done():
+                task.cancel()
+    if won is None:
+        _count(stats, "failed")
+        return _fallback_outcome(first)
+    _count(stats, f"{won[0]}_wins")
+    return won[1]
+
+
+# --- streaming ----------------------------------------------------------------------------------
+
+_SSE_DONE: dict[str, Any] = {}
+
+
+def _stream_request(
+    provider: str,
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    cached_content: str | None = None,
+) -> tuple[str, dict[str, str], dict[str, Any]]:
     if provider == "gemini":
-        return _gemini_chat_completion(
+        if not api_key:
+            raise LLMError("Missing GEMINI_API_KEY")
+        url = f"{_GEMINI_BASE_URL}/models/{_gemini_model_name(model)}:streamGenerateContent?alt=sse&key={api_key}"
+        payload = _gemini_payload(messages, temperature=temperature, max_tokens=max_tokens, cached_content=cached_content)
+        return url, {}, payload
+    if provider == "groq":
+        if not api_key:
+            raise LLMError("Missing GROQ_API_KEY")
+        payload = _groq_payload(model, messages, temperature=temperature, max_tokens=max_tokens)
+        payload["stream"] = True
+        return _GROQ_URL, {"Authorization": f"Bearer {api_key}"}, payload
+    raise LLMError("Unknown provider")
+
+
+def _sse_event(line: str) -> dict[str, Any] | None:
+    """Parsed ``data:`` payload of one SSE line; None for blank/comment/other fields."""
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:") :].strip()
+    if not data:
+        return None
+    if data == "[DONE]":
+        return _SSE_DONE
+    try:
+        event = json.loads(data)
+    except ValueError as e:
+        raise LLMError("Unexpected streaming response format") from e
+    return event if isinstance(event, dict) else None
+
+
+def _stream_delta(provider: str, event: dict[str, Any]) -> str:
+    try:
+        if provider == "gemini":
+            candidates = event.get("candidates") or []
+            if not candidates:
+                return ""
+            parts = (candidates[0].get("content") or {}).get("parts") or []
+            return "".join(p.get("text") or "" for p in parts if isinstance(p, dict))
+        choices = event.get("choices") or []
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+    except (AttributeError, TypeError) as e:
+        raise LLMError(f"Unexpected {provider} streaming response format") from e
+
+
+def chat_completion_stream(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float = 0.0,
+    max_tokens: int = 700,
+    timeout_s: int = 45,
+) -> Iterator[str]:
+    """Yield completion text deltas as the provider produces them (Gemini ``alt=sse``, Groq ``stream``).
+
+    Throttled (429) and 5xx responses are retried like chat_completion, before anything is yielded.
+    """
+    provider, api_key, model = _route(provider, api_key, model)
+    backend = get_provider(provider)
+    _check_circuit(provider, model)
+    started = time.monotonic()
+    ok: bool | None = None
+    try:
+        yield from backend.stream(
             api_key=api_key,
             model=model,
             messages=messages,
@@ -218,14 +1488,248 @@ def chat_completion(
             max_tokens=max_tokens,
             timeout_s=timeout_s,
         )
-    if provider == "groq":
-        return _groq_chat_completion(
+        ok = True
+    except LLMUnavailableError:
+        ok = False
+        raise
+    finally:
+        _BREAKERS.record(provider, model, ok=ok, elapsed_s=time.monotonic() - started)
+
+
+def _http_stream(
+    provider: str,
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+) -> Iterator[str]:
+    label = provider.capitalize()
+    configured = _gemini_model_name(model) if provider == "gemini" else model
+    candidate = (
+        _resolved_gemini_model(configured, api_key=api_key, timeout_s=timeout_s) if provider == "gemini" else model
+    )
+    cached, sent = context_handle(provider, candidate, messages, api_key=api_key, timeout_s=timeout_s)
+    tokens = _request_tokens(messages, max_tokens)
+    fell_back = False
+    retries = 0
+    delay = 0.0
+    while True:
+        if delay > 0:
+            time.sleep(delay)
+        url, headers, payload = _stream_request(
+            provider,
+            api_key=api_key,
+            model=candidate,
+            messages=sent,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cached_content=cached,
+        )
+        wait = _send_wait(provider, candidate, tokens, retry=retries > 0, timeout_s=timeout_s)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            with http_client(provider).stream("POST", url, headers=headers, json=payload, timeout=_timeout(timeout_s)) as resp:
+                _RATE_LIMITER.observe(provider, candidate, resp)
+                if resp.status_code >= 400:
+                    resp.read()
+                    if cached and resp.status_code in _STALE_HANDLE_STATUS:
+                        _forget_context_handle(cached)
+                        cached, sent, delay = None, messages, 0.0
+                        continue
+                    if provider == "gemini" and resp.status_code == 404 and not fell_back:
+                        fallback = _choose_gemini_model(api_key=api_key, timeout_s=timeout_s)
+                        if fallback and fallback != _gemini_model_name(candidate):
+                            _remember_gemini_model(configured, fallback)
+                            candidate = fallback
+                            fell_back = True
+                            delay = 0.0
+                            continue
+                    delay = _stream_retry_delay(provider, candidate, resp, retries, timeout_s)
+                    if delay is not None:
+                        retries += 1
+                        continue
+                    detail = _parse_json_error(resp)
+                    raise _api_error(f"{label} API error {resp.status_code}: {detail}", resp.status_code)
+                for line in resp.iter_lines():
+                    event = _sse_event(line)
+                    if event is _SSE_DONE:
+                        return
+                    if event:
+                        delta = _stream_delta(provider, event)
+                        if delta:
+                            yield delta
+                return
+        except httpx.HTTPError as e:
+            raise LLMUnavailableError(f"{label} request failed: {e}") from e
+
+
+def _stream_retry_delay(provider: str, model: str, resp: httpx.Response, retries: int, timeout_s: int) -> float | None:
+    if resp.status_code not in RETRYABLE_STATUS or retries >= _RATE_LIMITER.config.max_retries:
+        return None
+    delay = _RATE_LIMITER.retry_delay(provider, model, resp, retries)
+    return delay if delay <= timeout_s else None
+
+
+async def chat_completion_stream_async(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float = 0.0,
+    max_tokens: int = 700,
+    timeout_s: int = 45,
+    fallback_models: list[str] | None = None,
+    validate: Callable[[str], bool] | None = None,
+) -> AsyncIterator[str]:
+    """Async chat_completion_stream; holds a provider concurrency slot while the stream is open.
+
+    Closing the generator (or cancelling its consumer) closes the HTTP response.
+    Streams are neither hedged nor walked through ``fallback_models``: if the stream
+    fails before its first delta, the remaining timeout goes to chat_completion_async
+    (fallback models, ``validate`` and hedging included) and its answer is yielded
+    as a single delta. A failure after the first delta is raised.
+    """
+    started = time.monotonic()
+    streamed = False
+    try:
+        async for delta in _stream_async(
+            provider=provider,
             api_key=api_key,
             model=model,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
             timeout_s=timeout_s,
+        ):
+            streamed = True
+            yield delta
+    except LLMError as e:
+        remaining = timeout_s - (time.monotonic() - started)
+        if streamed or isinstance(e, CircuitOpenError) or remaining <= 0:
+            raise
+        yield await chat_completion_async(
+            provider=provider,
+            api_key=api_key,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout_s=remaining,  # type: ignore[arg-type]
             fallback_models=fallback_models,
+            validate=validate,
         )
-    raise LLMError("Unknown provider")
+
+
+async def _stream_async(
+    *,
+    provider: Provider,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+) -> AsyncIterator[str]:
+    provider, api_key, model = _route(provider, api_key, model)
+    backend = get_provider(provider)
+    _check_circuit(provider, model)
+    started = time.monotonic()
+    ok: bool | None = None
+    try:
+        async with _provider_slot(provider):
+            async with contextlib.aclosing(
+                backend.stream_async(
+                    api_key=api_key,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout_s=timeout_s,
+                )
+            ) as deltas:
+                async for delta in deltas:
+                    yield delta
+        ok = True
+    except LLMUnavailableError:
+        ok = False
+        raise
+    finally:
+        _BREAKERS.record(provider, model, ok=ok, elapsed_s=time.monotonic() - started)
+
+
+async def _http_stream_async(
+    provider: str,
+    *,
+    api_key: str,
+    model: str,
+    messages: list[LLMChatMessage],
+    temperature: float,
+    max_tokens: int,
+    timeout_s: int,
+) -> AsyncIterator[str]:
+    label = provider.capitalize()
+    configured = _gemini_model_name(model) if provider == "gemini" else model
+    candidate = (
+        _resolved_gemini_model(configured, api_key=api_key, timeout_s=timeout_s) if provider == "gemini" else model
+    )
+    cached, sent = await context_handle_async(provider, candidate, messages, api_key=api_key, timeout_s=timeout_s)
+    tokens = _request_tokens(messages, max_tokens)
+    fell_back = False
+    retries = 0
+    delay = 0.0
+    while True:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        url, headers, payload = _stream_request(
+            provider,
+            api_key=api_key,
+            model=candidate,
+            messages=sent,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cached_content=cached,
+        )
+        wait = _send_wait(provider, candidate, tokens, retry=retries > 0, timeout_s=timeout_s)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            async with _async_client(provider).stream(
+                "POST", url, headers=headers, json=payload, timeout=_timeout(timeout_s)
+            ) as resp:
+                _RATE_LIMITER.observe(provider, candidate, resp)
+                if resp.status_code >= 400:
+                    await resp.aread()
+                    if cached and resp.status_code in _STALE_HANDLE_STATUS:
+                        _forget_context_handle(cached)
+                        cached, sent, delay = None, messages, 0.0
+                        continue
+                    if provider == "gemini" and resp.status_code == 404 and not fell_back:
+                        fallback = await _choose_gemini_model_async(api_key=api_key, timeout_s=timeout_s)
+                        if fallback and fallback != _gemini_model_name(candidate):
+                            _remember_gemini_model(configured, fallback)
+                            candidate = fallback
+                            fell_back = True
+                            delay = 0.0
+                            continue
+                    delay = _stream_retry_delay(provider, candidate, resp, retries, timeout_s)
+                    if delay is not None:
+                        retries += 1
+                        continue
+                    detail = _parse_json_error(resp)
+                    raise _api_error(f"{label} API error {resp.status_code}: {detail}", resp.status_code)
+                async for line in resp.aiter_lines():
+                    event = _sse_event(line)
+                    if event is _SSE_DONE:
+                        return
+                    if event:
+                        delta = _stream_delta(provider, event)
+                        if delta:
+                            yield delta
+                return
+        except httpx.HTTPError as e:
+            raise LLMUnavailableError(f"{label} request failed: {e}") from e
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from .llm_client import (
+    LLMChatMessage,
+    LLMError,
+    LLMProvider,
+    LLMUnavailableError,
+    context_handle,
+    get_provider,
+    register_provider,
+)
+from .plan_cache import normalize_question
+
+_MISS_PLAN = {"kind": "clarify", "sql": "", "message": "No recorded plan for this question (mock provider)."}
+_CHUNK_CHARS = 24
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """Simulated response time: ``fixed`` (``a`` s), ``uniform`` (``a``..``b`` s) or ``lognormal``
+    (median ``a`` s, sigma ``b``). ``first_token_share`` of it passes before a stream's first delta."""
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+    first_token_share: float = 0.3
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """``"0.5"``, ``"fixed:0.5"``, ``"uniform:0.2:1.5"`` or ``"lognormal:0.8:0.5"``."""
+        parts = [p.strip() for p in (spec or "").split(":") if p.strip()]
+        if not parts:
+            return cls()
+        kind = parts[0].lower()
+        if kind not in ("fixed", "uniform", "lognormal"):
+            kind, parts = "fixed", ["fixed", *parts]
+        try:
+            values = [float(p) for p in parts[1:3]]
+        except ValueError as e:
+            raise ValueError(f"Bad latency spec: {spec!r}") from e
+        a = values[0] if values else 0.0
+        b = values[1] if len(values) > 1 else {"fixed": 0.0, "uniform": a, "lognormal": 0.5}[kind]
+        return cls(kind=kind, a=max(0.0, a), b=max(0.0, b))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(min(self.a, self.b), max(self.a, self.b))
+        if self.kind == "lognormal" and self.a > 0:
+            return rng.lognormvariate(0.0, self.b) * self.a
+        return self.a
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    replay_path: str = ""
+    latency: str = "0"
+    seed: int = 0
+    record_path: str = ""  # append the real provider's replies here, in replay format
+    record_provider: str = ""
+
+
+def _question(messages: list[LLMChatMessage]) -> str:
+    # The planner prompt ends with a QUESTION: section; any other prompt is matched as a whole.
+    user = next((m.content for m in reversed(messages) if m.role == "user"), "")
+    head, sep, tail = (user or "").rpartition("QUESTION:\n")
+    return tail.strip() if sep else user.strip()
+
+
+def load_replies(path: str | Path) -> dict[str, str]:
+    """Recorded replies from a JSON-lines file of ``{"question": ..., "plan": {...}}`` (or ``"content": "..."``)."""
+    replies: dict[str, str] = {}
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                question = record["question"]
+                content = record["content"] if "content" in record else json.dumps(record["plan"])
+            except (ValueError, KeyError, TypeError) as e:
+                raise LLMError(f"Bad mock replay record at {path}:{n}") from e
+            replies[normalize_question(question)] = content
+    return replies
+
+
+def _answered(content: str | None, timeout_s: int) -> str:
+    if content is None:
+        raise LLMUnavailableError(f"mock request timed out after {timeout_s}s")
+    return content
+
+
+class MockProvider(LLMProvider):
+    """Offline provider that answers with recorded plans after a simulated delay.
+
+    Replies are matched on the normalized question; unknown questions get a
+    clarify plan. Delays come from one RNG seeded with ``seed``, so a
+    single-threaded run sees the same latencies every time. A delay longer than
+    the call's ``timeout_s`` fails the call the way a slow provider would.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        *,
+        replies: dict[str, str] | None = None,
+        latency: LatencyModel | None = None,
+        seed: int = 0,
+        miss_reply: str | None = None,
+    ):
+        self.replies = {normalize_question(q): c for q, c in (replies or {}).items()}
+        self.latency = latency or LatencyModel()
+        self.miss_reply = miss_reply if miss_reply is not None else json.dumps(_MISS_PLAN)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._misses = 0
+
+    @classmethod
+    def from_config(cls, config: MockConfig) -> "MockProvider":
+        return cls(
+            replies=load_replies(config.replay_path) if config.replay_path else None,
+            latency=LatencyModel.parse(config.latency),
+            seed=config.seed,
+        )
+
+    def _reply(self, messages: list[LLMChatMessage], timeout_s: int, model: str) -> tuple[str | None, float]:
+        """Reply text (None if the simulated call times out) and how long to wait before answering."""
+        # Goes through the local context cache like a real provider call, so its handles can be checked offline.
+        _, messages = context_handle(self.name, model, messages, api_key="", timeout_s=timeout_s)
+        content = self.replies.get(normalize_question(_question(messages)))
+        with self._lock:
+            self._calls += 1
+            self._misses += int(content is None)
+            delay = self.latency.sample(self._rng)
+        if delay > timeout_s:
+            return None, float(timeout_s)
+        return (content if content is not None else self.miss_reply), delay
+
+    def complete(
+        self, *, messages: list[LLMChatMessage], timeout_s: int, model: str = "mock", **kwargs: Any
+    ) -> str:
+        content, delay = self._reply(messages, timeout_s, model)
+        time.sleep(delay)
+        return _answered(content, timeout_s)
+
+    async def complete_async(
+        self, *, messages: list[LLMChatMessage], timeout_s: int, model: str = "mock", **kwargs: Any
+    ) -> str:
+        content, delay = self._reply(messages, timeout_s, model)
+        await asyncio.sleep(delay)
+        return _answered(content, timeout_s)
+
+    def _chunks(self, content: str, delay: float) -> Iterator[tuple[float, str]]:
+        chunks = [content[i : i + _CHUNK_CHARS] for i in range(0, len(content), _CHUNK_CHARS)] or [""]
+        first = delay * self.latency.first_token_share
+        rest = (delay - first) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            yield (first if i == 0 else rest), chunk
+
+    def stream(
+        self, *, messages: list[LLMChatMessage], timeout_s: int, model: str = "mock", **kwargs: Any
+    ) -> Iterator[str]:
+        content, delay = self._reply(messages, timeout_s, model)
+        if content is None:
+            time.sleep(delay)
+        for wait, chunk in self._chunks(_answered(content, timeout_s), delay):
+            time.sleep(wait)
+            yield chunk
+
+    async def stream_async(
+        self, *, messages: list[LLMChatMessage], timeout_s: int, model: str = "mock", **kwargs: Any
+    ) -> AsyncIterator[str]:
+        content, delay = self._reply(messages, timeout_s, model)
+        if content is None:
+            await asyncio.sleep(delay)
+        for wait, chunk in self._chunks(_answered(content, timeout_s), delay):
+            await asyncio.sleep(wait)
+            yield chunk
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"replies": len(self.replies), "calls": self._calls, "misses": self._misses}
+
+
+class RecordingProvider(LLMProvider):
+    """Passes calls through to ``inner`` and appends each reply to ``path`` in MockProvider's replay format."""
+
+    def __init__(self, inner: LLMProvider, path: str | Path):
+        self.inner = inner
+        self.name = inner.name
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _record(self, messages: list[LLMChatMessage], content: str) -> None:
+        line = json.dumps({"question": _question(messages), "content": content}, ensure_ascii=False)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def complete(self, **kwargs: Any) -> str:
+        content = self.inner.complete(**kwargs)
+        self._record(kwargs["messages"], content)
+        return content
+
+    async def complete_async(self, **kwargs: Any) -> str:
+        content = await self.inner.complete_async(**kwargs)
+        self._record(kwargs["messages"], content)
+        return content
+
+    def stream(self, **kwargs: Any) -> Iterator[str]:
+        parts: list[str] = []
+        for delta in self.inner.stream(**kwargs):
+            parts.append(delta)
+            yield delta
+        self._record(kwargs["messages"], "".join(parts))
+
+    async def stream_async(self, **kwargs: Any) -> AsyncIterator[str]:
+        parts: list[str] = []
+        async for delta in self.inner.stream_async(**kwargs):
+            parts.append(delta)
+            yield delta
+        self._record(kwargs["messages"], "".join(parts))
+
+    def active_model(self, model: str) -> str:
+        return self.inner.active_model(model)
+
+
+_CONFIGURED: MockConfig | None = None
+_CONFIGURE_LOCK = threading.Lock()
+
+
+def configure_mock_provider(config: MockConfig) -> None:
+    """Register the ``mock`` provider and, with ``record_path`` set, record ``record_provider``'s replies.
+
+    Safe to call on every Streamlit rerun: an unchanged config is a no-op.
+    """
+    global _CONFIGURED
+    with _CONFIGURE_LOCK:
+        if config == _CONFIGURED:
+            return
+        register_provider(MockProvider.from_config(config))
+        if config.record_path and config.record_provider:
+            current = get_provider(config.record_provider)
+            inner = current.inner if isinstance(current, RecordingProvider) else current
+            register_provider(RecordingProvider(inner, config.record_path), name=config.record_provider)
+        _CONFIGURED = config
+
+
+def mock_metrics() -> dict[str, int]:
+    try:
+        provider = get_provider("mock")
+    except LLMError:
+        return {}
+    return provider.stats() if isinstance(provider, MockProvider) else {}
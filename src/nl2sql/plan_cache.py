@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+from .cache import CacheStats, TTLCache
+from .semantic_cache import SemanticIndex, SemanticStats
+
+_WS = re.compile(r"\s+")
+_PLAN_FIELDS = ("kind", "sql", "message")
+
+
+def normalize_question(question: str) -> str:
+    """Case-folded question with whitespace collapsed and trailing punctuation dropped."""
+    return _WS.sub(" ", (question or "").casefold()).strip().rstrip("?.!;: ")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class PlanKey:
+    exact: str  # everything, including the normalized question and the schema fingerprint
+    scope: str  # everything but the question and schema: where a similar question may reuse a plan
+    question: str
+    identifiers: tuple[str, ...] = ()  # schema names; other question words must match exactly
+
+
+def plan_cache_key(
+    *,
+    question: str,
+    schema_fingerprint: str,
+    sql_mode: str,
+    max_sql_statements: int,
+    model: str,
+    history: str,
+    identifiers: tuple[str, ...] = (),
+) -> PlanKey:
+    # Hash each part separately so no separator inside one part can collide with another.
+    scope = "|".join(_digest(p) for p in (sql_mode, str(int(max_sql_statements)), model, history))
+    return PlanKey(
+        exact=_digest(f"{_digest(normalize_question(question))}|{_digest(schema_fingerprint)}|{scope}"),
+        scope=_digest(scope),
+        question=question,
+        identifiers=identifiers,
+    )
+
+
+def _plan_nbytes(plan: dict[str, str]) -> int:
+    return sum(len(v) for v in plan.values()) + 64
+
+
+class PlanCache:
+    """Cache of model plans, for plans whose SQL validated and ran without errors.
+
+    Lookups are exact-match first. With ``semantic_threshold`` set, a miss falls back
+    to the most similar cached question in the same scope that differs only in schema
+    names and filler words and whose SQL literals the new question spells out; such a
+    plan was made for another question (and maybe another schema version), so ``get``
+    only returns it if ``validate`` accepts it.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float,
+        max_entries: int = 512,
+        max_bytes: int | None = None,
+        semantic_threshold: float = 0.0,
+    ):
+        self._cache: TTLCache[dict[str, str]] = TTLCache(
+            ttl_s=ttl_s, max_entries=max_entries, max_bytes=max_bytes, sizeof=_plan_nbytes
+        )
+        self._semantic = (
+            SemanticIndex(threshold=semantic_threshold, ttl_s=ttl_s, max_entries=max_entries)
+            if semantic_threshold > 0
+            else None
+        )
+
+    def get(self, key: PlanKey, *, validate: Callable[[dict[str, Any]], bool] | None = None) -> dict[str, Any] | None:
+        plan = self._cache.get(key.exact)
+        if plan is not None:
+            return dict(plan)
+        if self._semantic is None:
+            return None
+        hit = self._semantic.lookup(key.question, scope=key.scope, identifiers=key.identifiers)
+        if hit is None:
+            return None
+        if validate is not None and not validate(hit.plan):
+            self._semantic.reject(hit)
+            return None
+        return hit.plan
+
+    def put(self, key: PlanKey, plan: dict[str, Any]) -> None:
+        plan = {f: plan[f] for f in _PLAN_FIELDS if isinstance(plan.get(f), str)}
+        self._cache.put(key.exact, plan)
+        if self._semantic is not None:
+            self._semantic.put(key.question, plan, scope=key.scope, identifiers=key.identifiers)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        if self._semantic is not None:
+            self._semantic.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+    def semantic_stats(self) -> SemanticStats | None:
+        return self._semantic.stats() if self._semantic is not None else None
+
+    def status(self) -> dict[str, Any]:
+        semantic = self.semantic_stats()
+        return {**asdict(self.stats()), "semantic": asdict(semantic) if semantic is not None else None}
+
+
+_PLAN_CACHES: dict[tuple[float, int, int | None, float], PlanCache] = {}
+_PLAN_CACHES_LOCK = threading.Lock()
+
+
+def plan_cache_for(
+    *, ttl_s: float, max_entries: int = 512, max_bytes: int | None = None, semantic_threshold: float = 0.0
+) -> PlanCache | None:
+    """Process-wide plan cache for these limits (shared across Streamlit reruns); None when ``ttl_s`` is 0."""
+    if ttl_s <= 0:
+        return None
+    key = (
+        float(ttl_s),
+        int(max_entries),
+        max_bytes if max_bytes and max_bytes > 0 else None,
+        max(0.0, float(semantic_threshold)),
+    )
+    with _PLAN_CACHES_LOCK:
+        cache = _PLAN_CACHES.get(key)
+        if cache is None:
+            cache = PlanCache(ttl_s=key[0], max_entries=key[1], max_bytes=key[2], semantic_threshold=key[3])
+            _PLAN_CACHES[key] = cache
+        return cache
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+
+
+class PlanStreamParser:
+    """Incremental scanner for the model's JSON plan (``{"kind": ..., "sql": ..., "message": ...}``).
+
+    Feed it completion deltas as they arrive; ``feed`` returns the top-level string
+    fields whose closing quote arrived in that delta, so a caller can act on ``sql``
+    while the rest of the object is still streaming. Text before the first ``{``
+    (e.g. a code fence) is skipped, nested values are stepped over, and
+    non-string values are ignored. The full completion should still be parsed
+    once it is complete; this only reports fields early.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, str] = {}
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._raw: list[str] = []
+        self._expect_key = True
+        self._key: str | None = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        completed: list[tuple[str, str]] = []
+        for ch in text:
+            if self._done:
+                break
+            if self._in_string:
+                self._raw.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._close_string(completed)
+                continue
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._raw = [ch]
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._key = None
+        return completed
+
+    def _close_string(self, completed: list[tuple[str, str]]) -> None:
+        try:
+            value = json.loads("".join(self._raw))
+        except ValueError:
+            value = ""
+        if self._expect_key:
+            self._key = value
+        elif self._key is not None:
+            self.fields[self._key] = value
+            completed.append((self._key, value))
+            self._key = None
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+DEFAULT_MAX_OUTPUT_TOKENS = 1000
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Input context per model family, matched by substring of the model name.
+_CONTEXT_WINDOWS: tuple[tuple[str, int], ...] = (
+    ("gemini-1.5-pro", 2_097_152),
+    ("gemini-1.5", 1_048_576),
+    ("gemini-2", 1_048_576),
+    ("llama-3.3", 131_072),
+    ("llama-3.1", 131_072),
+    ("llama3-", 8_192),
+    ("mixtral", 32_768),
+    ("gemma", 8_192),
+)
+_SAFETY_MARGIN = 0.05  # the estimate is approximate; keep clear of the hard limit
+
+# Roughly how BPE tokenizers split text: words (long ones in several pieces), digit runs
+# in groups of three, each punctuation mark, and one token per non-Latin character.
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    tokens = 0
+    for piece in _PIECE.findall(text or ""):
+        c = piece[0]
+        if c.isascii() and c.isalpha():
+            tokens += 1 + (len(piece) - 1) // 6
+        elif c.isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def context_window(model: str) -> int:
+    name = (model or "").lower()
+    for prefix, window in _CONTEXT_WINDOWS:
+        if prefix in name:
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def input_budget(model: str, *, max_output_tokens: int, configured: int = 0) -> int:
+    """Tokens the prompt may use: the model's window minus the output reservation, capped by ``configured``."""
+    available = int(context_window(model) * (1.0 - _SAFETY_MARGIN)) - max(0, int(max_output_tokens))
+    return min(available, configured) if configured > 0 else available
+
+
+@dataclass(frozen=True)
+class PromptSection:
+    """One prompt section, as parts in render order.
+
+    ``ranks`` orders the parts by value (0 = most valuable; parts are dropped
+    highest rank first). ``required`` sections are never trimmed, and trimming never
+    goes below ``min_parts``. ``header`` is emitted only if at least one part is kept.
+    ``tokens`` may carry precomputed part counts, for parts that are the same on every request.
+    """
+
+    name: str
+    parts: tuple[str, ...]
+    priority: int = 0  # lower priorities are trimmed first
+    required: bool = False
+    min_parts: int = 0
+    header: str = ""
+    joiner: str = "\n"
+    ranks: tuple[int, ...] | None = None
+    tokens: tuple[int, ...] | None = None
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    budget: int
+    output_tokens: int
+    sections: dict[str, int] = field(default_factory=dict)
+    dropped: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+    @property
+    def over_budget(self) -> bool:
+        return self.total > self.budget
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "total": self.total,
+            "output_tokens": self.output_tokens,
+            # Required sections are never trimmed, so they alone can exceed the budget.
+            "over_budget": self.over_budget,
+            "sections": dict(self.sections),
+            "dropped": {k: v for k, v in self.dropped.items() if v},
+        }
+
+
+def fit_sections(
+    sections: list[PromptSection], *, budget: int, output_tokens: int
+) -> tuple[dict[str, str], PromptBudget]:
+    """Render each section, first dropping the least valuable parts of the lowest-priority
+    sections until the estimated total fits ``budget``."""
+    costs = {s.name: list(s.tokens) if s.tokens is not None else [count_tokens(p) for p in s.parts] for s in sections}
+    headers = {s.name: count_tokens(s.header) for s in sections}
+    kept = {s.name: set(range(len(s.parts))) for s in sections}
+    total = sum(sum(costs[s.name]) + (headers[s.name] if s.parts else 0) for s in sections)
+
+    trimmable = sorted((s for s in sections if not s.required), key=lambda s: s.priority)
+    for s in trimmable:
+        if total <= budget:
+            break
+        ranks = s.ranks or tuple(range(len(s.parts)))
+        for i in sorted(range(len(s.parts)), key=lambda i: -ranks[i]):
+            if total <= budget or len(kept[s.name]) <= s.min_parts:
+                break
+            kept[s.name].discard(i)
+            total -= costs[s.name][i]
+            if not kept[s.name]:
+                total -= headers[s.name]
+
+    texts: dict[str, str] = {}
+    counts: dict[str, int] = {}
+    for s in sections:
+        idx = sorted(kept[s.name])
+        texts[s.name] = (s.header + s.joiner.join(s.parts[i] for i in idx)) if idx else ""
+        counts[s.name] = sum(costs[s.name][i] for i in idx) + (headers[s.name] if idx else 0)
+    report = PromptBudget(
+        budget=budget,
+        output_tokens=output_tokens,
+        sections=counts,
+        dropped={s.name: len(s.parts) - len(kept[s.name]) for s in sections},
+    )
+    return texts, report
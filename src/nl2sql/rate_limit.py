@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import email.utils
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+# Throttled or transiently unavailable: worth retrying (or trying another model).
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """Client-side limits per provider and model; ``0`` leaves a limit to the provider's headers."""
+
+    rpm: int = 0
+    tpm: int = 0
+    max_retries: int = 3
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 20.0
+
+
+class TokenBucket:
+    """Continuously refilling bucket. ``reserve`` may overdraw and returns how long to wait."""
+
+    def __init__(self, capacity: float, per_s: float):
+        self.capacity = float(capacity)
+        self.per_s = float(per_s)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.per_s)
+            self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A request bigger than the whole bucket would otherwise never go out.
+        self.level -= min(float(amount), self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.per_s
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + min(float(amount), self.capacity))
+
+    def clamp(self, remaining: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+
+def parse_duration_s(value: str | None) -> float | None:
+    """Seconds in a rate-limit reset value: ``"7.66s"``, ``"2m59.56s"``, ``"120ms"`` or a bare number."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_after_s(resp: httpx.Response) -> float | None:
+    """Server-requested delay: the ``Retry-After`` header, else Gemini's ``RetryInfo.retryDelay``."""
+    header = resp.headers.get("retry-after")
+    if header:
+        seconds = parse_duration_s(header)
+        if seconds is not None:
+            return seconds
+        try:
+            when = email.utils.parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            when = None
+        if when is not None:
+            return max(0.0, when.timestamp() - time.time())
+    try:
+        data = resp.json()
+    except (ValueError, httpx.ResponseNotRead):
+        return None
+    err = data.get("error") if isinstance(data, dict) else None
+    for detail in (err.get("details") or []) if isinstance(err, dict) else []:
+        if isinstance(detail, dict) and isinstance(detail.get("retryDelay"), str):
+            return parse_duration_s(detail["retryDelay"])
+    return None
+
+
+def backoff_s(attempt: int, *, base_s: float, max_s: float) -> float:
+    """Exponential backoff with equal jitter, so throttled callers don't retry in lockstep."""
+    ceiling = min(max_s, base_s * (2 ** max(0, attempt)))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+@dataclass
+class _ModelState:
+    requests: TokenBucket | None
+    tokens: TokenBucket | None
+    blocked_until: float = 0.0
+    calls: int = 0
+    throttled: int = 0
+    retries: int = 0
+    waited_s: float = 0.0
+
+
+class RateLimiter:
+    """Requests/min and tokens/min buckets per (provider, model), kept in step with response headers.
+
+    Callers ask ``acquire`` how long to wait before sending, report every response
+    to ``observe``, and use ``retry_delay`` to pace retries of 429/5xx responses.
+    """
+
+    def __init__(self, config: RateLimitConfig | None = None):
+        self.config = config or RateLimitConfig()
+        self._lock = threading.Lock()
+        self._states: dict[tuple[str, str], _ModelState] = {}
+
+    def configure(self, config: RateLimitConfig) -> None:
+        """Apply new limits; bucket state starts fresh."""
+        with self._lock:
+            if config != self.config:
+                self.config = config
+                self._states.clear()
+
+    def _state(self, provider: str, model: str) -> _ModelState:
+        key = (provider, model)
+        state = self._states.get(key)
+        if state is None:
+            cfg = self.config
+            state = _ModelState(
+                requests=TokenBucket(cfg.rpm, cfg.rpm / 60.0) if cfg.rpm > 0 else None,
+                tokens=TokenBucket(cfg.tpm, cfg.tpm / 60.0) if cfg.tpm > 0 else None,
+            )
+            self._states[key] = state
+        return state
+
+    def acquire(
+        self, provider: str, model: str, tokens: int, *, retry: bool = False, max_wait_s: float | None = None
+    ) -> float:
+        """Reserve one request and ``tokens`` tokens; returns the seconds to wait before sending.
+
+        When the wait would exceed ``max_wait_s`` nothing is reserved and the caller should not send.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(provider, model)
+            wait = max(0.0, state.blocked_until - now)
+            if state.requests is not None:
+                wait = max(wait, state.requests.reserve(1, now))
+            if state.tokens is not None:
+                wait = max(wait, state.tokens.reserve(tokens, now))
+            if max_wait_s is not None and wait > max_wait_s:
+                if state.requests is not None:
+                    state.requests.refund(1)
+                if state.tokens is not None:
+                    state.tokens.refund(tokens)
+                return wait
+            state.calls += 1
+            state.retries += int(retry)
+            state.waited_s += wait
+            return wait
+
+    def blocked_for(self, provider: str, model: str) -> float:
+        with self._lock:
+            state = self._states.get((provider, model))
+            return max(0.0, state.blocked_until - time.monotonic()) if state is not None else 0.0
+
+    def observe(self, provider: str, model: str, resp: httpx.Response) -> None:
+        """Sync the buckets with ``x-ratelimit-*`` headers (Groq/OpenAI style) and count 429s."""
+        h = resp.headers
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(provider, model)
+            if resp.status_code == 429:
+                state.throttled += 1
+                block = retry_after_s(resp)
+                if block:
+                    state.blocked_until = max(state.blocked_until, now + block)
+
+            limit_tokens = _header_float(h, "x-ratelimit-limit-tokens")
+            if state.tokens is None and limit_tokens:
+                # Groq's token limit is per minute; follow it when no local tpm is configured.
+                state.tokens = TokenBucket(limit_tokens, limit_tokens / 60.0)
+            remaining_tokens = _header_float(h, "x-ratelimit-remaining-tokens")
+            if state.tokens is not None and remaining_tokens is not None:
+                state.tokens.clamp(remaining_tokens, now)
+
+            # The request window differs by provider (Groq: per day), so only honour exhaustion.
+            for kind in ("requests", "tokens"):
+                if _header_float(h, f"x-ratelimit-remaining-{kind}") == 0:
+                    reset = parse_duration_s(h.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        state.blocked_until = max(state.blocked_until, now + reset)
+
+    def retry_delay(self, provider: str, model: str, resp: httpx.Response, attempt: int) -> float:
+        """Delay before retrying ``resp``; a 429 also holds back other calls to the same model."""
+        cfg = self.config
+        delay = retry_after_s(resp)
+        if delay is None:
+            delay = backoff_s(attempt, base_s=cfg.backoff_base_s, max_s=cfg.backoff_max_s)
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(provider, model)
+            if resp.status_code == 429:
+                state.blocked_until = max(state.blocked_until, now + delay)
+            return max(delay, state.blocked_until - now)
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{provider}:{model}": {
+                    "requests_available": round(s.requests.available(now), 2) if s.requests is not None else None,
+                    "tokens_available": round(s.tokens.available(now), 1) if s.tokens is not None else None,
+                    "blocked_for_s": round(max(0.0, s.blocked_until - now), 2),
+                    "calls": s.calls,
+                    "throttled": s.throttled,
+                    "retries": s.retries,
+                    "waited_s": round(s.waited_s, 2),
+                }
+                for (provider, model), s in self._states.items()
+            }
+
+
+def _header_float(headers: httpx.Headers, name: str) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
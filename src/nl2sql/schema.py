@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+
+from .prompt_budget import count_tokens
+
+SPATIAL_TYPES = ("geometry", "geography")
+POSTGIS_BANNER = "🌍 PostGIS ENABLED - Spatial queries supported"
+
+# Names the SQL checks can match unquoted; other columns are left out of the identifier lists.
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z_0-9]*")
+
+
+@dataclass(frozen=True)
+class ColumnInfo:
+    name: str
+    data_type: str
+    udt_name: str = ""
+    is_primary_key: bool = False
+    references: tuple[str, ...] = ()  # "schema.table.column" targets of FKs on this column
+
+    @property
+    def is_spatial(self) -> bool:
+        return self.udt_name in SPATIAL_TYPES
+
+    @property
+    def display_type(self) -> str:
+        if self.is_spatial:
+            return f"{self.udt_name} (PostGIS spatial)"
+        return self.data_type
+
+
+@dataclass(frozen=True)
+class ForeignKey:
+    column: str
+    ref_table: str
+    ref_column: str
+
+
+@dataclass(frozen=True)
+class TableInfo:
+    schema: str
+    name: str
+    kind: str
+    columns: tuple[ColumnInfo, ...]
+    approx_rows: int | None = None
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.schema}.{self.name}"
+
+    @property
+    def primary_key(self) -> tuple[str, ...]:
+        return tuple(c.name for c in self.columns if c.is_primary_key)
+
+    @property
+    def foreign_keys(self) -> tuple[ForeignKey, ...]:
+        out: list[ForeignKey] = []
+        for c in self.columns:
+            for ref in c.references:
+                ref_table, _, ref_column = ref.rpartition(".")
+                out.append(ForeignKey(column=c.name, ref_table=ref_table, ref_column=ref_column))
+        return tuple(out)
+
+    @cached_property
+    def block(self) -> str:
+        """This table's prompt text (``render_table`` without the leading blank line), rendered once."""
+        return render_table(self).strip("\n")
+
+    @cached_property
+    def tokens(self) -> int:
+        return count_tokens(self.block)
+
+
+def render_table(t: TableInfo) -> str:
+    lines = [f"\nTABLE {t.qualified_name}"]
+    if t.kind != "table":
+        lines.append(f"  -- {t.kind}")
+    if t.approx_rows is not None and t.approx_rows > 0:
+        lines.append(f"  -- approx rows: {t.approx_rows}")
+    for c in t.columns:
+        marks = ""
+        if c.is_primary_key:
+            marks += " PK"
+        for ref in c.references:
+            marks += f" FK -> {ref}"
+        if c.is_spatial:
+            marks += " 📍"
+        lines.append(f"  - {c.name} ({c.display_type}){marks}")
+    return "\n".join(lines)
+
+
+_RELKINDS = {"r": "table", "p": "table", "v": "view", "m": "materialized view", "f": "foreign table"}
+
+
+@dataclass(frozen=True)
+class SchemaModel:
+    """Structured database schema, built once per catalog fingerprint.
+
+    Everything the agent looks up per question (prompt text, table and column
+    names, the unique-basename map, spatial columns) is derived here once. The
+    model is shared between requests, so the derived mappings are read-only views.
+    """
+
+    tables: tuple[TableInfo, ...]
+    has_postgis: bool = False
+    fingerprint: str = ""
+    _by_name: Mapping[str, TableInfo] = field(default_factory=dict, init=False, repr=False, compare=False)
+    text: str = field(default="", init=False, repr=False, compare=False)
+    table_names: frozenset[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+    table_columns: Mapping[str, frozenset[str]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    basename_map: Mapping[str, str] = field(default_factory=dict, init=False, repr=False, compare=False)
+    column_names: tuple[str, ...] = field(default=(), init=False, repr=False, compare=False)
+    identifiers: tuple[str, ...] = field(default=(), init=False, repr=False, compare=False)
+    spatial_columns: tuple[str, ...] = field(default=(), init=False, repr=False, compare=False)
+    # Lower-cased base names of views, materialized views and foreign tables: relations whose
+    # contents change without a write to them.
+    view_names: frozenset[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        by_name = {t.qualified_name: t for t in self.tables}
+        table_columns: dict[str, frozenset[str]] = {}
+        bases: dict[str, list[str]] = {}
+        for t in self.tables:
+            table_columns[t.qualified_name] = frozenset(c.name for c in t.columns if _IDENTIFIER.fullmatch(c.name))
+            bases.setdefault(t.name, []).append(t.qualified_name)
+        columns = sorted(set().union(*table_columns.values())) if self.tables else []
+        # frozen: the derived fields are set once, here.
+        object.__setattr__(self, "_by_name", MappingProxyType(by_name))
+        object.__setattr__(self, "table_columns", MappingProxyType(table_columns))
+        # An unqualified name resolves only when exactly one schema has a table by that name.
+        object.__setattr__(
+            self, "basename_map", MappingProxyType({base: names[0] for base, names in bases.items() if len(names) == 1})
+        )
+        object.__setattr__(self, "text", self.render())
+        object.__setattr__(self, "table_names", frozenset(by_name))
+        object.__setattr__(self, "column_names", tuple(columns))
+        object.__setattr__(self, "identifiers", tuple(sorted({*by_name, *columns})))
+        object.__setattr__(self, "view_names", frozenset(t.name.lower() for t in self.tables if t.kind != "table"))
+        object.__setattr__(
+            self,
+            "spatial_columns",
+            tuple(f"{t.qualified_name}.{c.name}" for t in self.tables for c in t.columns if c.is_spatial),
+        )
+
+    def table(self, qualified_name: str) -> TableInfo | None:
+        return self._by_name.get(qualified_name)
+
+    def subset(self, tables: Iterable[TableInfo]) -> "SchemaModel":
+        """The same schema restricted to ``tables`` (e.g. the slice a prompt sees), same catalog fingerprint."""
+        return SchemaModel(tables=tuple(tables), has_postgis=self.has_postgis, fingerprint=self.fingerprint)
+
+    @property
+    def banner(self) -> str:
+        return POSTGIS_BANNER if self.has_postgis else ""
+
+    def render(self, tables: Iterable[TableInfo] | None = None) -> str:
+        """Prompt text: one ``TABLE schema.name`` header per table followed by ``  - column (type)`` lines."""
+        lines: list[str] = []
+        if self.has_postgis:
+            lines.append(f"{POSTGIS_BANNER}\n")
+
+        for t in self.tables if tables is None else tables:
+            lines.append(f"\n{t.block}")
+
+        return "\n".join(lines).strip()
+
+    @classmethod
+    def from_catalog_rows(cls, rows: Iterable[dict[str, Any]], *, fingerprint: str = "") -> "SchemaModel":
+        tables: list[TableInfo] = []
+        has_postgis = False
+        current: tuple[str, str] | None = None
+        meta: dict[str, Any] = {}
+        columns: dict[str, dict[str, Any]] = {}
+
+        def flush() -> None:
+            if current is None:
+                return
+            cols = tuple(
+                ColumnInfo(
+                    name=name,
+                    data_type=c["data_type"],
+                    udt_name=c["udt_name"],
+                    is_primary_key=c["is_pk"],
+                    references=tuple(c["refs"]),
+                )
+                for name, c in columns.items()
+            )
+            approx = meta.get("approx_rows")
+            tables.append(
+                TableInfo(
+                    schema=current[0],
+                    name=current[1],
+                    kind=_RELKINDS.get(meta.get("relkind") or "r", "table"),
+                    columns=cols,
+                    approx_rows=int(approx) if approx is not None and approx >= 0 else None,
+                )
+            )
+
+        for r in rows:
+            has_postgis = has_postgis or bool(r.get("has_postgis"))
+            key = (r["table_schema"], r["table_name"])
+            if key != current:
+                flush()
+                current = key
+                meta = {"relkind": r.get("relkind"), "approx_rows": r.get("approx_rows")}
+                columns = {}
+            col = columns.setdefault(
+                r["column_name"],
+                {"data_type": r["data_type"], "udt_name": r.get("udt_name") or "", "is_pk": bool(r.get("is_pk")), "refs": []},
+            )
+            # A column in several FKs comes back once per FK.
+            if r.get("ref_table") and r.get("ref_column"):
+                ref = f"{r['ref_table']}.{r['ref_column']}"
+                if ref not in col["refs"]:
+                    col["refs"].append(ref)
+        flush()
+        return cls(tables=tuple(tables), has_postgis=has_postgis, fingerprint=fingerprint)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import difflib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from .prompt_budget import count_tokens
+from .schema import SchemaModel, TableInfo
+
+DEFAULT_TOP_K = 8
+DEFAULT_TOKEN_BUDGET = 6000
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Za-z][a-z]*|\d+")
+_TABLE_NAME_WEIGHT = 3
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    # Same estimate the planner prompt is budgeted with.
+    return count_tokens(text)
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased, lightly stemmed word tokens; splits snake_case, camelCase and dotted names."""
+    return [_stem(w.lower()) for w in _WORD.findall(text or "") if len(w) > 1 or w.isdigit()]
+
+
+@dataclass(frozen=True)
+class SchemaSelection:
+    text: str
+    tables: tuple[str, ...]
+    pruned: bool
+    estimated_tokens: int
+    schema: SchemaModel  # the selected tables; the full model itself when nothing was pruned
+
+
+class SchemaIndex:
+    """BM25 index over tables (name tokens weighted up, plus column-name tokens) with FK adjacency."""
+
+    def __init__(self, schema: SchemaModel):
+        self.schema = schema
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._lengths: list[int] = []
+        self._neighbors: dict[str, set[str]] = {t.qualified_name: set() for t in schema.tables}
+
+        for i, t in enumerate(schema.tables):
+            terms = Counter()
+            for tok in tokenize(t.name):
+                terms[tok] += _TABLE_NAME_WEIGHT
+            for c in t.columns:
+                terms.update(tokenize(c.name))
+            self._lengths.append(sum(terms.values()))
+            for tok, tf in terms.items():
+                self._postings.setdefault(tok, []).append((i, tf))
+            for fk in t.foreign_keys:
+                if fk.ref_table in self._neighbors:
+                    self._neighbors[t.qualified_name].add(fk.ref_table)
+                    self._neighbors[fk.ref_table].add(t.qualified_name)
+
+        self._vocab = sorted(self._postings)
+        self._full_tokens = estimate_tokens(schema.text)
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def _query_terms(self, text: str) -> Counter:
+        terms = Counter()
+        for tok in tokenize(text):
+            if tok in self._postings:
+                terms[tok] += 1
+                continue
+            # Tolerate typos ("custmer") by snapping to the closest schema term.
+            close = difflib.get_close_matches(tok, self._vocab, n=1, cutoff=0.8)
+            if close:
+                terms[close[0]] += 1
+        return terms
+
+    def rank(self, text: str) -> list[tuple[float, TableInfo]]:
+        n_docs = len(self._lengths)
+        if not n_docs:
+            return []
+        scores = [0.0] * n_docs
+        for tok, qtf in self._query_terms(text).items():
+            postings = self._postings[tok]
+            idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = _BM25_K1 * (1.0 - _BM25_B + _BM25_B * self._lengths[doc] / (self._avg_len or 1.0))
+                scores[doc] += qtf * idf * tf * (_BM25_K1 + 1.0) / (tf + norm)
+        ranked = [(score, self.schema.tables[i]) for i, score in enumerate(scores) if score > 0]
+        ranked.sort(key=lambda x: -x[0])
+        return ranked
+
+    def select(
+        self,
+        question: str,
+        *,
+        context: str = "",
+        top_k: int = DEFAULT_TOP_K,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+    ) -> SchemaSelection:
+        full = SchemaSelection(
+            text=self.schema.text,
+            tables=tuple(t.qualified_name for t in self.schema.tables),
+            pruned=False,
+            estimated_tokens=self._full_tokens,
+            schema=self.schema,
+        )
+        if token_budget <= 0 or self._full_tokens <= token_budget:
+            return full
+
+        # The question dominates; earlier turns only help resolve follow-ups ("and their orders?").
+        ranked = self.rank(f"{question} {question} {context}")
+        if not ranked:
+            return full
+
+        picked: list[str] = [t.qualified_name for _, t in ranked[: max(1, int(top_k))]]
+        for name in list(picked):
+            for neighbor in sorted(self._neighbors.get(name, ())):
+                if neighbor not in picked:
+                    picked.append(neighbor)
+
+        chosen: list[TableInfo] = []
+        used = estimate_tokens(self.schema.render([]))  # PostGIS banner, if any
+        for name in picked:
+            table = self.schema.table(name)
+            if table is None:
+                continue
+            cost = table.tokens
+            if chosen and used + cost > token_budget:
+                continue
+            chosen.append(table)
+            used += cost
+
+        selected = self.schema.subset(chosen)
+        return SchemaSelection(
+            text=selected.text,
+            tables=tuple(t.qualified_name for t in chosen),
+            pruned=True,
+            estimated_tokens=estimate_tokens(selected.text),
+            schema=selected,
+        )
+
+
+_INDEXES: OrderedDict[str, SchemaIndex] = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+_MAX_INDEXES = 8
+
+
+def schema_index(schema: SchemaModel) -> SchemaIndex:
+    """Index for ``schema``, reused for as long as its catalog fingerprint is unchanged."""
+    key = schema.fingerprint or str(id(schema))
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is not None and index.schema is schema:
+            _INDEXES.move_to_end(key)
+            return index
+    index = SchemaIndex(schema)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = index
+        while len(_INDEXES) > _MAX_INDEXES:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def history_context(chat_history: list[dict[str, str]] | None, *, max_user_prompts: int = 3) -> str:
+    if not chat_history:
+        return ""
+    prompts = [
+        (t.get("content") or "").strip()
+        for t in chat_history
+        if (t.get("role") or "").strip().lower() == "user" and (t.get("content") or "").strip()
+    ]
+    return "\n".join(prompts[-max_user_prompts:])
+
+
+def select_schema(
+    schema: SchemaModel,
+    question: str,
+    *,
+    chat_history: list[dict[str, str]] | None = None,
+    top_k: int = DEFAULT_TOP_K,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> SchemaSelection:
+    """Schema text for the prompt: the whole schema when it fits ``token_budget``, else the
+    top-k question-relevant tables plus their FK neighbours, trimmed to the budget."""
+    return schema_index(schema).select(
+        question,
+        context=history_context(chat_history),
+        top_k=top_k,
+        token_budget=token_budget,
+    )
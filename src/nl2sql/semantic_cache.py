@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable
+
+import numpy as np
+
+from .schema_index import tokenize
+
+DEFAULT_THRESHOLD = 0.95
+
+_DIM = 2048
+_NGRAMS = (3, 4)
+_WORD_WEIGHT = 2.0
+
+# "top ten customers" and "top 10 customers" must land on the same vector.
+_NUMBER_WORDS = {
+    "one": "1",
+    "two": "2",
+    "three": "3",
+    "four": "4",
+    "five": "5",
+    "six": "6",
+    "seven": "7",
+    "eight": "8",
+    "nine": "9",
+    "ten": "10",
+    "twenty": "20",
+    "fifty": "50",
+    "hundred": "100",
+    # Hinglish
+    "ek": "1",
+    "teen": "3",
+    "char": "4",
+    "paanch": "5",
+    "panch": "5",
+    "das": "10",
+    "bees": "20",
+    "pachas": "50",
+    "sau": "100",
+}
+
+# Filler that changes the phrasing but not the query, in English and Hinglish.
+_STOPWORDS = frozenset(
+    """
+    the by of for in on to me show list give get find what which who are is was please all
+    ke ki ka ko se hisaab hisab mujhe dikhao batao bata wale wali hai hain kya kaun sabse mein
+    """.split()
+)
+
+
+# Words that flip or reorder the result without moving the n-gram vector much; two questions
+# only match when they use exactly the same ones ("shipped" is not "not shipped").
+_POLARITY_WORDS = frozenset(
+    """
+    not no never without none nothing nobody neither nor except excluding exclude
+    asc ascending desc descending top bottom highest lowest most least max min maximum minimum
+    first last earliest latest oldest newest before after above below over under more less fewer
+    greater smaller larger best worst increase decrease
+    nahi nahin na bina kam zyada jyada
+    """.split()
+)
+_NEGATING_PREFIXES = ("non", "un", "in")
+_CONTRACTED_NOT = re.compile(r"n['\u2019]t\b", re.IGNORECASE)
+
+
+def _is_polar(term: str) -> bool:
+    if term in _POLARITY_WORDS:
+        return True
+    # unpaid, inactive, nonzero; err towards a miss on words like "invoice".
+    return any(term.startswith(p) and len(term) - len(p) >= 4 for p in _NEGATING_PREFIXES)
+
+
+@lru_cache(maxsize=16)
+def _identifier_terms(identifiers: tuple[str, ...]) -> frozenset[str]:
+    return frozenset(t for name in identifiers for t in tokenize(name))
+
+
+# String literals ('' escapes a quote), then numbers that are not part of a name.
+_SQL_STRING = re.compile(r"'((?:[^']|'')*)'")
+_SQL_NUMBER = re.compile(r"(?<![\w.\"])\d+(?:\.\d+)?(?![\w.])")
+_QUESTION_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_LIKE_WILDCARDS = re.compile(r"^[%_]+|[%_]+$")
+
+
+def sql_literals(sql: str) -> tuple[frozenset[str], frozenset[str]]:
+    """The string and number literals in ``sql``, lower-cased; LIKE wildcards at either end are dropped."""
+    strings = {
+        _LIKE_WILDCARDS.sub("", m.group(1).replace("''", "'")).strip().lower() for m in _SQL_STRING.finditer(sql or "")
+    }
+    numbers = set(_SQL_NUMBER.findall(_SQL_STRING.sub("''", sql or "")))
+    return frozenset(s for s in strings if s), frozenset(numbers)
+
+
+def literals_in_question(sql: str, question: str) -> bool:
+    """Whether every literal ``sql`` filters on is spelled out in ``question``.
+
+    A plan borrowed from a similar question is only safe if it does not carry
+    that question's values ("north" is not "south", "john" is not "jane").
+    """
+    strings, numbers = sql_literals(sql)
+    text = (question or "").lower()
+    if any(s not in text for s in strings):
+        return False
+    mentioned = {*_QUESTION_NUMBER.findall(text), *(_NUMBER_WORDS[t] for t in tokenize(text) if t in _NUMBER_WORDS)}
+    return numbers <= mentioned
+
+
+def _terms(question: str) -> list[str]:
+    out: list[str] = []
+    for tok in tokenize(_CONTRACTED_NOT.sub(" not", question or "")):
+        tok = _NUMBER_WORDS.get(tok, tok)
+        if tok not in _STOPWORDS:
+            out.append(tok)
+    return out
+
+
+def vectorize(question: str, identifiers: Iterable[str] = ()) -> tuple[np.ndarray, frozenset[str]]:
+    """Unit-length hashed character n-gram vector for ``question``, plus the words that must match
+    exactly: its numbers, its negation/ordering words, and every other word that is not part of a
+    schema identifier (filter values such as "north" or "john").
+
+    N-grams are taken per word (padded with ``<``/``>``), so word order and small
+    spelling differences barely move the vector.
+    """
+    names = _identifier_terms(tuple(identifiers))
+    vec = np.zeros(_DIM, dtype=np.float32)
+    terms = _terms(question)
+    for term in terms:
+        vec[zlib.crc32(term.encode("utf-8")) % _DIM] += _WORD_WEIGHT
+        padded = f"<{term}>"
+        for n in _NGRAMS:
+            for i in range(max(1, len(padded) - n + 1)):
+                vec[zlib.crc32(padded[i : i + n].encode("utf-8")) % _DIM] += 1.0
+    np.log1p(vec, out=vec)
+    norm = float(np.linalg.norm(vec))
+    if norm:
+        vec /= norm
+    return vec, frozenset(t for t in terms if t.isdigit() or _is_polar(t) or t not in names)
+
+
+@dataclass(frozen=True)
+class SemanticHit:
+    slot: int
+    plan: dict[str, Any]
+    question: str
+    similarity: float
+
+
+@dataclass(frozen=True)
+class SemanticStats:
+    entries: int
+    lookups: int
+    hits: int
+    rejected: int
+
+
+class SemanticIndex:
+    """Nearest-neighbour lookup of cached plans by question similarity.
+
+    Vectors live in one preallocated matrix, so a lookup is a single matrix-vector
+    product. Entries only match within their ``scope`` (mode, model, history...)
+    and only when both questions mention the same numbers ("top 5" is not "top 10"), the
+    same negation/ordering words ("top" is not "bottom", "shipped" is not "not shipped")
+    and the same words outside the schema's ``identifiers``. A cached plan is also
+    skipped unless every literal in its SQL appears in the new question.
+    """
+
+    def __init__(self, *, threshold: float = DEFAULT_THRESHOLD, ttl_s: float, max_entries: int = 512):
+        self.threshold = float(threshold)
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((self.max_entries, _DIM), dtype=np.float32)
+        self._scopes = np.empty(self.max_entries, dtype=object)
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)  # 0 = free slot
+        self._entries: list[tuple[str, frozenset[str], dict[str, Any]] | None] = [None] * self.max_entries
+        self._lookups = 0
+        self._hits = 0
+        self._rejected = 0
+
+    def lookup(self, question: str, *, scope: str, identifiers: Iterable[str] = ()) -> SemanticHit | None:
+        vec, exact = vectorize(question, identifiers)
+        if not vec.any():
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._lookups += 1
+            live = (self._expires > now) & (self._scopes == scope)
+            if not live.any():
+                return None
+            sims = self._matrix @ vec
+            sims[~live] = -1.0
+            for slot in np.argsort(sims)[::-1]:
+                similarity = float(sims[slot])
+                if similarity < self.threshold:
+                    return None
+                entry = self._entries[slot]
+                if entry is not None and entry[1] == exact and literals_in_question(entry[2].get("sql", ""), question):
+                    self._hits += 1
+                    return SemanticHit(slot=int(slot), plan=dict(entry[2]), question=entry[0], similarity=similarity)
+        return None
+
+    def put(self, question: str, plan: dict[str, Any], *, scope: str, identifiers: Iterable[str] = ()) -> None:
+        vec, exact = vectorize(question, identifiers)
+        if not vec.any():
+            return
+        now = time.monotonic()
+        with self._lock:
+            free = np.flatnonzero(self._expires <= now)
+            # Reuse an expired/free slot, else evict the entry closest to expiry (the oldest).
+            slot = int(free[0]) if free.size else int(np.argmin(self._expires))
+            self._matrix[slot] = vec
+            self._scopes[slot] = scope
+            self._expires[slot] = now + self.ttl_s
+            self._entries[slot] = (question, exact, dict(plan))
+
+    def reject(self, hit: SemanticHit) -> None:
+        """Drop a hit whose plan no longer fits the schema."""
+        with self._lock:
+            self._rejected += 1
+            if self._entries[hit.slot] is not None and self._entries[hit.slot][0] == hit.question:
+                self._expires[hit.slot] = 0.0
+                self._entries[hit.slot] = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires[:] = 0.0
+            self._entries = [None] * self.max_entries
+
+    def stats(self) -> SemanticStats:
+        now = time.monotonic()
+        with self._lock:
+            return SemanticStats(
+                entries=int((self._expires > now).sum()),
+                lookups=self._lookups,
+                hits=self._hits,
+                rejected=self._rejected,
+            )
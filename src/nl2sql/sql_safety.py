@@ -4,6 +4,8 @@ import re
 from typing import Literal
 
 import sqlparse
+from sqlparse import sql as sqltree
+from sqlparse import tokens as T
 
 
 class UnsafeSQLError(ValueError):
@@ -50,6 +52,21 @@ _DOUBLE_QUOTED = re.compile(r'"(?:[^"]|"")*"')
 _SELECT_TOP = re.compile(r"^\s*select\s+(distinct\s+)?top\s*\(?\s*(\d+)\s*\)?\s+", re.IGNORECASE)
 _SET_OP = re.compile(r"\b(union(\s+all)?|intersect|except)\b", re.IGNORECASE)
 _LIMIT_BEFORE_SET_OP = re.compile(r"\blimit\s+\d+\s+(?=union\b|intersect\b|except\b)", re.IGNORECASE)
+_IDENT = r'(?:"(?:[^"]|"")+"|[A-Za-z_][A-Za-z_0-9$]*)'
+_TABLE_REF = re.compile(
+    rf"\b(?:from|join|into|update|table)\s+(?:only\s+)?({_IDENT}(?:\s*\.\s*{_IDENT})?)",
+    re.IGNORECASE,
+)
+_RELATION_KEYWORDS = frozenset({"FROM", "INTO", "UPDATE", "TABLE", "USING"})
+# Results that differ from one run to the next even when no table changed.
+_VOLATILE = re.compile(
+    r"\b(?:"
+    r"(?:now|random|random_normal|setseed|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|"
+    r"gen_random_uuid|uuid_generate_v[14]|nextval|currval|lastval|setval|txid_current|pg_current_xact_id)\s*\("
+    r"|current_date|current_time|current_timestamp|localtime|localtimestamp"
+    r")",
+    re.IGNORECASE,
+)
 
 
 def _single_statement(sql: str) -> str:
@@ -213,3 +230,57 @@ def apply_limit(sql: str, max_rows: int) -> str:
     if re.search(r"\blimit\s+\d+\b", normalized, re.IGNORECASE):
         return normalized
     return f"{normalized}\nLIMIT {max_rows}"
+
+
+def referenced_tables(sql: str) -> set[str]:
+    """Lower-cased base names of relations a statement reads or writes.
+
+    Covers every FROM-list item (``FROM a, b``), JOINs, INTO/UPDATE/USING/TABLE
+    targets, and subqueries and CTE bodies at any depth. Names are taken as written:
+    a view is reported as the view, not the tables behind it, so callers that tag
+    cached results must handle views themselves. CTE names, aliases and the column
+    in ``EXTRACT(... FROM col)`` may also appear; those only over-invalidate.
+    """
+    masked = sqlparse.format(sql or "", strip_comments=True)
+    masked = _DOLLAR_QUOTED.sub("''", masked)
+    masked = _SINGLE_QUOTED.sub("''", masked)
+    out: set[str] = set()
+    for m in _TABLE_REF.finditer(masked):
+        base = re.split(r"\s*\.\s*", m.group(1))[-1]
+        if base.startswith('"'):
+            base = base[1:-1].replace('""', '"')
+        out.add(base.lower())
+    for stmt in sqlparse.parse(masked):
+        _collect_relations(stmt, out)
+    return out
+
+
+def _collect_relations(group: sqltree.TokenList, out: set[str]) -> None:
+    expect = False
+    for tok in group.tokens:
+        if tok.is_whitespace or tok.ttype in T.Comment:
+            continue
+        if tok.ttype in T.Keyword:
+            word = tok.normalized
+            if word in _RELATION_KEYWORDS or word.endswith("JOIN"):
+                expect = True
+            elif not (expect and word in ("ONLY", "LATERAL")):
+                expect = False
+            continue
+        if expect:
+            items = tok.get_identifiers() if isinstance(tok, sqltree.IdentifierList) else [tok]
+            for item in items:
+                if isinstance(item, (sqltree.Identifier, sqltree.Function)) and not isinstance(
+                    item.token_first(), sqltree.Parenthesis
+                ):
+                    name = item.get_real_name()
+                    if name:
+                        out.add(name.replace('""', '"').lower())
+            expect = False
+        if tok.is_group:
+            _collect_relations(tok, out)
+
+
+def calls_volatile_function(sql: str) -> bool:
+    """Whether ``sql`` reads the clock, a random source or a sequence, so its result can't be reused."""
+    return bool(_VOLATILE.search(_mask_literals_and_comments(sql or "")))
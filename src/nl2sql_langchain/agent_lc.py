@@ -14,6 +14,9 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 
 from nl2sql.db import PostgresDB
+from nl2sql.prompt_budget import DEFAULT_MAX_OUTPUT_TOKENS
+from nl2sql.prompts import langchain_system_prompt
+from nl2sql.schema_index import DEFAULT_TOKEN_BUDGET, DEFAULT_TOP_K, select_schema
 from nl2sql.sql_safety import SQLMode, validate_sql, classify_statement, apply_limit, UnsafeSQLError
 from dataclasses import dataclass
 
@@ -29,6 +32,7 @@ class NL2SQLResponse:
     sql_statements: list[str]
     results: list | None
     answer: str
+    cached: bool = False
 
 
 class LangChainAgent:
@@ -44,10 +48,15 @@ class LangChainAgent:
         sql_mode: SQLMode = "read_only",
         max_sql_statements: int = 4,
         temperature: float = 0.2,
+        schema_top_k: int = DEFAULT_TOP_K,
+        schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
     ):
         self.provider = provider
         self.sql_mode = sql_mode
         self.max_sql_statements = max_sql_statements
+        self.schema_top_k = schema_top_k
+        self.schema_token_budget = schema_token_budget
         
         # Initialize LLM based on provider
         if provider == "gemini":
@@ -55,14 +64,14 @@ class LangChainAgent:
                 model=model,
                 google_api_key=api_key,
                 temperature=temperature,
-                max_output_tokens=1000,
+                max_output_tokens=max_output_tokens,
             )
         elif provider == "groq":
             self.llm = ChatGroq(
                 model=model,
                 groq_api_key=api_key,
                 temperature=temperature,
-                max_tokens=1000,
+                max_tokens=max_output_tokens,
             )
         else:
             raise ValueError(f"Unknown provider: {provider}")
@@ -79,63 +88,15 @@ class LangChainAgent:
     
     def _create_prompt_template(self) -> ChatPromptTemplate:
         """Create LangChain prompt with memory support"""
-        
-        system_instructions = """You are a PostgreSQL query assistant that converts natural language to SQL.
-You must ALWAYS return valid JSON.
-Output schema:
-- kind: one of "chat" | "clarify" | "sql"
-- message: string (concise response or clarification question)
-- sql: string (only when kind="sql", otherwise empty)
-
-Decision logic:
-- If the user provides a greeting (e.g., hi/hello), acknowledge briefly with kind="chat".
-- If the user requests database query, output kind="sql" with valid PostgreSQL statement(s).
-- If the user requests INSERT/UPDATE/DELETE but provides incomplete info, request clarification with kind="clarify".
-- If the user refers to non-existent tables/columns, respond with kind="clarify" and suggest corrections.
-- Always respond in English, regardless of input language.
-
-SQL rules:
-{mode_rules}
+        # Mode rules are fixed per agent, so they're baked into the system text once instead of on every call.
+        system_instructions = langchain_system_prompt(self.sql_mode, max(1, int(self.max_sql_statements)))
 
-General rules:
-- Accept input in English, Hindi, or Hinglish. Respond in English.
-- Use only tables/columns from the provided schema with exact names.
-- Infer intended table/column names from typos using schema context.
-- Use explicit table qualifiers for potentially ambiguous columns.
-- For text filters, use case-insensitive matching: LOWER(TRIM(col)).
-- Supported operations: +, -, *, /, %, SUM/AVG/MIN/MAX, COUNT, CASE, COALESCE.
-- Ensure numeric types before arithmetic operations.
-- Prevent division by zero: use NULLIF(denominator, 0).
-- Use PostgreSQL syntax: LIMIT (not SQL Server's TOP).
-- For INSERT/UPDATE/DELETE: include RETURNING * to show affected rows.
-- Add LIMIT to list queries for efficiency."""
-        
         return ChatPromptTemplate.from_messages([
             ("system", system_instructions),
             MessagesPlaceholder(variable_name="chat_history"),
             ("user", "SCHEMA:\n{schema}\n\nQUESTION:\n{question}"),
         ])
     
-    def _get_mode_rules(self) -> str:
-        """Get SQL mode rules based on current mode"""
-        if self.sql_mode == "read_only":
-            return f"""SQL mode: READ ONLY.
-- Output up to {self.max_sql_statements} statement(s), separated by semicolons.
-- Allowed: SELECT or WITH.
-- Forbidden: any write/delete/ddl operations."""
-        elif self.sql_mode == "write_no_delete":
-            return f"""SQL mode: WRITE (NO DELETE).
-- Output up to {self.max_sql_statements} statement(s), separated by semicolons.
-- Allowed: SELECT/WITH, INSERT, UPDATE, and CREATE TABLE/VIEW/INDEX.
-- Forbidden: DELETE, DROP, ALTER, TRUNCATE, GRANT/REVOKE, COPY, VACUUM, functions/procedures.
-- Prefer safe changes: use WHERE clauses for UPDATE; use RETURNING * when helpful."""
-        else:  # write_full
-            return f"""SQL mode: WRITE (FULL CRUD).
-- Output up to {self.max_sql_statements} statement(s), separated by semicolons.
-- Allowed: SELECT/WITH, INSERT, UPDATE, DELETE, and CREATE TABLE/VIEW/INDEX.
-- Forbidden: DROP, ALTER, TRUNCATE, GRANT/REVOKE, COPY, VACUUM, functions/procedures.
-- Prefer safe changes: use WHERE clauses for UPDATE/DELETE; use RETURNING * when helpful."""
-    
     def _format_chat_history(self) -> list:
         """Convert memory to LangChain message format"""
         messages = []
@@ -164,8 +125,14 @@ General rules:
         """
         Main entry point: Answer user question using LangChain
         """
-        # Fetch database schema
-        schema_text = db.fetch_schema()
+        # Fetch database schema, pruned to the tables relevant to this question
+        schema_text = select_schema(
+            db.fetch_schema(),
+            question,
+            chat_history=self.memory,
+            top_k=self.schema_top_k,
+            token_budget=self.schema_token_budget,
+        ).text
         
         # If SQL override provided, skip LLM
         raw_sql = (sql_override or "").strip()
@@ -174,7 +141,6 @@ General rules:
         
         if not raw_sql:
             # Prepare inputs for LangChain chain
-            mode_rules = self._get_mode_rules()
             chat_history = self._format_chat_history()
             
             try:
@@ -183,8 +149,6 @@ General rules:
                     "schema": schema_text,
                     "question": question,
                     "chat_history": chat_history,
-                    "mode_rules": mode_rules,
-                    "max_statements": self.max_sql_statements,
                 })
                 
                 kind = result.get("kind", "sql")
@@ -252,12 +216,12 @@ General rules:
         if not execute:
             answer = message or "SQL generated. Review before execution."
         elif stmt in ("select", "with"):
-            last_rows = results[-1].rows if results else []
+            last_rows = results[-1].data if results else []
             answer = message or f"Query returned {len(last_rows)} row(s)."
         else:
             last = results[-1] if results else None
             rc = last.rowcount if last is not None else 0
-            returned = len(last.rows) if last is not None else 0
+            returned = len(last.data) if last is not None else 0
             answer = message or f"{stmt.upper()} executed (affected rows: {rc})."
             if returned:
                 answer = f"{answer} Returned {returned} row(s)."
@@ -271,5 +235,6 @@ General rules:
             sql=full_sql,
             sql_statements=normalized_statements,
             results=results,
-            answer=answer
+            answer=answer,
+            cached=bool(results) and all(r.cached for r in results)
         )
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Unit tests import the package straight from src, like the apps do.
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
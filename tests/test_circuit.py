@@ -0,0 +1,173 @@
+import pytest
+
+from nl2sql import circuit, llm_client
+from nl2sql.circuit import BreakerConfig, CircuitBreakers
+from nl2sql.llm_client import FailoverTarget, LLMChatMessage, LLMError, LLMProvider, LLMUnavailableError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "monotonic", clock)
+    return clock
+
+
+def _breakers(**overrides) -> CircuitBreakers:
+    config = {"window_s": 60, "min_calls": 4, "error_rate": 0.5, "open_s": 30, **overrides}
+    return CircuitBreakers(BreakerConfig(**config))
+
+
+def _fail(breakers: CircuitBreakers, times: int, *, ok: bool = False) -> None:
+    for _ in range(times):
+        assert breakers.acquire("p", "m") == 0.0
+        breakers.record("p", "m", ok=ok, elapsed_s=0.1)
+
+
+def _state(breakers: CircuitBreakers) -> str:
+    return breakers.metrics()["p:m"]["state"]
+
+
+def test_opens_at_the_error_rate_once_min_calls_are_in(clock):
+    breakers = _breakers()
+    _fail(breakers, 2, ok=True)
+    _fail(breakers, 1)
+    assert _state(breakers) == "closed"
+    _fail(breakers, 1)
+    assert _state(breakers) == "open"
+    assert breakers.acquire("p", "m") == pytest.approx(30.0)
+    assert not breakers.admits("p", "m")
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breakers = _breakers()
+    _fail(breakers, 3)
+    clock.now += 61
+    _fail(breakers, 1)
+    assert _state(breakers) == "closed"
+
+
+def test_half_open_admits_one_probe_and_a_success_closes(clock):
+    breakers = _breakers()
+    _fail(breakers, 4)
+    clock.now += 30
+    assert breakers.admits("p", "m")
+    assert breakers.acquire("p", "m") == 0.0
+    assert _state(breakers) == "half_open"
+    assert not breakers.admits("p", "m")
+    assert breakers.acquire("p", "m") > 0
+    breakers.record("p", "m", ok=True, elapsed_s=0.1)
+    assert _state(breakers) == "closed"
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breakers = _breakers()
+    _fail(breakers, 4)
+    clock.now += 30
+    _fail(breakers, 1)
+    assert _state(breakers) == "open"
+    assert breakers.metrics()["p:m"]["trips"] == 2
+
+
+def test_abandoned_probe_only_frees_its_slot(clock):
+    breakers = _breakers()
+    _fail(breakers, 4)
+    clock.now += 30
+    assert breakers.acquire("p", "m") == 0.0
+    breakers.record("p", "m", ok=None, elapsed_s=0.1)
+    assert _state(breakers) == "half_open"
+    assert breakers.admits("p", "m")
+
+
+def test_slow_calls_trip_the_breaker(clock):
+    breakers = _breakers(error_rate=0.0, slow_call_s=2.0, slow_rate=0.5)
+    for _ in range(4):
+        breakers.acquire("p", "m")
+        breakers.record("p", "m", ok=True, elapsed_s=3.0)
+    assert _state(breakers) == "open"
+
+
+class _Scripted(LLMProvider):
+    """Raises the queued errors in turn, then answers "ok"."""
+
+    def __init__(self, name: str, errors=()):
+        self.name = name
+        self.errors = list(errors)
+        self.calls = 0
+
+    def complete(self, **kwargs) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+    async def complete_async(self, **kwargs) -> str:
+        return self.complete(**kwargs)
+
+    def stream(self, **kwargs):
+        yield self.complete(**kwargs)
+
+    async def stream_async(self, **kwargs):
+        yield self.complete(**kwargs)
+
+
+@pytest.fixture
+def breakers(monkeypatch, clock):
+    breakers = _breakers(min_calls=2)
+    monkeypatch.setattr(llm_client, "_BREAKERS", breakers)
+    monkeypatch.setattr(llm_client, "_FAILOVER", FailoverTarget())
+    monkeypatch.setattr(llm_client, "_PROVIDERS", dict(llm_client._PROVIDERS))
+    return breakers
+
+
+def _call(provider: str) -> str:
+    return llm_client._completion(
+        provider=provider, api_key="k", model="m", messages=[LLMChatMessage(role="user", content="hi")]
+    )
+
+
+def test_only_unavailability_counts_against_the_circuit(breakers):
+    llm_client.register_provider(_Scripted("bad-request", [LLMError("Groq API error 400: bad")] * 3))
+    for _ in range(3):
+        with pytest.raises(LLMError):
+            _call("bad-request")
+    assert breakers.metrics()["bad-request:m"]["state"] == "closed"
+
+    llm_client.register_provider(_Scripted("down", [LLMUnavailableError("Groq API error 503: down")] * 2))
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            _call("down")
+    assert breakers.metrics()["down:m"]["state"] == "open"
+
+
+def test_half_open_callers_without_a_probe_slot_fail_over(breakers, monkeypatch, clock):
+    monkeypatch.setattr(llm_client, "_FAILOVER", FailoverTarget(provider="backup", model="m", api_key="k"))
+    for _ in range(2):
+        breakers.acquire("primary", "m")
+        breakers.record("primary", "m", ok=False, elapsed_s=0.1)
+    clock.now += 30
+    assert breakers.acquire("primary", "m") == 0.0  # another caller holds the only probe slot
+    assert llm_client._route("primary", "k", "m") == ("backup", "k", "m")
+    breakers.record("primary", "m", ok=True, elapsed_s=0.1)
+    assert llm_client._route("primary", "k", "m") == ("primary", "k", "m")
+
+
+def test_failover_is_opt_in(monkeypatch):
+    from nl2sql.config import load_settings
+
+    monkeypatch.setenv("GEMINI_API_KEY", "g")
+    monkeypatch.setenv("GROQ_API_KEY", "q")
+    monkeypatch.delenv("NL2SQL_FAILOVER_PROVIDER", raising=False)
+    monkeypatch.delenv("NL2SQL_LLM_PROVIDER", raising=False)
+    assert not load_settings().failover_target.enabled
+
+    monkeypatch.setenv("NL2SQL_FAILOVER_PROVIDER", "groq")
+    target = load_settings().failover_target
+    assert target.enabled and (target.provider, target.api_key) == ("groq", "q")
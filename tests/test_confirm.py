@@ -0,0 +1,31 @@
+import pytest
+
+from nl2sql.confirm import ConfirmationError, issue_confirmation, verify_confirmation
+
+
+def test_token_round_trips_the_held_sql():
+    token = issue_confirmation("big report", "SELECT * FROM orders", secret="s")
+    assert verify_confirmation(token, "big report", secret="s") == "SELECT * FROM orders"
+
+
+def test_token_is_bound_to_the_question():
+    token = issue_confirmation("big report", "SELECT * FROM orders", secret="s")
+    with pytest.raises(ConfirmationError):
+        verify_confirmation(token, "another question", secret="s")
+
+
+@pytest.mark.parametrize("secret", ["s", "other"])
+def test_tampered_or_foreign_token_is_rejected(secret):
+    body, _, mac = issue_confirmation("q", "SELECT 1", secret="s").partition(".")
+    forged = issue_confirmation("q", "DROP TABLE orders", secret="x").partition(".")[0]
+    with pytest.raises(ConfirmationError):
+        verify_confirmation(f"{forged}.{mac}", "q", secret=secret)
+    if secret != "s":
+        with pytest.raises(ConfirmationError):
+            verify_confirmation(f"{body}.{mac}", "q", secret=secret)
+
+
+def test_expired_token_is_rejected():
+    token = issue_confirmation("q", "SELECT 1", secret="s", ttl_s=-1)
+    with pytest.raises(ConfirmationError):
+        verify_confirmation(token, "q", secret="s")
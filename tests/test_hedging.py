@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from nl2sql import llm_client
+from nl2sql.llm_client import HedgeConfig
+
+
+@pytest.fixture
+def hedge_pool(monkeypatch):
+    monkeypatch.setattr(llm_client, "_HEDGE_CONFIG", HedgeConfig(max_workers=2))
+    monkeypatch.setattr(llm_client, "_HEDGE_EXECUTOR", None)
+    monkeypatch.setattr(llm_client, "_HEDGE_BUSY", 0)
+    yield {"calls": 0, "hedged": 0, "skipped": 0, "primary_wins": 0, "secondary_wins": 0, "failed": 0}
+    # Let losers finish before the next test resets the counters.
+    for _ in range(500):
+        if llm_client._HEDGE_BUSY == 0:
+            break
+        time.sleep(0.01)
+
+
+def test_secondary_gets_only_the_remaining_timeout(hedge_pool):
+    release = threading.Event()
+    seen = {}
+
+    def primary(timeout_s=10.0):
+        release.wait(5)
+        return "slow"
+
+    def secondary(timeout_s=10.0):
+        seen["timeout_s"] = timeout_s
+        return "fast"
+
+    try:
+        text = llm_client._hedged(primary, secondary, stats=hedge_pool, delay_s=0.2, timeout_s=10.0, validate=None)
+    finally:
+        release.set()
+    assert text == "fast"
+    assert 9.0 < seen["timeout_s"] <= 9.8
+    assert hedge_pool["secondary_wins"] == 1
+
+
+def test_saturated_pool_runs_unhedged_on_the_caller(hedge_pool):
+    release = threading.Event()
+    losers = [llm_client._hedge_submit(lambda: release.wait(5) and "loser") for _ in range(2)]
+    callers = []
+
+    def primary():
+        callers.append(threading.current_thread())
+        return "primary"
+
+    try:
+        started = time.monotonic()
+        text = llm_client._hedged(
+            primary, lambda **_: "secondary", stats=hedge_pool, delay_s=0.0, timeout_s=10.0, validate=None
+        )
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+    assert text == "primary"
+    assert callers == [threading.current_thread()]
+    assert hedge_pool["skipped"] == 1 and hedge_pool["hedged"] == 0
+    assert all(f.result(timeout=5) == "loser" for f in losers)
+
+
+def test_sync_hedge_waits_no_longer_than_the_timeout(hedge_pool):
+    release = threading.Event()
+
+    def slow(timeout_s=10.0):
+        release.wait(5)
+        return "late"
+
+    started = time.monotonic()
+    try:
+        with pytest.raises(llm_client.LLMUnavailableError):
+            llm_client._hedged(slow, slow, stats=hedge_pool, delay_s=0.1, timeout_s=0.5, validate=None)
+        assert time.monotonic() - started < 1.5
+    finally:
+        release.set()
+    assert hedge_pool["failed"] == 1
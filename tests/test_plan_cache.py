@@ -0,0 +1,144 @@
+import pytest
+
+from nl2sql import agent, cache
+from nl2sql.db import DatabaseError, QueryResult
+from nl2sql.plan_cache import PlanCache, plan_cache_key
+from nl2sql.schema import ColumnInfo, SchemaModel, TableInfo
+
+PLAN = {"kind": "sql", "sql": "SELECT count(*) FROM public.orders", "message": "Counted."}
+
+
+def _key(question="how many orders", **overrides):
+    parts = {
+        "question": question,
+        "schema_fingerprint": "v1",
+        "sql_mode": "read_only",
+        "max_sql_statements": 4,
+        "model": "mock:m",
+        "history": "",
+        **overrides,
+    }
+    return plan_cache_key(**parts)
+
+
+def test_key_ignores_case_spacing_and_trailing_punctuation():
+    assert _key("How many  orders?").exact == _key("how many orders").exact
+
+
+@pytest.mark.parametrize(
+    "change",
+    [{"sql_mode": "write_full"}, {"schema_fingerprint": "v2"}, {"history": "user: and customers?"}, {"model": "mock:n"}],
+)
+def test_key_changes_with_mode_schema_history_and_model(change):
+    assert _key(**change).exact != _key().exact
+
+
+def test_schema_version_is_not_part_of_the_semantic_scope():
+    assert _key(schema_fingerprint="v2").scope == _key().scope
+    assert _key(sql_mode="write_full").scope != _key().scope
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    plans = PlanCache(ttl_s=60)
+    plans.put(_key(), PLAN)
+    clock.now += 59
+    assert plans.get(_key()) == PLAN
+    clock.now += 2
+    assert plans.get(_key()) is None
+    assert plans.stats().expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    plans = PlanCache(ttl_s=60, max_entries=2)
+    plans.put(_key("a"), PLAN)
+    plans.put(_key("b"), PLAN)
+    assert plans.get(_key("a")) is not None
+    plans.put(_key("c"), PLAN)
+    assert plans.get(_key("b")) is None
+    assert plans.get(_key("a")) is not None and plans.get(_key("c")) is not None
+    assert plans.stats().evictions == 1
+
+
+def test_only_plan_fields_are_stored():
+    plans = PlanCache(ttl_s=60)
+    plans.put(_key(), {**PLAN, "prompt_tokens": {"total": 10}})
+    assert plans.get(_key()) == PLAN
+
+
+class _DB:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+        self.schema = SchemaModel(
+            tables=(TableInfo(schema="public", name="orders", kind="table", columns=(ColumnInfo("id", "integer"),)),),
+            fingerprint="v1",
+        )
+
+    def fetch_schema(self):
+        return self.schema
+
+    def execute_sql(self, sql, *, statement_timeout_ms):
+        self.executed.append(sql)
+        if self.fail:
+            raise DatabaseError("canceling statement due to statement timeout")
+        return QueryResult(columns=["count"], data=[(3,)], rowcount=1)
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    calls = []
+
+    def generate_plan(**kwargs):
+        calls.append(kwargs["question"])
+        return dict(PLAN)
+
+    monkeypatch.setattr(agent, "generate_plan", generate_plan)
+    return calls
+
+
+def _answer(db, plans, **kwargs):
+    options = {"provider": "mock", "api_key": "", "model": "m", "question": "how many orders", **kwargs}
+    return agent.answer_question(db=db, plan_cache=plans, **options)
+
+
+def test_plans_are_stored_after_a_successful_run_and_reused(planner):
+    plans = PlanCache(ttl_s=60)
+    db = _DB()
+    assert not _answer(db, plans).plan_cached
+    response = _answer(db, plans)
+    assert response.plan_cached
+    assert planner == ["how many orders"]
+    assert len(db.executed) == 2
+
+
+def test_plans_whose_sql_failed_are_not_stored(planner):
+    plans = PlanCache(ttl_s=60)
+    with pytest.raises(DatabaseError):
+        _answer(_DB(fail=True), plans)
+    assert plans.stats().entries == 0
+
+
+def test_plans_that_were_not_executed_are_not_stored(planner):
+    plans = PlanCache(ttl_s=60)
+    _answer(_DB(), plans, execute=False)
+    assert plans.stats().entries == 0
+
+
+def test_sql_override_is_never_stored(planner):
+    plans = PlanCache(ttl_s=60)
+    db = _DB()
+    _answer(db, plans, sql_override="SELECT id FROM public.orders")
+    assert plans.stats().entries == 0
+    assert planner == []
+    _answer(db, plans)
+    assert planner == ["how many orders"]
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+from nl2sql import llm_client
+from nl2sql.agent import _notify_sql
+from nl2sql.circuit import BreakerConfig, CircuitBreakers
+from nl2sql.llm_client import FailoverTarget, LLMChatMessage, LLMError, LLMProvider, LLMUnavailableError
+from nl2sql.plan_stream import PlanStreamParser
+
+PLAN = {"kind": "sql", "sql": "SELECT name FROM public.customers WHERE note = 'say \"hi\"'", "message": "Names."}
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_fields_arrive_across_partial_chunks(size):
+    parser = PlanStreamParser()
+    seen = []
+    for chunk in _chunks("```json\n" + json.dumps(PLAN) + "\n```", size):
+        seen.extend(parser.feed(chunk))
+    assert seen == list(PLAN.items())
+    assert parser.fields == PLAN
+    assert parser.done
+
+
+def test_sql_is_reported_before_the_object_closes():
+    parser = PlanStreamParser()
+    text = json.dumps(PLAN)
+    cut = text.index('"message"')
+    assert ("sql", PLAN["sql"]) in parser.feed(text[:cut])
+    assert not parser.done
+
+
+def test_escaped_quotes_and_backslashes_stay_inside_the_string():
+    sql = 'SELECT \'a\\b\' AS "x", \'}\' AS y'
+    parser = PlanStreamParser()
+    completed = []
+    for ch in json.dumps({"kind": "sql", "sql": sql}):
+        completed.extend(parser.feed(ch))
+    assert ("sql", sql) in completed
+    assert parser.done
+
+
+def test_nested_and_non_string_values_are_skipped():
+    parser = PlanStreamParser()
+    parser.feed('{"kind": "sql", "meta": {"sql": "nested"}, "n": 3, "sql": "SELECT 1"}')
+    assert parser.fields == {"kind": "sql", "sql": "SELECT 1"}
+
+
+def test_non_sql_plans_do_not_start_early_execution():
+    parser = PlanStreamParser()
+    started = []
+    for chunk in _chunks(json.dumps({"kind": "chat", "sql": "SELECT 1", "message": "Hello!"}), 4):
+        _notify_sql(parser, chunk, started.append)
+    assert started == []
+    assert parser.fields["kind"] == "chat"
+
+
+class _BrokenStream(LLMProvider):
+    """Fails to stream with the queued error; answers non-streamed calls with a plan."""
+
+    def __init__(self, error: LLMError, *, partial: str = ""):
+        self.name = "broken"
+        self.error = error
+        self.partial = partial
+        self.completions = []
+
+    def complete(self, **kwargs) -> str:
+        raise AssertionError("sync path not used")
+
+    async def complete_async(self, **kwargs) -> str:
+        self.completions.append(kwargs)
+        return json.dumps(PLAN)
+
+    def stream(self, **kwargs):
+        raise AssertionError("sync path not used")
+
+    async def stream_async(self, **kwargs):
+        if self.partial:
+            yield self.partial
+        raise self.error
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setattr(llm_client, "_BREAKERS", CircuitBreakers(BreakerConfig()))
+    monkeypatch.setattr(llm_client, "_FAILOVER", FailoverTarget())
+    monkeypatch.setattr(llm_client, "_PROVIDERS", dict(llm_client._PROVIDERS))
+
+
+async def _collect(**kwargs) -> list[str]:
+    return [
+        delta
+        async for delta in llm_client.chat_completion_stream_async(
+            provider="broken",
+            api_key="k",
+            model="m",
+            messages=[LLMChatMessage(role="user", content="hi")],
+            timeout_s=5,
+            **kwargs,
+        )
+    ]
+
+
+def test_stream_failing_before_its_first_delta_completes_without_streaming(isolated):
+    backend = _BrokenStream(LLMUnavailableError("Groq API error 503: down"))
+    llm_client.register_provider(backend)
+    assert asyncio.run(_collect(validate=lambda text: "sql" in text)) == [json.dumps(PLAN)]
+    assert len(backend.completions) == 1
+
+
+def test_stream_failing_midway_is_raised(isolated):
+    backend = _BrokenStream(LLMUnavailableError("Groq API error 503: down"), partial='{"kind": ')
+    llm_client.register_provider(backend)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(_collect())
+    assert backend.completions == []
@@ -0,0 +1,85 @@
+from nl2sql.agent import _plan_messages
+from nl2sql.prompt_budget import PromptSection, count_tokens, fit_sections
+from nl2sql.prompts import planner_system_prompt
+from nl2sql.schema import ColumnInfo, SchemaModel, TableInfo
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa"
+
+
+def _sections(system: str = "RULES " * 20) -> list[PromptSection]:
+    return [
+        PromptSection("system", (system,), required=True),
+        PromptSection("schema", ("TABLE a " + WORDS, "TABLE b " + WORDS, "TABLE c " + WORDS), priority=2, min_parts=1),
+        PromptSection("hints", ("hint " + WORDS,), priority=1),
+        # Newest turn first in value, as the planner builds it.
+        PromptSection("history", ("turn 1 " + WORDS, "turn 2 " + WORDS, "turn 3 " + WORDS), ranks=(2, 1, 0)),
+        PromptSection("question", ("QUESTION: how many orders",), required=True),
+    ]
+
+
+def _total(sections: list[PromptSection]) -> int:
+    return sum(count_tokens(p) for s in sections for p in s.parts)
+
+
+def test_history_goes_first_oldest_turn_first():
+    sections = _sections()
+    turn = count_tokens("turn 1 " + WORDS)
+    texts, report = fit_sections(sections, budget=_total(sections) - turn, output_tokens=100)
+    assert report.dropped["history"] == 1 and "turn 1" not in texts["history"] and "turn 3" in texts["history"]
+    assert report.dropped["schema"] == 0 and report.dropped["hints"] == 0
+    assert not report.over_budget
+
+
+def test_schema_is_trimmed_only_after_history_and_hints_are_gone():
+    sections = _sections()
+    history_and_hints = sum(count_tokens(p) for s in sections if s.name in ("history", "hints") for p in s.parts)
+    texts, report = fit_sections(sections, budget=_total(sections) - history_and_hints - 1, output_tokens=100)
+    assert texts["history"] == "" and texts["hints"] == ""
+    assert report.dropped["schema"] == 1 and "TABLE a" in texts["schema"]
+
+
+def test_the_static_prefix_is_never_trimmed_and_overflow_is_reported():
+    system = "RULES " * 500
+    texts, report = fit_sections(_sections(system), budget=50, output_tokens=100)
+    assert texts["system"] == system
+    assert texts["schema"].count("TABLE") == 1  # min_parts
+    assert report.over_budget
+    assert report.as_dict()["over_budget"] is True
+
+
+def _schema(tables: int) -> SchemaModel:
+    return SchemaModel(
+        tables=tuple(
+            TableInfo(
+                schema="public",
+                name=f"table_{t}",
+                kind="table",
+                columns=tuple(ColumnInfo(name=f"col_{t}_{c}", data_type="text") for c in range(12)),
+            )
+            for t in range(tables)
+        )
+    )
+
+
+def test_planner_prompt_keeps_its_prefix_and_drops_history_before_tables():
+    history = [
+        {"role": role, "content": f"{role} turn {i} " + WORDS}
+        for i in range(5)
+        for role in ("user", "assistant")
+    ]
+    options = dict(
+        schema=_schema(6),
+        question="rows in table_3",
+        chat_history=history,
+        sql_mode="read_only",
+        memory_user_turns=5,
+        max_sql_statements=4,
+        model="llama-3.3-70b-versatile",
+    )
+    _, full = _plan_messages(**options)
+    budget = full.total - full.sections["history"] + 1
+    messages, report = _plan_messages(**options, prompt_token_budget=budget)
+    assert messages[0].content.startswith(planner_system_prompt("read_only", 4, False))
+    assert report.dropped.get("history", 0) > 0
+    assert report.dropped.get("schema", 0) == 0
+    assert not report.over_budget
@@ -0,0 +1,93 @@
+import httpx
+import pytest
+
+from nl2sql import llm_client
+from nl2sql.rate_limit import RateLimitConfig, RateLimiter, TokenBucket, parse_duration_s, retry_after_s
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [
+        ("7.66s", 7.66),
+        ("2m59.56s", 179.56),
+        ("120ms", 0.12),
+        ("1h2m3s", 3723.0),
+        ("30", 30.0),
+        ("-5", 0.0),
+        ("", None),
+        (None, None),
+        ("soon", None),
+    ],
+)
+def test_parse_duration_s(value, seconds):
+    if seconds is None:
+        assert parse_duration_s(value) is None
+    else:
+        assert parse_duration_s(value) == pytest.approx(seconds)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=10, per_s=2)
+    now = bucket._updated
+    assert bucket.reserve(10, now) == 0.0
+    assert bucket.reserve(4, now) == pytest.approx(2.0)
+    assert bucket.available(now + 3) == pytest.approx(2.0)
+
+
+def test_token_bucket_caps_oversized_requests_and_refills_to_capacity():
+    bucket = TokenBucket(capacity=10, per_s=1)
+    now = bucket._updated
+    assert bucket.reserve(50, now) == 0.0
+    assert bucket.available(now + 100) == pytest.approx(10.0)
+
+
+def test_token_bucket_clamp_and_refund():
+    bucket = TokenBucket(capacity=10, per_s=1)
+    now = bucket._updated
+    bucket.clamp(3, now)
+    assert bucket.available(now) == pytest.approx(3.0)
+    bucket.refund(20)
+    assert bucket.available(now) == pytest.approx(10.0)
+
+
+def _response(status: int, headers: dict | None = None, json: dict | None = None) -> httpx.Response:
+    return httpx.Response(status, headers=headers, json=json)
+
+
+def test_retry_after_seconds_header():
+    assert retry_after_s(_response(429, {"retry-after": "12"})) == 12.0
+
+
+def test_retry_after_http_date_in_the_past_is_zero():
+    assert retry_after_s(_response(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+
+
+def test_retry_after_gemini_retry_info():
+    body = {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "3.5s"}]}}
+    assert retry_after_s(_response(429, json=body)) == 3.5
+
+
+def test_retry_after_absent():
+    assert retry_after_s(_response(503, json={"error": {"message": "overloaded"}})) is None
+
+
+def test_acquire_over_max_wait_reserves_nothing():
+    limiter = RateLimiter(RateLimitConfig(rpm=1))
+    assert limiter.acquire("groq", "m", 0) == 0.0
+    assert limiter.acquire("groq", "m", 0, max_wait_s=1.0) == pytest.approx(60.0, abs=0.5)
+    assert limiter.metrics()["groq:m"]["calls"] == 1
+    # The refused reservation did not push the next caller further back.
+    assert limiter.acquire("groq", "m", 0) == pytest.approx(60.0, abs=0.5)
+
+
+def test_post_fails_fast_instead_of_sleeping_out_a_long_block(monkeypatch):
+    limiter = RateLimiter()
+    limiter.observe(
+        "groq",
+        "m",
+        _response(200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1h2m3s"}),
+    )
+    monkeypatch.setattr(llm_client, "_RATE_LIMITER", limiter)
+    monkeypatch.setattr(llm_client.time, "sleep", lambda s: pytest.fail(f"slept {s}s"))
+    with pytest.raises(llm_client.RateLimitedError):
+        llm_client._post("groq", "m", "https://example.invalid", tokens=10, retries=0, timeout_s=45)
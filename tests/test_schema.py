@@ -0,0 +1,29 @@
+import pytest
+
+from nl2sql.schema import ColumnInfo, SchemaModel, TableInfo
+
+
+def _schema() -> SchemaModel:
+    return SchemaModel(
+        tables=(
+            TableInfo(schema="public", name="customers", kind="table", columns=(ColumnInfo("id", "integer"),)),
+            TableInfo(schema="public", name="orders", kind="table", columns=(ColumnInfo("id", "integer"),)),
+        ),
+        fingerprint="v1",
+    )
+
+
+def test_derived_mappings_are_read_only():
+    schema = _schema()
+    with pytest.raises(TypeError):
+        schema.basename_map["customers"] = "evil.customers"  # type: ignore[index]
+    with pytest.raises(TypeError):
+        schema.table_columns["public.orders"] = frozenset()  # type: ignore[index]
+    assert schema.basename_map["orders"] == "public.orders"
+
+
+def test_subset_keeps_the_catalog_fingerprint():
+    schema = _schema()
+    subset = schema.subset(schema.tables[:1])
+    assert subset.fingerprint == "v1"
+    assert subset.table_names == {"public.customers"}
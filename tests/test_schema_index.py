@@ -0,0 +1,75 @@
+from nl2sql.schema import ColumnInfo, SchemaModel, TableInfo
+from nl2sql.schema_index import SchemaIndex, tokenize
+
+
+def _table(name: str, *columns: ColumnInfo) -> TableInfo:
+    return TableInfo(
+        schema="public",
+        name=name,
+        kind="table",
+        columns=(ColumnInfo("id", "integer", is_primary_key=True), *columns),
+    )
+
+
+def _schema() -> SchemaModel:
+    filler = [_table(f"audit_log_{i}", *(ColumnInfo(f"field_{j}", "text") for j in range(10))) for i in range(20)]
+    return SchemaModel(
+        tables=(
+            _table("customers", ColumnInfo("name", "text"), ColumnInfo("region", "text")),
+            _table(
+                "orders",
+                ColumnInfo("customer_id", "integer", references=("public.customers.id",)),
+                ColumnInfo("order_total", "numeric"),
+                ColumnInfo("placed_at", "timestamp"),
+            ),
+            _table("order_items", ColumnInfo("product_id", "integer"), ColumnInfo("quantity", "integer")),
+            _table("products", ColumnInfo("title", "text"), ColumnInfo("price", "numeric")),
+            *filler,
+        ),
+        fingerprint="v1",
+    )
+
+
+def test_tokenize_splits_and_stems_identifiers():
+    assert tokenize("orderItems customer_names categories") == ["order", "item", "customer", "name", "category"]
+
+
+def test_bm25_ranks_the_named_table_first():
+    ranked = SchemaIndex(_schema()).rank("total of all orders")
+    assert ranked[0][1].qualified_name == "public.orders"
+    assert all(a[0] >= b[0] for a, b in zip(ranked, ranked[1:]))
+
+
+def test_typos_snap_to_schema_terms():
+    ranked = SchemaIndex(_schema()).rank("custmers by regon")
+    assert ranked[0][1].qualified_name == "public.customers"
+
+
+def test_a_question_about_orders_pulls_in_the_fk_linked_customers_table():
+    selection = SchemaIndex(_schema()).select("total orders last month", top_k=1, token_budget=400)
+    assert selection.pruned
+    assert selection.tables[0] == "public.orders"
+    assert "public.customers" in selection.tables
+    assert not any(name.startswith("public.audit_log") for name in selection.tables)
+
+
+def test_token_budget_truncates_in_rank_order():
+    schema = _schema()
+    index = SchemaIndex(schema)
+    question = "products price and order items quantity for orders"
+    ranked = [t.qualified_name for _, t in index.rank(f"{question} {question}")]
+    first, second = (schema.table(name) for name in ranked[:2])
+    selection = index.select(question, top_k=len(ranked), token_budget=first.tokens + second.tokens)
+    assert selection.tables == tuple(ranked[:2])
+    assert selection.estimated_tokens <= first.tokens + second.tokens + 2
+
+
+def test_the_top_table_is_kept_even_over_budget():
+    selection = SchemaIndex(_schema()).select("orders", top_k=3, token_budget=1)
+    assert selection.tables[0] == "public.orders"
+
+
+def test_whole_schema_when_it_fits():
+    schema = _schema()
+    selection = SchemaIndex(schema).select("orders", token_budget=10**6)
+    assert not selection.pruned and selection.schema is schema
@@ -0,0 +1,99 @@
+import pytest
+
+from nl2sql.plan_cache import PlanCache, plan_cache_key
+from nl2sql.semantic_cache import SemanticIndex, literals_in_question
+
+PLAN = {"sql": "SELECT count(*) FROM public.orders"}
+IDENTIFIERS = ("public.customers", "public.orders", "region", "name", "placed_at", "status")
+
+
+def _index(question: str, plan: dict[str, str] = PLAN) -> SemanticIndex:
+    index = SemanticIndex(threshold=0.9, ttl_s=60, max_entries=8)
+    index.put(question, plan, scope="s", identifiers=IDENTIFIERS)
+    return index
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        (
+            "customers who have placed an order in the last month",
+            "customers who have not placed an order in the last month",
+        ),
+        ("customers who have placed an order", "customers who haven't placed an order"),
+        ("orders that shipped", "orders that not shipped"),
+        ("paid invoices", "unpaid invoices"),
+        ("top 10 customers by revenue", "bottom 10 customers by revenue"),
+        ("products by price ascending", "products by price descending"),
+        ("city with the highest sales", "city with the lowest sales"),
+        ("top 5 customers", "top 10 customers"),
+    ],
+)
+def test_opposite_questions_do_not_match(cached, asked):
+    assert _index(cached).lookup(asked, scope="s", identifiers=IDENTIFIERS) is None
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        ("top ten customers", "top 10 customers"),
+        ("show me all orders that shipped", "list the orders that shipped"),
+        ("customers who have not placed an order", "customers who haven't placed an order"),
+    ],
+)
+def test_rephrasings_match(cached, asked):
+    hit = _index(cached).lookup(asked, scope="s", identifiers=IDENTIFIERS)
+    assert hit is not None and hit.plan == PLAN
+
+
+def test_scope_must_match():
+    assert _index("top ten customers").lookup("top ten customers", scope="other") is None
+
+
+@pytest.mark.parametrize(
+    "cached, asked, sql",
+    [
+        (
+            "how many customers in the north region placed an order last year",
+            "how many customers in the south region placed an order last year",
+            "SELECT count(*) FROM public.customers WHERE region = 'north'",
+        ),
+        (
+            "customers in the north region",
+            "customers in the south region",
+            "SELECT * FROM public.customers WHERE region = 'north'",
+        ),
+        ("orders placed by john", "orders placed by jane", "SELECT * FROM public.orders WHERE name ILIKE '%john%'"),
+    ],
+)
+def test_value_swaps_do_not_match(cached, asked, sql):
+    plan = {"sql": sql}
+    assert _index(cached, plan).lookup(asked, scope="s", identifiers=IDENTIFIERS) is None
+    # Even if the wording guard let it through, the cached literal is not in the new question.
+    assert not literals_in_question(sql, asked)
+
+
+def test_value_swap_misses_through_plan_cache():
+    cache = PlanCache(ttl_s=60, semantic_threshold=0.9)
+
+    def key(question):
+        return plan_cache_key(
+            question=question,
+            schema_fingerprint="v1",
+            sql_mode="read_only",
+            max_sql_statements=4,
+            model="mock:m",
+            history="",
+            identifiers=IDENTIFIERS,
+        )
+
+    plan = {"kind": "sql", "sql": "SELECT * FROM public.customers WHERE region = 'north'"}
+    cache.put(key("customers in the north region"), plan)
+    assert cache.get(key("customers in the south region")) is None
+    assert cache.get(key("list customers in the north region")) is not None
+
+
+def test_literals_must_be_spelled_out():
+    assert literals_in_question("SELECT * FROM t WHERE region = 'North' LIMIT 10", "top ten customers in the north")
+    assert not literals_in_question("SELECT * FROM t LIMIT 10", "top 5 customers")
+    assert literals_in_question("SELECT 'it''s' FROM t", "why it's late")
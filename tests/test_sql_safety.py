@@ -0,0 +1,45 @@
+import pytest
+
+from nl2sql.db import _is_cacheable_read
+from nl2sql.sql_safety import calls_volatile_function, referenced_tables
+
+
+@pytest.mark.parametrize(
+    "sql, tables",
+    [
+        ("SELECT * FROM a, b", {"a", "b"}),
+        ("WITH t AS (SELECT * FROM a, b) SELECT * FROM t", {"a", "b", "t"}),
+        ("SELECT * FROM a x, public.b AS y WHERE x.id IN (SELECT id FROM c, d)", {"a", "b", "c", "d"}),
+        ("SELECT * FROM a NATURAL JOIN b CROSS JOIN c, d", {"a", "b", "c", "d"}),
+        ("INSERT INTO t (a, b) SELECT 1, 2 FROM u", {"t", "u"}),
+        ("UPDATE ONLY s.t SET a = 1 FROM u, v WHERE u.id = t.id", {"t", "u", "v"}),
+        ("DELETE FROM x USING y, z WHERE x.id = y.id", {"x", "y", "z"}),
+        ('SELECT * FROM "Order Items" oi, "Weird""Name"', {"order items", 'weird"name'}),
+        ("SELECT 'from q, r' FROM a", {"a"}),
+    ],
+)
+def test_referenced_tables(sql, tables):
+    assert tables <= referenced_tables(sql)
+    assert "q" not in referenced_tables(sql)
+
+
+@pytest.mark.parametrize(
+    "sql, volatile",
+    [
+        ("SELECT now()", True),
+        ("SELECT * FROM orders WHERE placed_at > current_date - 7", True),
+        ("SELECT * FROM orders ORDER BY random() LIMIT 5", True),
+        ("SELECT 'now()' FROM orders", False),
+        ("SELECT nowhere FROM towns", False),
+    ],
+)
+def test_calls_volatile_function(sql, volatile):
+    assert calls_volatile_function(sql) is volatile
+
+
+def test_views_and_volatile_reads_are_not_cached():
+    views = frozenset({"order_summary"})
+    assert _is_cacheable_read("SELECT * FROM orders o, customers c", views)
+    assert not _is_cacheable_read("SELECT * FROM orders o, order_summary s", views)
+    assert not _is_cacheable_read("SELECT * FROM pg_stat_activity", views)
+    assert not _is_cacheable_read("SELECT count(*) FROM orders WHERE placed_at > now() - interval '1 day'", views)